@@ -1,10 +1,15 @@
+from collections import deque
+
 from django.apps import apps
+from django.db import connections, router, transaction
 from django.utils.translation import gettext_lazy as _
 from django.utils.timezone import now
-from django.contrib.contenttypes.models import ContentType
 
-from actstream import settings
-from actstream.signals import action
+from actstream import contenttypes, settings
+from actstream.cache import invalidate_actions, invalidate_user
+from actstream.ids import object_id_field, set_int_object_ids
+from actstream.queues import action_to_spec
+from actstream.signals import action, actions_created
 from actstream.registry import check
 
 
@@ -32,11 +37,21 @@ def follow(user, obj, send_action=True, actor_only=True, flag='', **kwargs):
         follow(request.user, group, actor_only=False, flag='liking')
     """
     check(obj)
-    instance, created = apps.get_model('actstream', 'follow').objects.get_or_create(
-        user=user, object_id=obj.pk, flag=flag,
-        content_type=ContentType.objects.get_for_model(obj),
-        actor_only=actor_only
-    )
+    Follow = apps.get_model('actstream', 'follow')
+    with transaction.atomic():
+        instance, created = Follow.objects.get_or_create(
+            user=user, object_id=obj.pk, flag=flag,
+            content_type=contenttypes.get_content_type(obj),
+            actor_only=actor_only
+        )
+        if created:
+            Follow.objects.update_counts([(user.pk, instance.content_type_id, instance.object_id, flag)], 1)
+    if created and settings.FEED_MODE in ('write', 'hybrid'):
+        apps.get_model('actstream', 'feedentry').objects.add(user, obj)
+    elif created and settings.FEED_MODE == 'store':
+        settings.get_feed_store().follow(user, obj)
+    if created:
+        invalidate_user(user)
     if send_action and created:
         if not flag:
             action.send(user, verb=_('started following'), target=obj, **kwargs)
@@ -60,14 +75,20 @@ def unfollow(user, obj, send_action=False, flag=''):
         unfollow(request.user, other_user, flag='watching')
     """
     check(obj)
-    qs = apps.get_model('actstream', 'follow').objects.filter(
-        user=user, object_id=obj.pk,
-        content_type=ContentType.objects.get_for_model(obj)
-    )
+    Follow = apps.get_model('actstream', 'follow')
+    qs = Follow.objects.filter(**{
+        'user': user,
+        'content_type': contenttypes.get_content_type(obj),
+        object_id_field('object_id', obj.__class__): obj.pk,
+    })
 
     if flag:
         qs = qs.filter(flag=flag)
-    qs.delete()
+    with transaction.atomic():
+        follows = list(qs.select_for_update().values_list('user_id', 'content_type_id', 'object_id', 'flag'))
+        qs.delete()
+        Follow.objects.update_counts(follows, -1)
+    _unfollowed(user, obj)
 
     if send_action:
         if not flag:
@@ -76,6 +97,35 @@ def unfollow(user, obj, send_action=False, flag=''):
             action.send(user, verb=_('stopped %s' % flag), target=obj)
 
 
+def delete_follow(instance):
+    """
+    Deletes a single ``Follow`` instance, eg one flag of a "follow" relationship.
+
+    Like ``unfollow`` the follow counters, the feeds and the cached streams of the user are updated.
+    """
+    Follow = apps.get_model('actstream', 'follow')
+    with transaction.atomic():
+        deleted, _rows = Follow.objects.filter(pk=instance.pk).delete()
+        if deleted:
+            Follow.objects.update_counts(
+                [(instance.user_id, instance.content_type_id, instance.object_id, instance.flag)], -1
+            )
+    obj = instance.follow_object
+    if deleted and obj is not None:
+        _unfollowed(instance.user, obj)
+
+
+def _unfollowed(user, obj):
+    """
+    Removes the actions involving obj from the feed of the user once unfollowed.
+    """
+    if settings.FEED_MODE in ('write', 'hybrid'):
+        apps.get_model('actstream', 'feedentry').objects.remove(user, obj)
+    elif settings.FEED_MODE == 'store':
+        settings.get_feed_store().unfollow(user, obj)
+    invalidate_user(user)
+
+
 def is_following(user, obj, flag=''):
     """
     Checks if a "follow" relationship exists.
@@ -91,10 +141,11 @@ def is_following(user, obj, flag=''):
     """
     check(obj)
 
-    qs = apps.get_model('actstream', 'follow').objects.filter(
-        user=user, object_id=obj.pk,
-        content_type=ContentType.objects.get_for_model(obj)
-    )
+    qs = apps.get_model('actstream', 'follow').objects.filter(**{
+        'user': user,
+        'content_type': contenttypes.get_content_type(obj),
+        object_id_field('object_id', obj.__class__): obj.pk,
+    })
 
     if flag:
         qs = qs.filter(flag=flag)
@@ -102,12 +153,14 @@ def is_following(user, obj, flag=''):
     return qs.exists()
 
 
-def action_handler(verb, **kwargs):
+def build_action(actor, verb, get_content_type=None, check_model=check, **kwargs):
     """
-    Handler function to create Action instance upon action signal call.
+    Returns an unsaved Action instance from the arguments of an action signal call.
+    ``get_content_type`` and ``check_model`` may be given to reuse content type lookups
+    and registry checks across many actions.
     """
-    kwargs.pop('signal', None)
-    actor = kwargs.pop('sender')
+    if get_content_type is None:
+        get_content_type = contenttypes.get_content_type
 
     # We must store the untranslated string
     # If verb is an ugettext_lazyed string, fetch the original string
@@ -119,7 +172,7 @@ def action_handler(verb, **kwargs):
         verb = verb._args[0]
 
     newaction = apps.get_model('actstream', 'action')(
-        actor_content_type=ContentType.objects.get_for_model(actor),
+        actor_content_type=get_content_type(actor),
         actor_object_id=actor.pk,
         verb=str(verb),
         public=bool(kwargs.pop('public', True)),
@@ -130,11 +183,145 @@ def action_handler(verb, **kwargs):
     for opt in ('target', 'action_object'):
         obj = kwargs.pop(opt, None)
         if obj is not None:
-            check(obj)
+            check_model(obj)
             setattr(newaction, '%s_object_id' % opt, obj.pk)
-            setattr(newaction, '%s_content_type' % opt,
-                    ContentType.objects.get_for_model(obj))
+            setattr(newaction, '%s_content_type' % opt, get_content_type(obj))
     if settings.USE_JSONFIELD and len(kwargs):
         newaction.data = kwargs
+    set_int_object_ids(newaction)
+    return newaction
+
+
+def action_handler(verb, **kwargs):
+    """
+    Handler function to create Action instance upon action signal call.
+
+    If a queue is set in ``ACTSTREAM_SETTINGS['QUEUE']`` the action is enqueued
+    instead and the returned instance is not saved: its ``pk`` is None, and the
+    action written later by the worker is another instance.
+    """
+    kwargs.pop('signal', None)
+    actor = kwargs.pop('sender')
+
+    newaction = build_action(actor, verb, **kwargs)
+
+    queue = settings.get_action_queue()
+    if queue is not None:
+        # written later by the actstream_worker command
+        queue.put(action_to_spec(newaction))
+        return newaction
+
     newaction.save(force_insert=True)
+
+    if settings.FEED_MODE in ('write', 'hybrid'):
+        apps.get_model('actstream', 'feedentry').objects.fanout(newaction)
+    elif settings.FEED_MODE == 'store':
+        settings.get_feed_store().fanout(newaction)
+    invalidate_actions(newaction)
     return newaction
+
+
+ACTION_KEY_FIELDS = (
+    'actor_content_type_id', 'actor_object_id', 'verb', 'timestamp',
+    'target_content_type_id', 'target_object_id', 'action_object_content_type_id', 'action_object_object_id',
+)
+
+
+def set_inserted_pks(actions, last, using):
+    """
+    Sets the primary keys of actions inserted by ``bulk_create`` on databases which do not return them
+    (eg MySQL), reading back the rows created after the ``last`` primary key with the same fields.
+    """
+    Action = apps.get_model('actstream', 'action')
+
+    def key(values):
+        # object ids are strings in the database and often integers on the instances
+        return tuple(value if value is None or name == 'timestamp' else str(value)
+                     for name, value in zip(ACTION_KEY_FIELDS, values))
+
+    rows = Action.objects.using(using).order_by('pk').values_list('pk', *ACTION_KEY_FIELDS)
+    if last is not None:
+        rows = rows.filter(pk__gt=last)
+    pks = {}
+    for pk, *values in rows:
+        pks.setdefault(key(values), deque()).append(pk)
+    for newaction in actions:
+        inserted = pks.get(key(getattr(newaction, name) for name in ACTION_KEY_FIELDS))
+        if inserted:
+            newaction.pk = inserted.popleft()
+            newaction._state.adding = False
+            newaction._state.db = using
+
+
+def create_actions(actions, batch_size=None, send_signal=True):
+    """
+    Inserts unsaved Action instances with ``bulk_create`` and fans them out to the user feeds.
+    On databases which do not return the primary keys of bulk inserts they are read back
+    with ``set_inserted_pks``, so that the returned actions are always saved.
+    The ``actions_created`` signal is sent with the created actions unless ``send_signal`` is ``False``.
+    """
+    Action = apps.get_model('actstream', 'action')
+    actions = list(actions)
+    for newaction in actions:
+        set_int_object_ids(newaction)
+    using = router.db_for_write(Action)
+    if connections[using].features.can_return_rows_from_bulk_insert:
+        actions = Action.objects.using(using).bulk_create(actions, batch_size=batch_size)
+    else:
+        with transaction.atomic(using=using):
+            last = Action.objects.using(using).order_by('-pk').values_list('pk', flat=True).first()
+            actions = Action.objects.using(using).bulk_create(actions, batch_size=batch_size)
+            set_inserted_pks(actions, last, using)
+
+    if settings.FEED_MODE in ('write', 'hybrid'):
+        apps.get_model('actstream', 'feedentry').objects.fanout(*actions)
+    elif settings.FEED_MODE == 'store':
+        settings.get_feed_store().fanout(*actions)
+    invalidate_actions(*actions)
+    if send_signal:
+        actions_created.send(sender=Action, actions=actions)
+    return actions
+
+
+def bulk_send(specs, batch_size=None, send_signal=True):
+    """
+    Creates many actions without sending one action signal per action.
+
+    Each spec is a dictionary of the keyword arguments of an ``action.send`` call
+    with the actor as ``actor``. Content types are looked up and models are checked
+    against the registry once per model class, and the actions are inserted with
+    ``bulk_create`` in chunks of ``batch_size`` (defaults to ``ACTSTREAM_SETTINGS['BULK_BATCH_SIZE']``).
+    After each chunk the ``actions_created`` signal is sent, unless ``send_signal`` is ``False``.
+
+    Returns the number of created actions.
+
+    Example::
+
+        bulk_send({'actor': user, 'verb': 'joined', 'target': group} for user in users)
+    """
+    batch_size = batch_size or settings.BULK_BATCH_SIZE
+    content_types, checked = {}, set()
+
+    def get_content_type(obj):
+        if obj.__class__ not in content_types:
+            content_types[obj.__class__] = contenttypes.get_content_type(obj)
+        return content_types[obj.__class__]
+
+    def check_model(obj):
+        if obj.__class__ not in checked:
+            check(obj)
+            checked.add(obj.__class__)
+
+    count, batch = 0, []
+    for spec in specs:
+        spec = dict(spec)
+        batch.append(build_action(
+            spec.pop('actor'), spec.pop('verb'),
+            get_content_type=get_content_type, check_model=check_model, **spec
+        ))
+        if len(batch) >= batch_size:
+            count += len(create_actions(batch, send_signal=send_signal))
+            batch = []
+    if batch:
+        count += len(create_actions(batch, send_signal=send_signal))
+    return count
@@ -4,7 +4,7 @@ import django
 from django.apps import apps
 from django.apps import AppConfig
 from django.conf import settings
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_migrate, pre_delete
 
 from actstream import settings as actstream_settings
 from actstream.signals import action
@@ -29,3 +29,12 @@ class ActstreamConfig(AppConfig):
 
         from actstream.follows import delete_orphaned_follows
         pre_delete.connect(delete_orphaned_follows)
+
+        from actstream.cache import invalidate_deleted_action
+        post_delete.connect(invalidate_deleted_action, sender=action_class,
+                            dispatch_uid='actstream.cache')
+
+        # the content types of the registered models are looked up together on first use,
+        # querying the database from ready() is discouraged
+        from actstream.contenttypes import clear
+        post_migrate.connect(clear, dispatch_uid='actstream.contenttypes')
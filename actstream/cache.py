@@ -0,0 +1,199 @@
+"""
+Caching of the action ids returned by ``@stream`` methods, enabled with ``ACTSTREAM_SETTINGS['CACHE']``.
+
+Every cached stream depends on a few scopes, each with a version stored in the cache.
+Creating an action bumps the versions of the scopes it appears in and following or
+unfollowing bumps the version of the user's feed, which changes the keys of the
+affected streams only. Custom streams depending on the follows of a user are listed in
+the ``follow_streams`` attribute of the manager. Unused entries expire after ``TIMEOUT`` seconds.
+"""
+import datetime
+import hashlib
+import time
+
+from django.apps import apps
+from django.core.cache import caches
+from django.db.models import Case, IntegerField, Model, When
+
+from actstream import contenttypes, settings as actstream_settings
+
+KEY_PREFIX = 'actstream'
+
+# streams of ActionManager and the scopes of their first argument,
+# the other streams depend on every action
+OBJECT_STREAMS = ('actor', 'target', 'action_object', 'any')
+MODEL_STREAMS = ('model_actions',)
+USER_STREAMS = ('user',)
+GLOBAL_SCOPE = 'all'
+
+# marks streams with more than MAX_ITEMS actions, which are not cached
+TOO_LARGE = 'too large'
+
+
+def get_cache():
+    return caches[actstream_settings.CACHE_SETTINGS['ALIAS']]
+
+
+def object_scope(content_type_id, object_id):
+    return 'obj:%s:%s' % (content_type_id, object_id)
+
+
+def model_scope(content_type_id):
+    return 'model:%s' % content_type_id
+
+
+def feed_scope(user_id):
+    return 'feed:%s' % user_id
+
+
+def _version_key(scope):
+    return '%s:v:%s' % (KEY_PREFIX, scope)
+
+
+def get_versions(scopes):
+    """
+    Returns the current version of each scope, initializing the missing ones.
+    """
+    cache = get_cache()
+    keys = {_version_key(scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # a new version never matches the keys stored before an eviction
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in sorted(keys)]
+
+
+def invalidate(*scopes):
+    """
+    Bumps the version of the given scopes, orphaning the streams cached for them.
+    """
+    cache = get_cache()
+    for scope in set(scopes):
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            # never read, nothing to invalidate
+            pass
+
+
+def action_scopes(*actions):
+    """
+    Returns the scopes of the streams including the given actions.
+    The followers of their actors, targets and action objects are read in one query.
+    """
+    scopes = {GLOBAL_SCOPE}
+    for action in actions:
+        for field in ('actor', 'target', 'action_object'):
+            content_type_id = getattr(action, '%s_content_type_id' % field)
+            if content_type_id is not None:
+                scopes.add(object_scope(content_type_id, getattr(action, '%s_object_id' % field)))
+                scopes.add(model_scope(content_type_id))
+    Follow = apps.get_model('actstream', 'follow')
+    scopes.update(feed_scope(user_id) for user_id in Follow.objects.followers_for_actions(actions))
+    return scopes
+
+
+def invalidate_actions(*actions):
+    """
+    Invalidates the cached streams of newly created or deleted actions.
+    """
+    if actstream_settings.CACHE_SETTINGS['ENABLE'] and actions:
+        invalidate(*action_scopes(*actions))
+
+
+def invalidate_deleted_action(sender, instance, **kwargs):
+    """
+    post_delete receiver invalidating the streams of a deleted action.
+    """
+    invalidate_actions(instance)
+
+
+def invalidate_user(user):
+    """
+    Invalidates the cached streams of a user whose follows changed, the user streams and
+    the streams listed in the ``follow_streams`` of the manager.
+    """
+    if actstream_settings.CACHE_SETTINGS['ENABLE']:
+        invalidate(feed_scope(user.pk))
+
+
+def _key_part(value):
+    """
+    Returns a stable string for a stream argument, or None if it cannot be part of a key.
+    """
+    if value is None or isinstance(value, (str, int, float, bool, datetime.date)):
+        return repr(value)
+    if isinstance(value, Model):
+        return 'obj:%s:%s' % (value._meta.label_lower, value.pk)
+    if isinstance(value, type) and issubclass(value, Model):
+        return 'model:%s' % value._meta.label_lower
+    if isinstance(value, (list, tuple)):
+        parts = [_key_part(item) for item in value]
+        if None not in parts:
+            return '[%s]' % ','.join(parts)
+    return None
+
+
+def _scopes(manager, name, args, kwargs):
+    obj = args[0] if args else kwargs.get('obj', kwargs.get('model'))
+    if name in OBJECT_STREAMS and isinstance(obj, Model):
+        content_type_id = contenttypes.get_content_type(obj).pk
+        return [object_scope(content_type_id, obj.pk)]
+    if name in MODEL_STREAMS and obj is not None:
+        return [model_scope(contenttypes.get_content_type(obj).pk)]
+    if name in USER_STREAMS and isinstance(obj, Model):
+        # the follows of the user and its own actions for with_user_activity
+        content_type_id = contenttypes.get_content_type(obj).pk
+        return [feed_scope(obj.pk), object_scope(content_type_id, obj.pk)]
+    if name in getattr(manager, 'follow_streams', ()) and isinstance(obj, Model):
+        # custom streams of a user depending on its follows
+        return [GLOBAL_SCOPE, feed_scope(obj.pk)]
+    return [GLOBAL_SCOPE]
+
+
+def get_key(manager, name, args, kwargs):
+    """
+    Returns the cache key of a stream call, or None if the call cannot be cached.
+    """
+    parts = [_key_part(arg) for arg in args]
+    for key, value in sorted(kwargs.items()):
+        part = _key_part(value)
+        parts.append(None if part is None else '%s=%s' % (key, part))
+    if None in parts:
+        return None
+    scopes = _scopes(manager, name, args, kwargs)
+    parts.extend(str(version) for version in get_versions(scopes))
+    digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+    return '%s:stream:%s.%s:%s' % (KEY_PREFIX, manager.__class__.__name__, name, digest)
+
+
+def cached_stream(manager, name, args, kwargs, build):
+    """
+    Returns the queryset of a stream call, reading its action ids from the cache when possible.
+    ``build`` returns the stream queryset from the database.
+    """
+    key = get_key(manager, name, args, kwargs)
+    if key is None:
+        return build()
+    cache = get_cache()
+    ids = cache.get(key)
+    if ids is None:
+        queryset = build()
+        max_items = actstream_settings.CACHE_SETTINGS['MAX_ITEMS']
+        ids = list(queryset.values_list('pk', flat=True)[:max_items + 1])
+        if len(ids) > max_items:
+            ids = TOO_LARGE
+        cache.set(key, ids, actstream_settings.CACHE_SETTINGS['TIMEOUT'])
+        if ids == TOO_LARGE:
+            return queryset
+    elif ids == TOO_LARGE:
+        return build()
+    if not ids:
+        return manager.none()
+    # keep the order of the cached stream
+    return manager.filter(pk__in=ids).order_by(Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+        output_field=IntegerField()
+    ))
@@ -0,0 +1,76 @@
+"""
+Process-local maps of model classes to their ContentType and of content type ids to model classes.
+
+The maps are warmed with the content types of every model in the registry in one query the
+first time they are read, so a new worker process does not look them up one model at a time.
+They are cleared after migrations, which recreate the content types.
+"""
+from django.contrib.contenttypes.models import ContentType
+
+# model class -> ContentType
+_content_types = {}
+# content type id -> model class
+_models = {}
+
+
+def _add(model, content_type):
+    _content_types[model] = content_type
+    _models.setdefault(content_type.pk, content_type.model_class())
+
+
+def warm():
+    """
+    Fills the maps with the content types of the registered models, in one query at most.
+    """
+    from actstream.registry import registry
+
+    for model, content_type in ContentType.objects.get_for_models(*registry).items():
+        _add(model, content_type)
+
+
+def clear(**kwargs):
+    _content_types.clear()
+    _models.clear()
+
+
+def get_content_type(model_or_obj):
+    """
+    Returns the ContentType of a model class or instance, like ``ContentType.objects.get_for_model``.
+    """
+    model = model_or_obj if isinstance(model_or_obj, type) else model_or_obj.__class__
+    try:
+        return _content_types[model]
+    except KeyError:
+        pass
+    if not _content_types:
+        warm()
+        if model in _content_types:
+            return _content_types[model]
+    content_type = ContentType.objects.get_for_model(model)
+    _add(model, content_type)
+    return content_type
+
+
+def get_content_type_id(model_or_obj):
+    """
+    Returns the id of the ContentType of a model class or instance.
+    """
+    return get_content_type(model_or_obj).pk
+
+
+def get_model(content_type_id):
+    """
+    Returns the model class of a content type id, or None if the model no longer exists.
+    """
+    try:
+        return _models[content_type_id]
+    except KeyError:
+        pass
+    if not _content_types:
+        warm()
+        if content_type_id in _models:
+            return _models[content_type_id]
+    model = ContentType.objects.get_for_id(content_type_id).model_class()
+    if model is not None:
+        _models[content_type_id] = model
+    return model
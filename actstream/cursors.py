@@ -0,0 +1,156 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.timezone import now
+
+
+def encode_cursor(action):
+    """
+    Returns an opaque cursor pointing at the (timestamp, id) of the given action.
+    """
+    value = '{}|{}'.format(action.timestamp.isoformat(), action.pk)
+    return urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (timestamp, id) pair of a cursor made by ``encode_cursor``.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        value = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = value.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid stream cursor: %r' % cursor)
+
+
+def cursor_fields(queryset):
+    """
+    Returns the names of the (timestamp, id) fields a stream is ordered and paginated by,
+    eg the columns of the feed table for the streams read from it.
+    """
+    return getattr(queryset, '_cursor_fields', ('timestamp', 'pk'))
+
+
+def filter_cursors(queryset, before=None, after=None):
+    """
+    Restricts a stream to the actions older than the ``before`` cursor and newer than the ``after`` cursor.
+    """
+    ts_field, pk_field = cursor_fields(queryset)
+    if before:
+        timestamp, pk = decode_cursor(before)
+        queryset = queryset.filter(
+            Q(**{'%s__lt' % ts_field: timestamp}) | Q(**{ts_field: timestamp, '%s__lt' % pk_field: pk})
+        )
+    if after:
+        timestamp, pk = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(**{'%s__gt' % ts_field: timestamp}) | Q(**{ts_field: timestamp, '%s__gt' % pk_field: pk})
+        )
+    return queryset
+
+
+def filter_period(queryset, since=None, until=None):
+    """
+    Restricts a stream to the actions at or after ``since`` and before ``until``.
+    Either may be a datetime or a timedelta, taken back from now.
+    The bounds let the database skip the partitions or index ranges outside of them.
+    """
+    if isinstance(since, timedelta):
+        since = now() - since
+    if isinstance(until, timedelta):
+        until = now() - until
+    ts_field = cursor_fields(queryset)[0]
+    if since is not None:
+        queryset = queryset.filter(**{'%s__gte' % ts_field: since})
+    if until is not None:
+        queryset = queryset.filter(**{'%s__lt' % ts_field: until})
+    return queryset
+
+
+def paginate(queryset, offset=None, limit=None, before=None, after=None):
+    """
+    Slices a stream of actions. ``before`` and ``after`` are cursors that restrict the
+    stream to actions older or newer than the one they point at, ordered by ``(-timestamp, -id)``.
+    Unlike ``offset`` the cost of a cursor does not depend on how deep the page is.
+    """
+    ts_field, pk_field = cursor_fields(queryset)
+    queryset = filter_cursors(queryset, before, after)
+    if before or after or (limit and not queryset.query.order_by):
+        # break timestamp ties so that pages can be continued from a cursor
+        queryset = queryset.order_by('-%s' % ts_field, '-%s' % pk_field)
+        if after and not before and limit:
+            # the page right after the cursor, still returned newest first
+            pks = queryset.order_by(ts_field, pk_field).values_list('pk', flat=True)[offset:limit]
+            queryset = queryset.filter(pk__in=list(pks))
+            offset = limit = None
+    if offset or limit:
+        queryset = queryset[offset:limit]
+    return queryset
+
+
+def paginate_union(queryset, branches, offset=None, limit=None, before=None, after=None):
+    """
+    Slices a stream made of the union of the ``branches`` querysets, like ``paginate``.
+
+    Each branch is ordered by ``(timestamp, id)`` and cut at ``limit`` so that it can be read
+    from an index, in a single ``UNION ALL`` query on databases supporting ``LIMIT`` in compound
+    queries and one query per branch otherwise. The ids of the page are then merged, deduplicated
+    and the returned queryset selects them from ``queryset.model``.
+    Streams without a limit are returned from ``queryset`` by ``paginate``.
+    """
+    if not limit:
+        return paginate(queryset, offset, limit, before, after)
+
+    newest_first = not (after and not before)
+    order = ('-timestamp', '-pk') if newest_first else ('timestamp', 'pk')
+    pages = [
+        filter_cursors(branch, before, after).order_by(*order).values_list('pk', 'timestamp')[:limit]
+        for branch in branches
+    ]
+    if connections[queryset.db].features.supports_slicing_ordering_in_compound:
+        rows = list(pages[0].union(*pages[1:], all=True))
+    else:
+        rows = [row for page in pages for row in page]
+
+    rows = sorted(dict(rows).items(), key=lambda row: (row[1], row[0]), reverse=newest_first)
+    pks = [pk for pk, timestamp in rows[offset or 0:limit]]
+    return queryset.model.objects.using(queryset.db).filter(pk__in=pks).order_by('-timestamp', '-pk')
+
+
+def get_cursor_kwargs(params):
+    """
+    Returns the stream keyword arguments for the ``before``, ``after`` and ``limit``
+    query parameters in ``params``. Raises ValueError if any of them is malformed.
+    """
+    kwargs = {}
+    for name in ('before', 'after'):
+        if params.get(name):
+            decode_cursor(params[name])
+            kwargs['_%s' % name] = params[name]
+    if params.get('limit'):
+        limit = int(params['limit'])
+        if limit < 1:
+            raise ValueError('Invalid stream limit: %r' % params['limit'])
+        kwargs['_limit'] = limit
+    return kwargs
+
+
+def page_cursors(page, limit, before=None, after=None):
+    """
+    Returns the ``next`` and ``prev`` cursors of a page of at most ``limit`` actions, newest first,
+    read with the ``before`` and ``after`` cursors. ``next`` points at the older actions, to pass as
+    ``before``, and ``prev`` at the newer ones, to pass as ``after``. A page read with ``after`` only
+    continues towards the newer actions, as the older ones were read before it.
+    """
+    cursors = {}
+    if not limit or len(page) < limit:
+        return cursors
+    if after and not before:
+        cursors['prev'] = encode_cursor(page[0])
+    else:
+        cursors['next'] = encode_cursor(page[len(page) - 1])
+    return cursors
@@ -76,6 +76,20 @@ class ActionSerializer(DEFAULT_SERIALIZER):
         fields = 'id verb public description timestamp actor target action_object'.split()
 
 
+class RollupSerializer(serializers.Serializer):
+    """
+    Serializer for the groups of actions returned by ``rollup`` (see actstream.rollups)
+    """
+    verb = serializers.CharField(read_only=True)
+    target = get_grf()
+    bucket = serializers.DateTimeField(read_only=True)
+    timestamp = serializers.DateTimeField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+    actor_count = serializers.IntegerField(read_only=True)
+    actors = serializers.ListField(child=get_grf(), read_only=True)
+    actions = ActionSerializer(many=True, read_only=True)
+
+
 class SendActionSerializer(serializers.Serializer):
     """
     Serializer used when POSTing a new action to DRF
@@ -4,18 +4,21 @@ from django.contrib.contenttypes.models import ContentType
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 
+from rest_framework import mixins
 from rest_framework import viewsets
 from rest_framework import permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import APIException, NotFound
+from rest_framework.exceptions import APIException, NotFound, ParseError
 
 from actstream.drf import serializers
-from actstream import models
+from actstream import models, settings as actstream_settings
+from actstream.cursors import get_cursor_kwargs, page_cursors
+from actstream.rollups import TRUNC_KINDS
 from actstream.registry import label
 from actstream.settings import DRF_SETTINGS, import_obj
 from actstream.signals import action as action_signal
-from actstream.actions import follow as follow_action
+from actstream.actions import delete_follow, follow as follow_action
 
 
 def get_or_not_found(klass, detail=None, **kwargs):
@@ -80,15 +83,52 @@ class ActionViewSet(DefaultModelViewSet):
         action_signal.send(sender=request.user, **data)
         return Response(status=201)
 
+    def get_stream_kwargs(self):
+        """
+        Returns the keyset pagination arguments of the stream from the ``before``, ``after`` and ``limit`` query parameters
+        """
+        try:
+            return get_cursor_kwargs(self.request.query_params)
+        except ValueError as exc:
+            raise ParseError(str(exc))
+
+    def get_rollup(self):
+        """
+        Returns the period of the ``rollup`` query parameter grouping the actions of the stream, if any
+        """
+        period = self.request.query_params.get('rollup')
+        if period and period not in TRUNC_KINDS:
+            raise ParseError(f'Invalid rollup period: {period!r}')
+        return period or None
+
+    def get_stream_serializer(self, items, period):
+        if period:
+            return serializers.RollupSerializer(items, many=True, context=self.get_serializer_context())
+        return self.get_serializer(items, many=True)
+
     def get_stream(self, stream):
         """
-        Helper for paginating streams and serializing responses
+        Helper for paginating streams and serializing responses.
+        With the ``rollup`` query parameter the actions of the page are grouped by verb, target and period
         """
-        page = self.paginate_queryset(stream)
+        stream_kwargs = self.get_stream_kwargs()
+        period = self.get_rollup()
+        items = stream.rollup(period, limit=stream_kwargs.get('_limit') or actstream_settings.ROLLUP_LIMIT) if period else stream
+        if stream_kwargs:
+            serializer = self.get_stream_serializer(items, period)
+            cursors = page_cursors(
+                stream, stream_kwargs.get('_limit'), stream_kwargs.get('_before'), stream_kwargs.get('_after')
+            )
+            return Response({
+                'results': serializer.data,
+                'next': cursors.get('next'),
+                'prev': cursors.get('prev'),
+            })
+        page = self.paginate_queryset(items)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
+            serializer = self.get_stream_serializer(page, period)
             return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(stream, many=True)
+        serializer = self.get_stream_serializer(items, period)
         return Response(serializer.data)
 
     def get_detail_stream(self, stream, content_type_id, object_id):
@@ -97,7 +137,7 @@ class ActionViewSet(DefaultModelViewSet):
         """
         content_type = get_object_or_404(ContentType, id=content_type_id)
         obj = content_type.get_object_for_this_type(pk=object_id)
-        return self.get_stream(stream(obj))
+        return self.get_stream(stream(obj, **self.get_stream_kwargs()))
 
     @action(detail=False, url_path='streams/my-actions', permission_classes=[permissions.IsAuthenticated], name='My Actions')
     def my_actions(self, request):
@@ -105,7 +145,7 @@ class ActionViewSet(DefaultModelViewSet):
         Returns all actions where the current user is the actor
         See models.actor_stream
         """
-        return self.get_stream(models.actor_stream(request.user))
+        return self.get_stream(models.actor_stream(request.user, **self.get_stream_kwargs()))
 
     @action(detail=False, url_path='streams/following',  permission_classes=[permissions.IsAuthenticated], name='Actions by followed users')
     def following(self, request):
@@ -114,7 +154,9 @@ class ActionViewSet(DefaultModelViewSet):
         See models.user_stream
         """
         kwargs = request.query_params.dict()
-        return self.get_stream(models.user_stream(request.user, **kwargs))
+        for name in ('before', 'after', 'limit', 'rollup'):
+            kwargs.pop(name, None)
+        return self.get_stream(models.user_stream(request.user, **kwargs, **self.get_stream_kwargs()))
 
     @action(detail=False, url_path='streams/model/(?P<content_type_id>[^/.]+)', name='Model activity stream')
     def model_stream(self, request, content_type_id):
@@ -123,7 +165,7 @@ class ActionViewSet(DefaultModelViewSet):
         See models.model_stream
         """
         content_type = get_object_or_404(ContentType, id=content_type_id)
-        return self.get_stream(models.model_stream(content_type.model_class()))
+        return self.get_stream(models.model_stream(content_type.model_class(), **self.get_stream_kwargs()))
 
     @action(detail=False, url_path='streams/actor/(?P<content_type_id>[^/.]+)/(?P<object_id>[^/.]+)', name='Actor activity stream')
     def actor_stream(self, request, content_type_id, object_id):
@@ -158,11 +200,24 @@ class ActionViewSet(DefaultModelViewSet):
         return self.get_detail_stream(models.any_stream, content_type_id, object_id)
 
 
-class FollowViewSet(DefaultModelViewSet):
+class FollowViewSet(mixins.DestroyModelMixin, DefaultModelViewSet):
     queryset = models.Follow.objects.order_by('-started', '-id').prefetch_related()
     serializer_class = serializers.FollowSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'destroy':
+            # users only delete their own follows
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
+
+    def perform_destroy(self, instance):
+        """
+        Deletes the follow through ``actstream.actions.delete_follow``, which updates the follow counters
+        """
+        delete_follow(instance)
+
     @action(detail=False, permission_classes=[permissions.IsAuthenticated], methods=['POST'])
     def follow(self, request):
         """
@@ -189,6 +244,26 @@ class FollowViewSet(DefaultModelViewSet):
         data = {'is_following': following}
         return Response(json.dumps(data))
 
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            url_path='following_map', name='True for each object the user is following')
+    def following_map(self, request):
+        """
+        Returns whether the current user is following each of the objects given as repeated
+        ``object=<content_type_id>:<object_id>`` query parameters, with a single query
+        """
+        try:
+            keys = [
+                (int(content_type_id), object_id)
+                for content_type_id, object_id in (value.split(':', 1) for value in request.GET.getlist('object'))
+            ]
+        except ValueError:
+            raise ParseError('Objects must be given as object=<content_type_id>:<object_id>')
+        following = models.Follow.objects.following_keys(request.user, keys, flag=request.GET.get('flag', ''))
+        return Response({
+            '%s:%s' % (content_type_id, object_id): (content_type_id, object_id) in following
+            for content_type_id, object_id in keys
+        })
+
     @action(detail=False, permission_classes=[permissions.IsAuthenticated],
             url_path='following', name='List of instances I follow')
     def following(self, request):
@@ -1,17 +1,102 @@
+import hashlib
 import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import quote
 
 from django.shortcuts import get_object_or_404
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import BadRequest, ObjectDoesNotExist
 from django.utils.feedgenerator import Atom1Feed, rfc3339_date
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.syndication.views import Feed, add_domain
 from django.contrib.sites.models import Site
 from django.utils.encoding import force_str
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.views.generic import View
-from django.http import HttpResponse, Http404
-from django.urls import reverse
+from django.http import HttpResponse, Http404, StreamingHttpResponse
+from django.urls import NoReverseMatch, reverse
 
+from actstream import contenttypes, settings as actstream_settings
+from actstream.cursors import encode_cursor, get_cursor_kwargs, page_cursors
+from actstream.gfk import get_content_type, identity_map
 from actstream.models import Action, model_stream, user_stream, any_stream
+from actstream.rollups import TRUNC_KINDS
+
+
+_format_context = ContextVar('actstream_format_context', default=None)
+
+# object id given to reverse() to build the URL prefixes of FormatContext
+OBJECT_ID_PLACEHOLDER = 'actstreamobjectid'
+# characters left unquoted by reverse(), the sub-delims and pchar of RFC 3986
+URL_SAFE = "!$&'()*+,;=/~:@"
+
+
+class FormatContext:
+    """
+    Values shared by the formatting of all the actions of a feed: the domain of the current
+    site, looked up once, and the URLs of the views of each content type, reversed once and
+    completed with the id of each object.
+    """
+
+    def __init__(self):
+        self._domain = None
+        self.templates = {}
+
+    @property
+    def domain(self):
+        if self._domain is None:
+            self._domain = Site.objects.get_current().domain
+        return self._domain
+
+    def reverse(self, viewname, *args):
+        """
+        Returns ``reverse(viewname, args=args)``, memoized per view name and all the arguments but the last one.
+        """
+        key = (viewname,) + args[:-1]
+        template = self.templates.get(key)
+        if template is None:
+            try:
+                template = reverse(viewname, None, args[:-1] + (OBJECT_ID_PLACEHOLDER,))
+            except NoReverseMatch:
+                # the pattern does not accept the placeholder, e.g. an int converter
+                template = False
+            if template and template.count(OBJECT_ID_PLACEHOLDER) != 1:
+                template = False
+            self.templates[key] = template
+        value = str(args[-1])
+        if template is False or '/' in value:
+            return reverse(viewname, None, args)
+        return template.replace(OBJECT_ID_PLACEHOLDER, quote(value, safe=URL_SAFE))
+
+
+def get_format_context():
+    """
+    Returns the active FormatContext, or a new one used by a single call if none is active.
+    """
+    return _format_context.get() or FormatContext()
+
+
+@contextmanager
+def format_context(context=None):
+    """
+    Activates the given or a new FormatContext for the actions formatted inside the block,
+    or reuses the one already active.
+    """
+    active = _format_context.get()
+    if active is not None and context is None:
+        yield active
+        return
+    token = _format_context.set(context or FormatContext())
+    try:
+        yield _format_context.get()
+    finally:
+        _format_context.reset(token)
+
+
+def set_headers(response, headers):
+    for name, value in headers.items():
+        response[name] = value
 
 
 class AbstractActivityStream:
@@ -32,12 +117,47 @@ class AbstractActivityStream:
         """
         raise NotImplementedError
 
+    def get_stream_kwargs(self, request):
+        """
+        Returns extra keyword arguments for the stream method.
+        """
+        return {}
+
     def items(self, *args, **kwargs):
         """
         Returns a queryset of Actions to use based on the stream method and object.
         """
         return self.get_stream()(self.get_object(*args, **kwargs))
 
+    def get_validators(self, request, items):
+        """
+        Returns the ETag and the last modified date of the feed of the given items, computed from the
+        (timestamp, id) of their newest action with a single row query instead of the whole stream.
+        """
+        newest = list(items.values_list('pk', 'timestamp')[:1])
+        pk, timestamp = newest[0] if newest else (None, None)
+        key = '|'.join(str(value) for value in (
+            request.get_full_path(), getattr(getattr(request, 'user', None), 'pk', None),
+            pk, timestamp and timestamp.isoformat(),
+        ))
+        return quote_etag(hashlib.md5(key.encode()).hexdigest()), timestamp
+
+    def get_conditional_response(self, request, items):
+        """
+        Returns the 304 (or 412) response answering the conditional headers of the request and the
+        ``ETag`` and ``Last-Modified`` headers of the feed. The response is None if the feed must be rendered.
+        """
+        etag, last_modified = self.get_validators(request, items)
+        headers = {'ETag': etag}
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified and int(last_modified.timestamp())
+        )
+        if response is not None:
+            set_headers(response, headers)
+        return response, headers
+
     def get_uri(self, action, obj=None, date=None):
         """
         Returns an RFC3987 IRI ID for the given object, action and date.
@@ -45,7 +165,7 @@ class AbstractActivityStream:
         if date is None:
             date = action.timestamp
         date = date.strftime('%Y-%m-%d')
-        return 'tag:{},{}:{}'.format(Site.objects.get_current().domain, date,
+        return 'tag:{},{}:{}'.format(get_format_context().domain, date,
                                      self.get_url(action, obj, False))
 
     def get_url(self, action, obj=None, domain=True):
@@ -53,15 +173,16 @@ class AbstractActivityStream:
         Returns an RFC3987 IRI for a HTML representation of the given object, action.
         If domain is true, the current site's domain will be added.
         """
+        context = get_format_context()
         if not obj:
-            url = reverse('actstream_detail', None, (action.pk,))
+            url = context.reverse('actstream_detail', action.pk)
         elif hasattr(obj, 'get_absolute_url'):
             url = obj.get_absolute_url()
         else:
-            ctype = ContentType.objects.get_for_model(obj)
-            url = reverse('actstream_actor', None, (ctype.pk, obj.pk))
+            ctype = get_content_type(obj)
+            url = context.reverse('actstream_actor', ctype.pk, obj.pk)
         if domain:
-            return add_domain(Site.objects.get_current().domain, url)
+            return add_domain(context.domain, url)
         return url
 
     def format(self, action):
@@ -84,6 +205,23 @@ class AbstractActivityStream:
             item['object'] = self.format_action_object(action)
         return item
 
+    def format_rollup(self, rollup):
+        """
+        Returns a formatted dictionary for the given group of actions (see ``actstream.rollups``).
+        """
+        item = {
+            'verb': rollup.verb,
+            'published': rfc3339_date(rollup.timestamp),
+            'title': str(rollup),
+            'totalItems': rollup.count,
+            'actorCount': rollup.actor_count,
+            'actors': [self.format_actor(action) for action in rollup.actor_actions],
+            'items': [self.format(action) for action in rollup.actions],
+        }
+        if rollup.target:
+            item['target'] = self.format_target(rollup.actions[0])
+        return item
+
     def format_item(self, action, item_type='actor'):
         """
         Returns a formatted dictionary for an individual item based on the action and item_type.
@@ -92,7 +230,7 @@ class AbstractActivityStream:
         return {
             'id': self.get_uri(action, obj),
             'url': self.get_url(action, obj),
-            'objectType': ContentType.objects.get_for_model(obj).name,
+            'objectType': get_content_type(obj).name,
             'displayName': str(obj)
         }
 
@@ -204,22 +342,145 @@ class ActivityStreamsBaseFeed(AbstractActivityStream, Feed):
     def items(self, obj):
         return self.get_stream()(obj)[:30]
 
+    def __call__(self, request, *args, **kwargs):
+        try:
+            obj = self.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            raise Http404('Feed object does not exist.')
+        not_modified, headers = self.get_conditional_response(request, self.items(obj))
+        if not_modified is not None:
+            return not_modified
+        # the body of Feed.__call__, with the object resolved once
+        with format_context():
+            feedgen = self.get_feed(obj, request)
+            response = HttpResponse(content_type=feedgen.content_type)
+            feedgen.write(response, 'utf-8')
+        set_headers(response, headers)
+        return response
+
 
 class JSONActivityFeed(AbstractActivityStream, View):
     """
     Feed that generates feeds compatible with the v1.0 JSON Activity Stream spec
+
+    With ``streaming`` the response is a ``StreamingHttpResponse`` writing the actions as they are
+    read from the database in chunks of ``chunk_size``. ``total_items`` adds the number of
+    written actions to the end of the feed. They default to ``ACTSTREAM_SETTINGS['JSON_FEED']``.
+
+    The ``rollup`` query parameter groups the actions of the page by verb, target and period
+    (eg ``?rollup=hour``), such feeds are not streamed.
     """
+    streaming = None
+    chunk_size = None
+    total_items = None
 
-    def dispatch(self, request, *args, **kwargs):
-        return HttpResponse(self.serialize(request, *args, **kwargs),
-                            content_type='application/json')
+    def get_option(self, name):
+        value = getattr(self, name)
+        if value is None:
+            value = actstream_settings.JSON_FEED_SETTINGS[name.upper()]
+        return value
 
-    def serialize(self, request, *args, **kwargs):
+    def dispatch(self, request, *args, **kwargs):
+        # the stream is built once for the validators and the body
         items = self.items(request, *args, **kwargs)
-        return json.dumps({
-            'totalItems': len(items),
-            'items': [self.format(action) for action in items]
-        }, indent=4 if 'pretty' in request.GET or 'pretty' in request.POST else None)
+        not_modified, headers = self.get_conditional_response(request, items)
+        if not_modified is not None:
+            return not_modified
+        if self.get_option('streaming') and not self.get_rollup(request):
+            response = StreamingHttpResponse(self.stream(request, *args, items=items, **kwargs),
+                                             content_type='application/json')
+        else:
+            response = HttpResponse(self.serialize(request, *args, items=items, **kwargs),
+                                    content_type='application/json')
+        set_headers(response, headers)
+        return response
+
+    def get_stream_kwargs(self, request):
+        """
+        Returns the keyset pagination arguments from the ``before``, ``after`` and ``limit`` query parameters.
+        """
+        try:
+            return get_cursor_kwargs(request.GET)
+        except ValueError as exc:
+            raise BadRequest(exc)
+
+    def get_indent(self, request):
+        return 4 if 'pretty' in request.GET or 'pretty' in request.POST else None
+
+    def get_rollup(self, request):
+        """
+        Returns the period of the ``rollup`` query parameter, or None if the actions are not grouped.
+        """
+        period = request.GET.get('rollup')
+        if period and period not in TRUNC_KINDS:
+            raise BadRequest('Invalid rollup period: %r' % period)
+        return period or None
+
+    def items(self, request, *args, **kwargs):
+        return self.get_stream()(
+            self.get_object(request, *args, **kwargs),
+            **self.get_stream_kwargs(request)
+        )
+
+    def serialize(self, request, *args, items=None, **kwargs):
+        """
+        Returns the JSON of the feed of the given ``items`` stream, built from the arguments if None.
+        """
+        period = self.get_rollup(request)
+        with identity_map(), format_context():
+            if items is None:
+                items = self.items(request, *args, **kwargs)
+            if period:
+                rollups = items.rollup(
+                    period, limit=self.get_stream_kwargs(request).get('_limit') or actstream_settings.ROLLUP_LIMIT
+                )
+                data = {
+                    'totalItems': len(rollups),
+                    'items': [self.format_rollup(rollup) for rollup in rollups]
+                }
+            else:
+                data = {
+                    'totalItems': len(items),
+                    'items': [self.format(action) for action in items]
+                }
+        stream_kwargs = self.get_stream_kwargs(request)
+        data.update(page_cursors(
+            items, stream_kwargs.get('_limit'), stream_kwargs.get('_before'), stream_kwargs.get('_after')
+        ))
+        return json.dumps(data, indent=self.get_indent(request))
+
+    def stream(self, request, *args, items=None, **kwargs):
+        """
+        Returns an iterator of the chunks of the serialized feed, reading the actions with ``iterator()``.
+        The generic relations of each chunk are fetched together.
+        """
+        # evaluated before the response starts, so that errors are still raised by the view
+        if items is None:
+            items = self.items(request, *args, **kwargs)
+        stream_kwargs = self.get_stream_kwargs(request)
+        newer = stream_kwargs.get('_after') and not stream_kwargs.get('_before')
+        return self._stream(items, stream_kwargs.get('_limit'), self.get_indent(request), newer)
+
+    def _stream(self, items, limit, indent, newer=False):
+        separator = ',\n' if indent else ','
+        yield '{"items": ['
+        count, first, last = 0, None, None
+        # activated around each action only, the response is iterated out of the view
+        context = FormatContext()
+        for action in items.iterator(chunk_size=self.get_option('chunk_size')):
+            with format_context(context):
+                item = self.format(action)
+            yield (separator if count else '') + json.dumps(item, indent=indent)
+            count, first, last = count + 1, first or action, action
+        yield ']'
+        if self.get_option('total_items'):
+            yield ', "totalItems": %d' % count
+        # see actstream.cursors.page_cursors
+        if limit and count >= limit and newer:
+            yield ', "prev": %s' % json.dumps(encode_cursor(first))
+        elif limit and count >= limit:
+            yield ', "next": %s' % json.dumps(encode_cursor(last))
+        yield '}'
 
 
 class ModelActivityMixin:
@@ -264,7 +525,7 @@ class UserActivityMixin:
         return user_stream
 
     def get_stream_kwargs(self, request):
-        stream_kwargs = {}
+        stream_kwargs = super().get_stream_kwargs(request)
         if 'with_user_activity' in request.GET:
             stream_kwargs['with_user_activity'] = request.GET['with_user_activity'].lower() == 'true'
         return stream_kwargs
@@ -279,8 +540,8 @@ class CustomStreamMixin:
     def get_stream(self):
         return getattr(Action.objects, self.name)
 
-    def items(self, *args, **kwargs):
-        return self.get_stream()(*args[1:], **kwargs)
+    def items(self, request, *args, **kwargs):
+        return self.get_stream()(*args, **kwargs, **self.get_stream_kwargs(request))
 
 
 class ModelActivityFeed(ModelActivityMixin, ActivityStreamsBaseFeed):
@@ -289,7 +550,7 @@ class ModelActivityFeed(ModelActivityMixin, ActivityStreamsBaseFeed):
         return 'Activity feed from %s' % model.__name__
 
     def link(self, model):
-        ctype = ContentType.objects.get_for_model(model)
+        ctype = contenttypes.get_content_type(model)
         return reverse('actstream_model', None, (ctype.pk,))
 
     def description(self, model):
@@ -317,7 +578,7 @@ class UserActivityFeed(UserActivityMixin, ActivityStreamsBaseFeed):
             return reverse('actstream')
         if hasattr(user, 'get_absolute_url'):
             return user.get_absolute_url()
-        ctype = ContentType.objects.get_for_model(user)
+        ctype = contenttypes.get_content_type(user)
         return reverse('actstream_actor', None, (ctype.pk, user.pk))
 
     def description(self, user):
@@ -0,0 +1,186 @@
+from bisect import insort
+from threading import Lock
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def get_score(action):
+    """
+    Returns the sorted set score of an action, its timestamp in seconds.
+    """
+    return action.timestamp.timestamp()
+
+
+class BaseFeedStore:
+    """
+    Interface of the sorted set stores of the user feeds read when ``FEED_MODE`` is ``'store'``.
+    A feed is a set of action ids scored by their timestamp, trimmed to the ``max_length`` newest ids.
+    """
+
+    def __init__(self, max_length=1000, **options):
+        self.max_length = max_length
+        self.options = options
+
+    def add(self, user_id, items):
+        """
+        Adds the (action id, score) pairs to the feed of the user and trims it.
+        """
+        raise NotImplementedError
+
+    def remove(self, user_id, action_ids):
+        """
+        Removes the given action ids from the feed of the user.
+        """
+        raise NotImplementedError
+
+    def get(self, user_id, offset=0, limit=None):
+        """
+        Returns the action ids of the feed of the user, newest first.
+        """
+        raise NotImplementedError
+
+    def clear(self, user_id):
+        """
+        Deletes the feed of the user.
+        """
+        raise NotImplementedError
+
+    def fanout(self, *actions):
+        """
+        Adds each public action to the feed of every user following its actor, target or action_object.
+        """
+        Follow = apps.get_model('actstream', 'follow')
+        feeds = {}
+        actions = [action for action in actions if action.public and action.pk is not None]
+        for action, user_ids in zip(actions, Follow.objects.followers_by_action(actions)):
+            for user_id in user_ids:
+                feeds.setdefault(user_id, []).append((action.pk, get_score(action)))
+        for user_id, items in feeds.items():
+            self.add(user_id, items)
+
+    def follow(self, user, obj):
+        """
+        Adds the newest actions involving obj that the user now follows to the feed of the user.
+        Returns the number of actions added.
+        """
+        Action = apps.get_model('actstream', 'action')
+        involving = apps.get_model('actstream', 'feedentry').objects._involving(obj)
+        actions = Action.objects._follow_stream(user).filter(involving).order_by('-timestamp', '-pk')[:self.max_length]
+        items = [(pk, timestamp.timestamp()) for pk, timestamp in actions.values_list('pk', 'timestamp')]
+        if items:
+            self.add(user.pk, items)
+        return len(items)
+
+    def unfollow(self, user, obj):
+        """
+        Removes the actions involving obj that the user no longer follows from the feed of the user.
+        Returns the number of actions removed.
+        """
+        Action = apps.get_model('actstream', 'action')
+        involving = apps.get_model('actstream', 'feedentry').objects._involving(obj)
+        action_ids = list(Action.objects.filter(involving, pk__in=self.get(user.pk)).exclude(
+            pk__in=Action.objects._follow_stream(user).values('pk')
+        ).values_list('pk', flat=True))
+        if action_ids:
+            self.remove(user.pk, action_ids)
+        return len(action_ids)
+
+    def rebuild(self, user):
+        """
+        Regenerates the feed of the user from the Follow and Action tables.
+        Returns the number of actions added.
+        """
+        Action = apps.get_model('actstream', 'action')
+        actions = Action.objects._follow_stream(user).order_by('-timestamp', '-pk')[:self.max_length]
+        items = [(pk, timestamp.timestamp()) for pk, timestamp in actions.values_list('pk', 'timestamp')]
+        self.clear(user.pk)
+        if items:
+            self.add(user.pk, items)
+        return len(items)
+
+
+_memory_feeds = {}
+_memory_lock = Lock()
+
+
+class MemoryFeedStore(BaseFeedStore):
+    """
+    Store keeping the feeds in the memory of the process, for tests and single process deployments.
+    Stores with the same ``name`` option share their feeds.
+    """
+
+    def __init__(self, name='default', **options):
+        super().__init__(**options)
+        with _memory_lock:
+            self.feeds = _memory_feeds.setdefault(name, {})
+
+    def add(self, user_id, items):
+        with _memory_lock:
+            feed = self.feeds.setdefault(user_id, [])
+            members = {pk for score, pk in feed}
+            for pk, score in items:
+                if pk not in members:
+                    insort(feed, (score, pk))
+                    members.add(pk)
+            del feed[:-self.max_length]
+
+    def remove(self, user_id, action_ids):
+        action_ids = set(action_ids)
+        with _memory_lock:
+            feed = self.feeds.get(user_id, [])
+            feed[:] = [item for item in feed if item[1] not in action_ids]
+
+    def get(self, user_id, offset=0, limit=None):
+        with _memory_lock:
+            feed = self.feeds.get(user_id, [])
+            stop = None if limit is None else offset + limit
+            return [pk for score, pk in reversed(feed)][offset:stop]
+
+    def clear(self, user_id):
+        with _memory_lock:
+            self.feeds.pop(user_id, None)
+
+
+class RedisFeedStore(BaseFeedStore):
+    """
+    Store keeping each feed in a Redis sorted set. The ``url`` option is the address of the
+    Redis server and the keys of the feeds start with the ``prefix`` option.
+    Requires the ``redis`` package.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='actstream:feed:', client=None, **options):
+        super().__init__(**options)
+        if client is None:
+            if redis is None:
+                raise ImproperlyConfigured('RedisFeedStore requires the redis package.')
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def key(self, user_id):
+        return '%s%s' % (self.prefix, user_id)
+
+    def add(self, user_id, items):
+        key = self.key(user_id)
+        pipeline = self.client.pipeline()
+        pipeline.zadd(key, {pk: score for pk, score in items})
+        # keep the max_length highest scores
+        pipeline.zremrangebyrank(key, 0, -self.max_length - 1)
+        pipeline.execute()
+
+    def remove(self, user_id, action_ids):
+        if action_ids:
+            self.client.zrem(self.key(user_id), *action_ids)
+
+    def get(self, user_id, offset=0, limit=None):
+        stop = -1 if limit is None else offset + limit - 1
+        return [int(pk) for pk in self.client.zrevrange(self.key(user_id), offset, stop)]
+
+    def clear(self, user_id):
+        self.client.delete(self.key(user_id))
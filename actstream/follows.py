@@ -1,4 +1,6 @@
+from django.contrib.auth import get_user_model
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 
 from actstream.models import Follow
 
@@ -10,7 +12,17 @@ def delete_orphaned_follows(sender, instance=None, **kwargs):
     if str(sender._meta) == 'migrations.migration':
         return
 
+    follows = Follow.objects.none()
+    if isinstance(instance, get_user_model()):
+        # deleted with the user by the cascade
+        follows = Follow.objects.filter(user=instance)
     try:
-        Follow.objects.for_object(instance).delete()
+        follows |= Follow.objects.for_object(instance)
     except ImproperlyConfigured:  # raised by actstream for irrelevant models
         pass
+
+    with transaction.atomic():
+        rows = list(follows.values_list('user_id', 'content_type_id', 'object_id', 'flag'))
+        if rows:
+            Follow.objects.filter(pk__in=follows.values('pk')).delete()
+            Follow.objects.update_counts(rows, -1)
@@ -1,8 +1,120 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
 from django.db.models import Manager
-from django.db.models.query import QuerySet, EmptyQuerySet
+from django.db.models.query import QuerySet, EmptyQuerySet, ModelIterable
 from django.contrib.contenttypes.fields import GenericForeignKey
 
-from actstream import settings
+from actstream import contenttypes, settings
+from actstream.rollups import rollup
+
+_identity_map = ContextVar('actstream_identity_map', default=None)
+
+
+class IdentityMap:
+    """
+    The objects of generic relations loaded in the current scope (eg a request),
+    by content type id and primary key, so each object is fetched once and shared
+    by all the actions and follows referencing it.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.content_types = {}
+
+    def get_content_type(self, obj):
+        """
+        Returns the ContentType of the object, looked up once per model.
+        """
+        if obj.__class__ not in self.content_types:
+            self.content_types[obj.__class__] = contenttypes.get_content_type(obj)
+        return self.content_types[obj.__class__]
+
+    def fetch(self, instances, gfk_fields, hints=None):
+        """
+        Sets the related objects of the generic foreign keys on the instances,
+        querying only the objects not already in the map, one query per content type.
+
+        ``hints`` maps lowercase model labels to the arguments of ``only`` and
+        ``select_related`` applied to the queries of these models.
+        """
+        keys = []
+        missing = defaultdict(set)
+        for instance in instances:
+            for field in gfk_fields:
+                content_type_id = getattr(instance, instance._meta.get_field(field.ct_field).attname)
+                object_id = getattr(instance, field.fk_field)
+                if settings.USE_INT_OBJECT_IDS:
+                    # typed copy of the object id, if any
+                    object_id = getattr(instance, '%s_int' % field.fk_field, None) or object_id
+                key = None
+                if content_type_id is not None and object_id is not None:
+                    key = (content_type_id, str(object_id))
+                    if key not in self.objects:
+                        missing[content_type_id].add(object_id)
+                keys.append((instance, field, key))
+
+        for content_type_id, object_ids in missing.items():
+            model = contenttypes.get_model(content_type_id)
+            if model is not None:
+                queryset = model._base_manager.db_manager(instances[0]._state.db).filter(pk__in=object_ids)
+                for obj in apply_hints(queryset, (hints or {}).get(model._meta.label_lower)):
+                    self.objects[(content_type_id, str(obj.pk))] = obj
+            # remember the deleted objects as well
+            for object_id in object_ids:
+                self.objects.setdefault((content_type_id, str(object_id)), None)
+
+        for instance, field, key in keys:
+            field.set_cached_value(instance, None if key is None else self.objects[key])
+
+
+def apply_hints(queryset, hints):
+    """
+    Applies the ``only`` and ``select_related`` hints of a model to a queryset.
+    """
+    if not hints:
+        return queryset
+    if hints.get('only'):
+        queryset = queryset.only(*hints['only'])
+    if hints.get('select_related'):
+        queryset = queryset.select_related(*hints['select_related'])
+    return queryset
+
+
+def get_identity_map():
+    """
+    Returns the active IdentityMap or None.
+    """
+    return _identity_map.get()
+
+
+@contextmanager
+def identity_map():
+    """
+    Activates an IdentityMap for the generic relations fetched inside the block,
+    or reuses the one already active.
+    """
+    active = _identity_map.get()
+    if active is not None:
+        yield active
+        return
+    token = _identity_map.set(IdentityMap())
+    try:
+        yield _identity_map.get()
+    finally:
+        _identity_map.reset(token)
+
+
+def get_content_type(obj):
+    """
+    Returns the ContentType of the object, through the active IdentityMap if any.
+    """
+    active = _identity_map.get()
+    if active is None:
+        return contenttypes.get_content_type(obj)
+    return active.get_content_type(obj)
 
 
 class GFKManager(Manager):
@@ -23,10 +135,27 @@ class GFKQuerySet(QuerySet):
     """
     A QuerySet with a fetch_generic_relations() method to bulk fetch
     all generic related items.  Similar to select_related(), but for
-    generic foreign keys. This wraps QuerySet.prefetch_related.
+    generic foreign keys. The objects of all the generic foreign keys are
+    fetched together, once per object and with one query per content type.
     """
-
-    def fetch_generic_relations(self, *args):
+    _gfk_fields = ()
+    _gfk_hints = None
+    # the (timestamp, id) fields streams are ordered and paginated by, see actstream.cursors
+    _cursor_fields = ('timestamp', 'pk')
+    # the querysets a stream is read from with a union, see actstream.cursors.paginate_union
+    _union_branches = None
+
+    def fetch_generic_relations(self, *args, hints=None):
+        """
+        Fetches the objects of the generic foreign keys named in args (or all of them)
+        when the queryset is evaluated.
+
+        ``hints`` maps models (or their labels) to dictionaries with the ``only`` and
+        ``select_related`` arguments used to fetch them, updating the
+        ``ACTSTREAM_SETTINGS['GFK_PREFETCH_HINTS']`` setting::
+
+            stream.fetch_generic_relations(hints={User: {'only': ['username']}})
+        """
         qs = self._clone()
 
         if not settings.FETCH_RELATIONS:
@@ -39,13 +168,83 @@ class GFKQuerySet(QuerySet):
         if args:
             gfk_fields = [g for g in gfk_fields if g.name in args]
 
-        return qs.prefetch_related(*[g.name for g in gfk_fields])
+        qs._gfk_fields = tuple(gfk_fields)
+        if hints:
+            qs._gfk_hints = dict(qs._gfk_hints or {})
+            for model, model_hints in hints.items():
+                label = model if isinstance(model, str) else model._meta.label
+                qs._gfk_hints[label.lower()] = model_hints
+        return qs
+
+    def rollup(self, period='hour', sample=3, limit=None):
+        """
+        Returns the groups of the actions of the stream with the same verb and target in the same period,
+        see ``actstream.rollups.rollup``::
+
+            user_stream(request.user, _limit=100).rollup('day')
+        """
+        return rollup(self, period, sample, limit)
+
+    def _fetch_generic_relations(self, instances):
+        if not self._gfk_fields or not instances or self._iterable_class is not ModelIterable:
+            return
+        hints = settings.GFK_PREFETCH_HINTS
+        if self._gfk_hints:
+            hints = dict(hints, **self._gfk_hints)
+        (_identity_map.get() or IdentityMap()).fetch(instances, self._gfk_fields, hints)
+
+    def _fetch_all(self):
+        fetch = self._result_cache is None
+        super(GFKQuerySet, self)._fetch_all()
+        if fetch:
+            self._fetch_generic_relations(self._result_cache)
+
+    def iterator(self, chunk_size=None):
+        if not self._gfk_fields:
+            return super(GFKQuerySet, self).iterator(chunk_size)
+        return self._gfk_iterator(chunk_size or 2000)
+
+    def _gfk_iterator(self, chunk_size):
+        iterator = super(GFKQuerySet, self).iterator(chunk_size)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            self._fetch_generic_relations(chunk)
+            yield from chunk
 
     def _clone(self, klass=None, **kwargs):
-        return super(GFKQuerySet, self)._clone()
+        clone = super(GFKQuerySet, self)._clone()
+        clone._gfk_fields = self._gfk_fields
+        clone._gfk_hints = self._gfk_hints
+        clone._cursor_fields = self._cursor_fields
+        clone._union_branches = self._union_branches
+        return clone
+
+    def _filter_or_exclude(self, negate, args, kwargs):
+        clone = super(GFKQuerySet, self)._filter_or_exclude(negate, args, kwargs)
+        if self._union_branches is not None:
+            # the union selects the same actions as the queryset
+            clone._union_branches = [
+                branch._filter_or_exclude(negate, args, kwargs) for branch in self._union_branches
+            ]
+        return clone
+
+    def __and__(self, other):
+        return self._combined(super(GFKQuerySet, self).__and__(other), other)
+
+    def __or__(self, other):
+        return self._combined(super(GFKQuerySet, self).__or__(other), other)
+
+    def _combined(self, combined, other):
+        # the branches do not select the other queryset
+        if combined is not self and combined is not other:
+            combined._union_branches = None
+        return combined
 
     def none(self):
         clone = self._clone({'klass': EmptyGFKQuerySet})
+        clone._union_branches = None
         if hasattr(clone.query, 'set_empty'):
             clone.query.set_empty()
         return clone
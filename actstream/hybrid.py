@@ -0,0 +1,103 @@
+"""
+Hybrid fan-out of the user feeds, used when ``ACTSTREAM_SETTINGS['FEED_MODE']`` is ``'hybrid'``.
+
+Actions are written to the ``FeedEntry`` rows of the followers like in ``'write'`` mode,
+except for the actions of *pulled* actors, the objects with at least ``THRESHOLD`` followers.
+Those are merged into the user streams when they are read. The set of pulled actors is
+computed from the ``Follow`` table by the ``actstream_refresh_pulled`` management command,
+to run every ``REFRESH`` seconds, and requests only read it from the cache.
+"""
+import time
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Count, Q
+
+from actstream import settings as actstream_settings
+from actstream.cache import get_cache
+
+PULLED_KEY = 'actstream:pulled'
+LOCK_KEY = 'actstream:pulled:lock'
+
+
+def count_followers(threshold):
+    """
+    Returns the set of (content type id, object id) of the objects followed by at least ``threshold`` users.
+    """
+    Follow = apps.get_model('actstream', 'follow')
+    rows = Follow.objects.values('content_type_id', 'object_id').annotate(
+        followers=Count('user_id', distinct=True)
+    ).filter(followers__gte=threshold).values_list('content_type_id', 'object_id')
+    return {(content_type_id, str(object_id)) for content_type_id, object_id in rows}
+
+
+def get_pulled_actors():
+    """
+    Returns the cached set of (content type id, object id) of the pulled actors.
+    The set is only read here, it is computed by ``refresh_pulled_actors``; until then no actor is pulled.
+    """
+    state = get_cache().get(PULLED_KEY)
+    return state['actors'] if state is not None else frozenset()
+
+
+def refresh_pulled_actors(force=False):
+    """
+    Computes the set of pulled actors again if it is older than ``HYBRID['REFRESH']`` seconds
+    or ``force`` is True, and fans out the actors which are no longer pulled to the feeds of their followers.
+    Returns the tuple of the new set and the pushed actors, or None if the set is recent enough
+    or another process is refreshing it.
+    """
+    settings = actstream_settings.HYBRID_SETTINGS
+    cache = get_cache()
+    state = cache.get(PULLED_KEY)
+    if state is not None and not force and time.time() - state['refreshed'] < settings['REFRESH']:
+        return None
+    if not cache.add(LOCK_KEY, True, settings['REFRESH']):
+        return None
+    try:
+        actors = frozenset(count_followers(settings['THRESHOLD']))
+        cache.set(PULLED_KEY, {'actors': actors, 'refreshed': time.time()}, None)
+        pushed = state['actors'] - actors if state is not None else frozenset()
+        for content_type_id, object_id in pushed:
+            push_actor(content_type_id, object_id)
+    finally:
+        cache.delete(LOCK_KEY)
+    return actors, pushed
+
+
+def is_pulled(action):
+    """
+    Returns True if the actor of the action is pulled, so that the action is not fanned out.
+    """
+    return (action.actor_content_type_id, str(action.actor_object_id)) in get_pulled_actors()
+
+
+def pulled_query():
+    """
+    Returns a Q object of the actions of pulled actors, or None if there are none.
+    """
+    object_ids = {}
+    for content_type_id, object_id in get_pulled_actors():
+        object_ids.setdefault(content_type_id, []).append(object_id)
+    q = None
+    for content_type_id, ids in object_ids.items():
+        lookup = Q(actor_content_type_id=content_type_id, actor_object_id__in=ids)
+        q = lookup if q is None else q | lookup
+    return q
+
+
+def push_actor(content_type_id, object_id):
+    """
+    Creates the FeedEntries of the past actions of an actor for all its followers,
+    when it is no longer pulled.
+    """
+    FeedEntry = apps.get_model('actstream', 'feedentry')
+    Follow = apps.get_model('actstream', 'follow')
+    try:
+        obj = ContentType.objects.get_for_id(content_type_id).get_object_for_this_type(pk=object_id)
+    except (AttributeError, ObjectDoesNotExist):
+        # the model or the object was deleted
+        return
+    for user in Follow.objects.followers(obj).iterator():
+        FeedEntry.objects.add(user, obj)
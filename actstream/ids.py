@@ -0,0 +1,70 @@
+"""
+Helpers for the typed ``*_object_id_int`` columns of Action and Follow.
+
+The columns are always written alongside the ``CharField`` object ids. When
+``ACTSTREAM_SETTINGS['USE_INT_OBJECT_IDS']`` is ``True`` lookups of objects with
+integer primary keys use them, objects with other primary keys keep using the
+``CharField`` columns.
+"""
+import re
+
+from django.db import models
+
+from actstream import settings as actstream_settings
+
+INT_RE = re.compile(r'^-?\d{1,18}$')
+
+# the CharField object id columns with a typed copy
+OBJECT_ID_FIELDS = ('actor_object_id', 'target_object_id', 'action_object_object_id', 'object_id')
+
+
+def has_int_pk(model):
+    """
+    Returns True if the primary key of the model is an integer.
+    """
+    pk = model._meta.pk
+    while pk.is_relation:
+        # multi-table inheritance
+        pk = pk.target_field
+    return isinstance(pk, models.IntegerField)
+
+
+def to_int(object_id):
+    """
+    Returns the object id as an integer, or None if it is not one.
+    """
+    if isinstance(object_id, int) and not isinstance(object_id, bool):
+        return object_id
+    if isinstance(object_id, str) and INT_RE.match(object_id):
+        return int(object_id)
+    return None
+
+
+def set_int_object_ids(instance):
+    """
+    Copies the object ids of an Action or Follow instance to their typed columns.
+    """
+    for name in OBJECT_ID_FIELDS:
+        if hasattr(instance, '%s_int' % name):
+            setattr(instance, '%s_int' % name, to_int(getattr(instance, name)))
+
+
+def uses_int_ids(model):
+    """
+    Returns True if lookups of objects of the model use the typed columns.
+    """
+    return bool(actstream_settings.USE_INT_OBJECT_IDS and model is not None and has_int_pk(model))
+
+
+def object_id_field(name, model):
+    """
+    Returns the name of the column to look up objects of the model in,
+    ``name`` being one of ``OBJECT_ID_FIELDS``.
+
+    Example::
+
+        Action.objects.filter(**{object_id_field('actor_object_id', User): user.pk})
+    """
+    if uses_int_ids(model):
+        return '%s_int' % name
+    return name
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from actstream.ids import set_int_object_ids
+from actstream.models import Action, Follow
+
+
+class Command(BaseCommand):
+    help = 'Copies the object ids of existing actions and follows to their integer columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows updated per query.'
+        )
+
+    def backfill(self, model, fields, batch_size):
+        int_fields = ['%s_int' % name for name in fields]
+        missing = Q()
+        for name in fields:
+            missing |= Q(**{'%s__isnull' % name: False, '%s_int__isnull' % name: True})
+        queryset = model.objects.filter(missing).only('pk', *fields, *int_fields).order_by('pk')
+
+        last, total = None, 0
+        while True:
+            batch = queryset if last is None else queryset.filter(pk__gt=last)
+            batch = list(batch[:batch_size])
+            if not batch:
+                return total
+            for instance in batch:
+                set_int_object_ids(instance)
+            model.objects.bulk_update(batch, int_fields)
+            total += len(batch)
+            last = batch[-1].pk
+
+    def handle(self, *args, **options):
+        for model, fields in (
+            (Action, ('actor_object_id', 'target_object_id', 'action_object_object_id')),
+            (Follow, ('object_id',)),
+        ):
+            count = self.backfill(model, fields, options['batch_size'])
+            self.stdout.write('Updated %d %s rows' % (count, model._meta.label))
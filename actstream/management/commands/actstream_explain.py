@@ -0,0 +1,91 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from actstream import settings as actstream_settings
+from actstream.managers import USER_STREAM_STRATEGIES
+from actstream.models import Action, Follow
+
+
+SEQUENTIAL_SCANS = {
+    'postgresql': re.compile(r'Seq Scan on actstream_action\b'),
+    'sqlite': re.compile(r'SCAN (TABLE )?actstream_action\b(?! USING)'),
+    'mysql': re.compile(r'\bactstream_action\s+\S+\s+ALL\b'),
+}
+
+
+def is_sequential_scan(plan, vendor=None):
+    """
+    Returns True if the query plan reads the whole actstream_action table.
+    """
+    pattern = SEQUENTIAL_SCANS.get(vendor or connection.vendor)
+    return bool(pattern and pattern.search(plan))
+
+
+class Command(BaseCommand):
+    help = 'Reports the query plans of the builtin streams that fall back to a sequential scan of the actions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=30,
+            help='Page size of the explained streams.'
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Exit with an error if any stream uses a sequential scan.'
+        )
+        parser.add_argument(
+            '--strategy', action='append', dest='strategies', choices=USER_STREAM_STRATEGIES, default=[],
+            help='Query strategy of the user stream to explain. May be repeated, defaults to all strategies.'
+        )
+
+    def get_streams(self, strategies=USER_STREAM_STRATEGIES):
+        """
+        Returns (name, stream, object, kwargs) tuples with sample objects taken from the latest actions.
+        The user stream is explained once per query strategy.
+        """
+        latest = Action.objects.order_by('-timestamp', '-pk')
+        streams = []
+        action = latest.first()
+        if action is not None:
+            streams += [
+                ('actor_stream', Action.objects.actor, action.actor),
+                ('any_stream', Action.objects.any, action.actor),
+                ('model_stream', Action.objects.model_actions, action.actor.__class__),
+            ]
+        for name in ('target', 'action_object'):
+            action = latest.filter(**{'%s_content_type__isnull' % name: False}).first()
+            if action is not None:
+                streams.append(('%s_stream' % name, getattr(Action.objects, name), getattr(action, name)))
+        streams = [(name, stream, obj, {}) for name, stream, obj in streams]
+        follow = Follow.objects.order_by('-started', '-pk').first()
+        if follow is not None:
+            if actstream_settings.FEED_MODE in ('write', 'hybrid'):
+                streams.append(('user_stream[feed]', Action.objects.user, follow.user, {}))
+            else:
+                streams.extend(
+                    ('user_stream[%s]' % strategy, Action.objects.user, follow.user, {'strategy': strategy})
+                    for strategy in strategies
+                )
+        return [stream for stream in streams if stream[2] is not None]
+
+    def handle(self, *args, **options):
+        streams = self.get_streams(options['strategies'] or USER_STREAM_STRATEGIES)
+        if not streams:
+            self.stdout.write('No actions to explain')
+            return
+
+        scans = []
+        for name, stream, obj, kwargs in streams:
+            plan = stream(obj, _limit=options['limit'], **kwargs).explain()
+            if is_sequential_scan(plan):
+                scans.append(name)
+                self.stdout.write('%s: sequential scan' % name)
+            else:
+                self.stdout.write('%s: ok' % name)
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if scans and options['fail']:
+            raise CommandError('Sequential scans in streams: %s' % ', '.join(scans))
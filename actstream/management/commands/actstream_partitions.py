@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.timezone import localdate
+
+from actstream import partitions, settings as actstream_settings
+from actstream.models import Action
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates the partitions of the upcoming periods of the partitioned Action table on PostgreSQL '
+        'and detaches the partitions older than the kept periods'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=None,
+            help='Number of periods after the current one to create partitions for, defaults to PARTITION["AHEAD"].'
+        )
+        parser.add_argument(
+            '--keep', type=int, default=None,
+            help='Number of periods, including the current one, whose partitions are kept attached. '
+                 'Defaults to PARTITION["KEEP"], older partitions are not detached if it is not set.'
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database of the Action table.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Print the SQL statements without running them.'
+        )
+
+    def handle(self, *args, **options):
+        settings = actstream_settings.PARTITION_SETTINGS
+        ahead = settings['AHEAD'] if options['ahead'] is None else options['ahead']
+        keep = settings['KEEP'] if options['keep'] is None else options['keep']
+        if ahead < 0 or (keep is not None and keep < 1):
+            raise CommandError('--ahead must be positive and --keep at least 1.')
+
+        connection = connections[options['database']]
+        table = Action._meta.db_table
+        if connection.vendor != 'postgresql':
+            raise CommandError('The Action table can only be partitioned on PostgreSQL.')
+        if not partitions.is_partitioned(connection, table):
+            raise CommandError('%s is not a partitioned table, see the documentation to convert it.' % table)
+
+        statements = partitions.plan(
+            connection, table, partitions.get_partitions(connection, table), localdate(),
+            settings['INTERVAL'], ahead, keep
+        )
+        for sql in statements:
+            if options['dry_run'] or options['verbosity'] > 1:
+                self.stdout.write(sql + ';')
+            if not options['dry_run']:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql)
+        if not options['dry_run']:
+            self.stdout.write('Ran %d partition statements' % len(statements))
@@ -0,0 +1,49 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from actstream import retention
+
+
+class Command(BaseCommand):
+    help = 'Deletes the actions older than the retention ages of the RETENTION setting, optionally archiving them first'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Number of actions deleted per transaction, defaults to RETENTION["BATCH_SIZE"].'
+        )
+        parser.add_argument(
+            '--archive', default=None,
+            help='Directory where the pruned actions are written first, as a gzipped JSON lines file readable by loaddata.'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to wait between two batches.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the actions that would be pruned.'
+        )
+
+    def report(self, total, elapsed):
+        self.stdout.write('Pruned %d actions in %.1fs (%.0f actions/s)' % (total, elapsed, total / (elapsed or 1)))
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write('%d actions would be pruned' % retention.expired_actions().count())
+            return
+
+        archive = None
+        if options['archive']:
+            if not os.path.isdir(options['archive']):
+                raise CommandError('%s is not a directory.' % options['archive'])
+            archive = os.path.join(options['archive'], 'actstream-actions-%s.jsonl.gz' % time.strftime('%Y%m%d%H%M%S'))
+
+        start = time.monotonic()
+        callback = self.report if options['verbosity'] > 1 else None
+        total = retention.prune(options['batch_size'], archive, options['sleep'], callback=callback)
+        self.report(total, time.monotonic() - start)
+        if archive and total:
+            self.stdout.write('Archived to %s' % archive)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from actstream import settings as actstream_settings
+from actstream.models import FeedEntry, Follow
+
+
+class Command(BaseCommand):
+    help = (
+        'Regenerates the materialized user feeds from the Follow and Action tables, '
+        'in the feed store when FEED_MODE is "store"'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', dest='users', default=[],
+            help='Primary key of a user whose feed should be rebuilt. May be repeated, defaults to all users.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of feed entries inserted per query.'
+        )
+
+    def handle(self, *args, **options):
+        store = actstream_settings.get_feed_store() if actstream_settings.FEED_MODE == 'store' else None
+        users = get_user_model().objects.filter(pk__in=Follow.objects.values('user_id'))
+        if options['users']:
+            if store is not None:
+                for pk in options['users']:
+                    store.clear(get_user_model()._meta.pk.to_python(pk))
+            users = users.filter(pk__in=options['users'])
+        if store is None:
+            stale = FeedEntry.objects.exclude(user__in=users)
+            if options['users']:
+                stale = stale.filter(user__in=options['users'])
+            stale.delete()
+
+        total = 0
+        for user in users.iterator():
+            if store is not None:
+                count = store.rebuild(user)
+            else:
+                count = FeedEntry.objects.rebuild(user, batch_size=options['batch_size'])
+            total += count
+            if options['verbosity'] > 1:
+                self.stdout.write('Rebuilt feed of %s with %d entries' % (user, count))
+        self.stdout.write('Rebuilt %d feed entries' % total)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from actstream.models import FollowerCount, FollowingCount
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the follower and following counters from the Follow table and fixes the ones which drifted'
+
+    def handle(self, *args, **options):
+        for model in (FollowerCount, FollowingCount):
+            count = model.objects.reconcile()
+            self.stdout.write('Fixed %d %s counters' % (count, model._meta.model_name))
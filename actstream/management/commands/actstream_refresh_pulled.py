@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from actstream import hybrid
+
+
+class Command(BaseCommand):
+    help = ('Computes the set of pulled actors of the hybrid FEED_MODE again and fans out the actions '
+            'of the actors which are no longer pulled')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Refresh the set even if it is younger than HYBRID["REFRESH"] seconds.'
+        )
+
+    def handle(self, *args, **options):
+        result = hybrid.refresh_pulled_actors(force=options['force'])
+        if result is None:
+            self.stdout.write('The pulled actors are up to date or being refreshed by another process')
+            return
+        actors, pushed = result
+        self.stdout.write('%d pulled actors, %d actors pushed to the feeds of their followers' % (
+            len(actors), len(pushed)))
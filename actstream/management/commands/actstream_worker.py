@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from actstream import settings
+from actstream.actions import create_actions
+from actstream.queues import spec_to_action
+
+
+class Command(BaseCommand):
+    help = 'Writes the actions waiting in the ACTSTREAM_SETTINGS[QUEUE] queue to the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.BULK_BATCH_SIZE,
+            help='Number of actions written per batch.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Seconds to wait before polling an empty queue again.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of polling it forever.'
+        )
+
+    def process(self, queue, batch_size):
+        """
+        Writes one batch of queued actions, returns the number of actions written.
+        """
+        with transaction.atomic():
+            items = queue.get(batch_size)
+            if not items:
+                return 0
+            keys = [key for key, spec in items]
+            create_actions([spec_to_action(spec) for key, spec in items])
+            queue.ack(keys)
+        return len(items)
+
+    def handle(self, *args, **options):
+        queue = settings.get_action_queue()
+        if queue is None:
+            raise CommandError('No action queue configured in ACTSTREAM_SETTINGS[QUEUE]')
+
+        total = 0
+        while True:
+            count = self.process(queue, options['batch_size'])
+            total += count
+            if count and options['verbosity'] > 1:
+                self.stdout.write('Wrote %d actions' % count)
+            if not count:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write('Wrote %d actions' % total)
@@ -1,19 +1,31 @@
+from collections import defaultdict
 from typing import Type
 
 from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q, Model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, Manager, Model, OuterRef, Q, Sum
 from django.contrib.auth import get_user_model
 
+from actstream import contenttypes, hybrid, settings as actstream_settings
 from actstream.gfk import GFKManager
 from actstream.decorators import stream
+from actstream.ids import object_id_field, to_int, uses_int_ids
 from actstream.registry import check
 
 
+# query strategies of the user streams computed from the Follow table
+USER_STREAM_STRATEGIES = ('subquery', 'exists', 'followset')
+# query strategies of the streams matching an object or model in any role
+ANY_STREAM_STRATEGIES = ('or', 'union')
+
+
 class ActionManager(GFKManager):
     """
     Default manager for Actions, accessed through Action.objects
     """
+    # names of the custom streams of a user depending on its follows, invalidated by follow and unfollow
+    follow_streams = ()
 
     def public(self, *args, **kwargs):
         """
@@ -49,83 +61,222 @@ class ActionManager(GFKManager):
         check(obj)
         return obj.action_object_actions.public(**kwargs)
 
+    def _roles(self, queries, strategy=None, **kwargs):
+        """
+        Returns the public actions matching any of the queries. With the ``'union'`` strategy
+        (or ``ANY_STREAM_STRATEGY``) pages of the stream are read as a union of one query per role.
+        """
+        strategy = strategy or actstream_settings.ANY_STREAM_STRATEGY
+        if strategy not in ANY_STREAM_STRATEGIES:
+            raise ValueError('Unknown stream strategy %r, use one of %s' % (
+                strategy, ', '.join(ANY_STREAM_STRATEGIES)))
+        q = Q()
+        for query in queries:
+            q |= query
+        qs = self.public(q, **kwargs)
+        if strategy == 'union':
+            # read by the stream decorator, the later filters of the queryset are applied to each branch
+            qs._union_branches = [self.public(query, **kwargs) for query in queries]
+        return qs
+
     @stream
-    def model_actions(self, model: Type[Model], **kwargs):
+    def model_actions(self, model: Type[Model], strategy=None, **kwargs):
         """
         Stream of most recent actions by any particular model
         """
         check(model)
-        ctype = ContentType.objects.get_for_model(model)
-        return self.public(
-            (Q(target_content_type=ctype)
-             | Q(action_object_content_type=ctype)
-             | Q(actor_content_type=ctype)),
-            **kwargs
-        )
+        ctype = contenttypes.get_content_type(model)
+        return self._roles([
+            Q(target_content_type=ctype),
+            Q(action_object_content_type=ctype),
+            Q(actor_content_type=ctype),
+        ], strategy, **kwargs)
 
     @stream
-    def any(self, obj: Model, **kwargs):
+    def any(self, obj: Model, strategy=None, **kwargs):
         """
         Stream of most recent actions where obj is the actor OR target OR action_object.
         """
         check(obj)
-        ctype = ContentType.objects.get_for_model(obj)
-        return self.public(
-            Q(
-                actor_content_type=ctype,
-                actor_object_id=obj.pk,
-            ) | Q(
-                target_content_type=ctype,
-                target_object_id=obj.pk,
-            ) | Q(
-                action_object_content_type=ctype,
-                action_object_object_id=obj.pk,
-            ), **kwargs)
+        ctype = contenttypes.get_content_type(obj)
+        return self._roles([
+            Q(**{
+                'actor_content_type': ctype,
+                object_id_field('actor_object_id', obj.__class__): obj.pk,
+            }),
+            Q(**{
+                'target_content_type': ctype,
+                object_id_field('target_object_id', obj.__class__): obj.pk,
+            }),
+            Q(**{
+                'action_object_content_type': ctype,
+                object_id_field('action_object_object_id', obj.__class__): obj.pk,
+            }),
+        ], strategy, **kwargs)
 
     @stream
-    def user(self, obj: Model, with_user_activity=False, follow_flag=None, **kwargs):
-        """Create a stream of the most recent actions by objects that the user is following."""
-        q = Q()
-        qs = self.public()
+    def user(self, obj: Model, with_user_activity=False, follow_flag=None, strategy=None, **kwargs):
+        """
+        Create a stream of the most recent actions by objects that the user is following.
 
+        When ``FEED_MODE`` is ``'write'`` the stream is read from the user's materialized
+        ``FeedEntry`` rows instead of being computed from the ``Follow`` table, merged with the
+        actions of the pulled actors when it is ``'hybrid'`` (see ``actstream.hybrid``),
+        and when it is ``'store'`` from the ids of the user's feed in ``FEED_STORE``.
+        Streams filtered by ``follow_flag`` are always computed from the ``Follow`` table,
+        with the query ``strategy`` given or set in ``USER_STREAM_STRATEGY``.
+        """
         if not obj:
-            return qs.none()
+            return self.public().none()
 
         check(obj)
 
+        if actstream_settings.FEED_MODE in ('write', 'hybrid') and not follow_flag:
+            return self._feed_stream(obj, with_user_activity, **kwargs)
+        if actstream_settings.FEED_MODE == 'store' and not follow_flag:
+            return self._store_stream(obj, with_user_activity, **kwargs)
+        return self._follow_stream(obj, with_user_activity, follow_flag, strategy, **kwargs)
+
+    def _feed_stream(self, obj, with_user_activity=False, **kwargs):
+        """
+        User stream read from the FeedEntry rows written on action creation.
+        In hybrid mode the actions of the pulled actors are read from the ``Follow`` table.
+        """
+        pulled = hybrid.pulled_query() if actstream_settings.FEED_MODE == 'hybrid' else None
+        if not with_user_activity and pulled is None:
+            # ordered and paginated by the feed columns, so that pages are read from its (user, -timestamp) index
+            qs = self.public(feed_entries__user=obj, **kwargs).alias(
+                feed_timestamp=F('feed_entries__timestamp'),
+                feed_action_id=F('feed_entries__action_id'),
+            ).order_by('-feed_timestamp', '-feed_action_id')
+            qs._cursor_fields = ('feed_timestamp', 'feed_action_id')
+            return qs
+
+        entries = apps.get_model('actstream', 'feedentry').objects.filter(user=obj)
+        q = Q(pk__in=entries.values('action_id'))
         if with_user_activity:
-            q = q | Q(
-                actor_content_type=ContentType.objects.get_for_model(obj),
-                actor_object_id=obj.pk
-            )
+            q |= Q(**{
+                'actor_content_type': contenttypes.get_content_type(obj),
+                object_id_field('actor_object_id', obj.__class__): obj.pk
+            })
+        if pulled is not None:
+            q |= Q(pk__in=self._follow_stream(obj).filter(pulled).values('pk'))
+        return self.public(q, **kwargs).order_by('-timestamp', '-pk')
+
+    def _store_stream(self, obj, with_user_activity=False, **kwargs):
+        """
+        User stream of the action ids of the user's feed in the feed store.
+        """
+        q = Q(pk__in=actstream_settings.get_feed_store().get(obj.pk))
+        if with_user_activity:
+            q |= Q(**{
+                'actor_content_type': contenttypes.get_content_type(obj),
+                object_id_field('actor_object_id', obj.__class__): obj.pk
+            })
+        # ties broken by id like the other feed modes
+        return self.public(q, **kwargs).order_by('-timestamp', '-pk')
+
+    def _follow_stream(self, obj, with_user_activity=False, follow_flag=None, strategy=None, **kwargs):
+        """
+        User stream computed from the objects in the Follow table.
+        """
+        strategy = strategy or actstream_settings.USER_STREAM_STRATEGY
+        if strategy not in USER_STREAM_STRATEGIES:
+            raise ValueError('Unknown user stream strategy %r, use one of %s' % (
+                strategy, ', '.join(USER_STREAM_STRATEGIES)))
+
+        qs = self.public()
 
         follows = apps.get_model('actstream', 'follow').objects.filter(user=obj)
         if follow_flag:
             follows = follows.filter(flag=follow_flag)
 
+        q = getattr(self, '_%s_follows' % strategy)(follows)
+
+        if with_user_activity:
+            q = (q or Q()) | Q(**{
+                'actor_content_type': contenttypes.get_content_type(obj),
+                object_id_field('actor_object_id', obj.__class__): obj.pk
+            })
+        elif q is None:
+            return qs.none()
+
+        return qs.filter(q, **kwargs)
+
+    def _subquery_follows(self, follows):
+        """
+        Three ``__in`` subqueries over the follows of each followed content type.
+        Returns None if there are no follows.
+        """
         content_types = ContentType.objects.filter(
             pk__in=follows.values('content_type_id')
         )
 
-        if not (content_types.exists() or with_user_activity):
-            return qs.none()
+        if not content_types.exists():
+            return None
 
+        q = Q()
         for content_type in content_types:
+            model = content_type.model_class()
             object_ids = follows.filter(content_type=content_type)
-            q = q | Q(
-                actor_content_type=content_type,
-                actor_object_id__in=object_ids.values('object_id')
-            ) | Q(
-                target_content_type=content_type,
-                target_object_id__in=object_ids.filter(
-                    actor_only=False).values('object_id')
-            ) | Q(
-                action_object_content_type=content_type,
-                action_object_object_id__in=object_ids.filter(
-                    actor_only=False).values('object_id')
-            )
+            follow_ids = object_ids.values(object_id_field('object_id', model))
+            target_ids = object_ids.filter(actor_only=False).values(object_id_field('object_id', model))
+            q = q | Q(**{
+                'actor_content_type': content_type,
+                object_id_field('actor_object_id', model) + '__in': follow_ids
+            }) | Q(**{
+                'target_content_type': content_type,
+                object_id_field('target_object_id', model) + '__in': target_ids
+            }) | Q(**{
+                'action_object_content_type': content_type,
+                object_id_field('action_object_object_id', model) + '__in': target_ids
+            })
+        return q
 
-        return qs.filter(q, **kwargs)
+    def _exists_follows(self, follows):
+        """
+        One ``EXISTS`` semi-join against the follows per role (actor, target and action_object),
+        whatever the number of followed content types.
+        """
+        q = Q()
+        for field in ('actor', 'target', 'action_object'):
+            role = follows.filter(content_type=OuterRef('%s_content_type' % field))
+            if field != 'actor':
+                role = role.filter(actor_only=False)
+            if actstream_settings.USE_INT_OBJECT_IDS:
+                q |= Q(Exists(role.filter(object_id_int=OuterRef('%s_object_id_int' % field))))
+                # objects without integer primary keys
+                role = role.filter(object_id_int__isnull=True)
+            q |= Q(Exists(role.filter(object_id=OuterRef('%s_object_id' % field))))
+        return q
+
+    def _followset_follows(self, follows):
+        """
+        Reads the follows once and filters the actions by their object ids,
+        without any subquery. Returns None if there are no follows.
+        """
+        actors, others = defaultdict(list), defaultdict(list)
+        for content_type_id, object_id, actor_only in follows.values_list(
+                'content_type_id', 'object_id', 'actor_only'):
+            actors[content_type_id].append(object_id)
+            if not actor_only:
+                others[content_type_id].append(object_id)
+
+        if not actors:
+            return None
+
+        q = Q()
+        for fields, object_ids in ((('actor',), actors), (('target', 'action_object'), others)):
+            for content_type_id, ids in object_ids.items():
+                model = contenttypes.get_model(content_type_id)
+                if uses_int_ids(model):
+                    ids = [to_int(object_id) for object_id in ids]
+                for field in fields:
+                    q |= Q(**{
+                        '%s_content_type_id' % field: content_type_id,
+                        object_id_field('%s_object_id' % field, model) + '__in': ids
+                    })
+        return q
 
 
 class FollowManager(GFKManager):
@@ -138,8 +289,11 @@ class FollowManager(GFKManager):
         Filter to a specific instance.
         """
         check(instance)
-        content_type = ContentType.objects.get_for_model(instance).pk
-        queryset = self.filter(content_type=content_type, object_id=instance.pk)
+        content_type = contenttypes.get_content_type(instance).pk
+        queryset = self.filter(**{
+            'content_type': content_type,
+            object_id_field('object_id', instance.__class__): instance.pk
+        })
         if flag:
             queryset = queryset.filter(flag=flag)
         return queryset
@@ -156,20 +310,112 @@ class FollowManager(GFKManager):
             queryset = queryset.filter(flag=flag)
         return queryset.filter(user=user).exists()
 
+    def following_keys(self, user, keys, flag=''):
+        """
+        Returns the set of the (content type id, object id) pairs in keys that the user is following,
+        in a single query. Object ids are returned as strings.
+        """
+        if not user or user.is_anonymous:
+            return set()
+        object_ids = defaultdict(set)
+        for content_type_id, object_id in keys:
+            object_ids[content_type_id].add(str(object_id))
+        if not object_ids:
+            return set()
+        q = Q()
+        for content_type_id, ids in object_ids.items():
+            q |= Q(content_type_id=content_type_id, object_id__in=ids)
+        queryset = self.filter(q, user=user)
+        if flag:
+            queryset = queryset.filter(flag=flag)
+        return set(queryset.values_list('content_type_id', 'object_id'))
+
+    def following_map(self, user, objects, flag=''):
+        """
+        Returns a dictionary of the (content type id, object id) pair of each object to True
+        if the user is following it, like ``is_following`` for many objects in a single query.
+        """
+        keys = [(contenttypes.get_content_type(obj).pk, str(obj.pk)) for obj in objects]
+        following = self.following_keys(user, keys, flag=flag)
+        return {key: key in following for key in keys}
+
     def followers_qs(self, actor, flag=''):
         """
         Returns a queryset of User objects who are following the given actor (eg my followers).
         """
         check(actor)
-        queryset = self.filter(
-            content_type=ContentType.objects.get_for_model(actor),
-            object_id=actor.pk
-        ).select_related('user')
+        queryset = self.filter(**{
+            'content_type': contenttypes.get_content_type(actor),
+            object_id_field('object_id', actor.__class__): actor.pk
+        }).select_related('user')
 
         if flag:
             queryset = queryset.filter(flag=flag)
         return queryset
 
+    def followers_for_action(self, action):
+        """
+        Returns a queryset of the ids of users following the actor, target or action_object
+        of the given action (eg the users whose stream will include the action).
+        """
+        return self.followers_for_actions([action])
+
+    def followers_for_actions(self, actions):
+        """
+        Returns a queryset of the ids of users following the actor, target or action_object
+        of any of the given actions, with one condition per content type.
+        """
+        q = self._action_followers_query(actions)
+        if q is None:
+            return self.none().values_list('user_id', flat=True)
+        return self.filter(q).values_list('user_id', flat=True).distinct()
+
+    def followers_by_action(self, actions):
+        """
+        Returns a list with the set of the ids of users following the actor, target or action_object
+        of each of the given actions, in the same order, with a single query for all the actions.
+        """
+        followers = {}
+        q = self._action_followers_query(actions)
+        if q is not None:
+            rows = self.filter(q).values_list('user_id', 'content_type_id', 'object_id', 'actor_only')
+            for user_id, content_type_id, object_id, actor_only in rows:
+                followers.setdefault((content_type_id, object_id), []).append((user_id, actor_only))
+        result = []
+        for action in actions:
+            user_ids = set()
+            for field in ('actor', 'target', 'action_object'):
+                key = (getattr(action, '%s_content_type_id' % field), str(getattr(action, '%s_object_id' % field)))
+                user_ids.update(
+                    user_id for user_id, actor_only in followers.get(key, ())
+                    if field == 'actor' or not actor_only
+                )
+            result.append(user_ids)
+        return result
+
+    def _action_followers_query(self, actions):
+        object_ids = {}
+        for action in actions:
+            for field in ('actor', 'target', 'action_object'):
+                content_type_id = getattr(action, '%s_content_type_id' % field)
+                if content_type_id is not None:
+                    object_ids.setdefault((content_type_id, field == 'actor'), set()).add(
+                        getattr(action, '%s_object_id' % field)
+                    )
+        if not object_ids:
+            return None
+        q = Q()
+        for (content_type_id, is_actor), ids in object_ids.items():
+            model = contenttypes.get_model(content_type_id)
+            lookup = Q(**{
+                'content_type_id': content_type_id,
+                '%s__in' % object_id_field('object_id', model): list(ids),
+            })
+            if not is_actor:
+                lookup &= Q(actor_only=False)
+            q |= lookup
+        return q
+
     def followers(self, actor, flag=''):
         """
         Returns a list of User objects who are following the given actor (eg my followers).
@@ -187,7 +433,7 @@ class FollowManager(GFKManager):
         ctype_filters = Q()
         for model in models:
             check(model)
-            ctype_filters |= Q(content_type=ContentType.objects.get_for_model(model))
+            ctype_filters |= Q(content_type=contenttypes.get_content_type(model))
         qs = qs.filter(ctype_filters)
 
         flag = kwargs.get('flag', '')
@@ -205,3 +451,164 @@ class FollowManager(GFKManager):
         return [follow.follow_object for follow in self.following_qs(
             user, *models, flag=kwargs.get('flag', '')
         )]
+
+    def follower_count(self, actor, flag=''):
+        """
+        Returns the number of users following the given actor, read from the FollowerCount table.
+        """
+        check(actor)
+        queryset = apps.get_model('actstream', 'followercount').objects.filter(
+            content_type=contenttypes.get_content_type(actor), object_id=str(actor.pk)
+        )
+        if flag:
+            queryset = queryset.filter(flag=flag)
+        return queryset.aggregate(total=Sum('count'))['total'] or 0
+
+    def following_count(self, user, flag=''):
+        """
+        Returns the number of objects the given user is following, read from the FollowingCount table.
+        """
+        queryset = apps.get_model('actstream', 'followingcount').objects.filter(user=user)
+        if flag:
+            queryset = queryset.filter(flag=flag)
+        return queryset.aggregate(total=Sum('count'))['total'] or 0
+
+    def update_counts(self, follows, delta):
+        """
+        Adds delta to the follower and following counters of each
+        (user id, content type id, object id, flag) row of follows.
+        """
+        followers, following = defaultdict(int), defaultdict(int)
+        for user_id, content_type_id, object_id, flag in follows:
+            followers[content_type_id, str(object_id), flag] += delta
+            following[user_id, flag] += delta
+        apps.get_model('actstream', 'followercount').objects.change(followers)
+        apps.get_model('actstream', 'followingcount').objects.change(following)
+
+
+class CountManager(Manager):
+    """
+    Manager of the denormalized follow counters, FollowerCount and FollowingCount.
+    """
+
+    def change(self, deltas):
+        """
+        Adds each delta to the counter of its key, a tuple of the values of ``key_fields``.
+        Counters dropping to zero are deleted.
+        """
+        for key, delta in deltas.items():
+            fields = dict(zip(self.model.key_fields, key))
+            if not delta:
+                continue
+            if self.filter(**fields).update(count=F('count') + delta):
+                if delta < 0:
+                    self.filter(count__lte=0, **fields).delete()
+            elif delta > 0:
+                try:
+                    with transaction.atomic():
+                        self.create(count=delta, **fields)
+                except IntegrityError:
+                    # created concurrently
+                    self.filter(**fields).update(count=F('count') + delta)
+
+    def expected(self):
+        """
+        Returns the counts computed from the Follow table keyed like ``change``.
+        """
+        Follow = apps.get_model('actstream', 'follow')
+        fields = self.model.key_fields
+        return {
+            tuple(row[:-1]): row[-1]
+            for row in Follow.objects.values(*fields).annotate(total=Count('pk')).values_list(*fields, 'total')
+        }
+
+    def reconcile(self):
+        """
+        Fixes the counters which drifted from the Follow table. Returns the number of counters changed.
+        """
+        with transaction.atomic():
+            expected = self.expected()
+            current = {
+                tuple(row[:-1]): row[-1]
+                for row in self.select_for_update().values_list(*self.model.key_fields, 'count')
+            }
+            deltas = {
+                key: expected.get(key, 0) - current.get(key, 0)
+                for key in set(expected) | set(current)
+            }
+            deltas = {key: delta for key, delta in deltas.items() if delta}
+            self.change(deltas)
+        return len(deltas)
+
+
+class FeedEntryManager(Manager):
+    """
+    Manager for FeedEntry model, the materialized user streams used when
+    ``ACTSTREAM_SETTINGS['FEED_MODE']`` is ``'write'`` or ``'hybrid'``.
+    """
+
+    def fanout(self, *actions):
+        """
+        Creates a FeedEntry of each public action for every user following
+        its actor, target or action_object. In hybrid mode the actions of pulled actors are skipped.
+        """
+        Follow = apps.get_model('actstream', 'follow')
+        actions = [action for action in actions if action.public]
+        if actstream_settings.FEED_MODE == 'hybrid':
+            actions = [action for action in actions if not hybrid.is_pulled(action)]
+        entries = [
+            self.model(user_id=user_id, action=action, timestamp=action.timestamp)
+            for action, user_ids in zip(actions, Follow.objects.followers_by_action(actions))
+            for user_id in user_ids
+        ]
+        return self.bulk_create(entries, ignore_conflicts=True)
+
+    def _involving(self, obj):
+        ctype = contenttypes.get_content_type(obj)
+        q = Q()
+        for field in ('actor', 'target', 'action_object'):
+            q |= Q(**{
+                '%s_content_type' % field: ctype,
+                object_id_field('%s_object_id' % field, obj.__class__): obj.pk,
+            })
+        return q
+
+    def add(self, user, obj, batch_size=1000):
+        """
+        Creates the FeedEntries of past actions involving obj that the user now follows.
+        """
+        Action = apps.get_model('actstream', 'action')
+        actions = Action.objects._follow_stream(user).filter(self._involving(obj))
+        return self._create(user, actions, batch_size)
+
+    def remove(self, user, obj):
+        """
+        Deletes the FeedEntries of actions involving obj that the user no longer follows.
+        """
+        Action = apps.get_model('actstream', 'action')
+        involved = Action.objects.filter(self._involving(obj)).values('pk')
+        followed = Action.objects._follow_stream(user).values('pk')
+        return self.filter(user=user, action__in=involved).exclude(action__in=followed).delete()
+
+    def rebuild(self, user, batch_size=1000):
+        """
+        Regenerates all FeedEntries of the user from the Follow and Action tables.
+        Returns the number of entries created.
+        """
+        Action = apps.get_model('actstream', 'action')
+        self.filter(user=user).delete()
+        return self._create(user, Action.objects._follow_stream(user), batch_size)
+
+    def _create(self, user, actions, batch_size):
+        if actstream_settings.FEED_MODE == 'hybrid':
+            pulled = hybrid.pulled_query()
+            if pulled is not None:
+                actions = actions.exclude(pulled)
+        entries, count = [], 0
+        for action_id, timestamp in actions.values_list('pk', 'timestamp').iterator():
+            entries.append(self.model(user=user, action_id=action_id, timestamp=timestamp))
+            if len(entries) >= batch_size:
+                count += len(self.bulk_create(entries, ignore_conflicts=True))
+                entries = []
+        count += len(self.bulk_create(entries, ignore_conflicts=True))
+        return count
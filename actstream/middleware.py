@@ -0,0 +1,16 @@
+from actstream.gfk import identity_map
+
+
+class IdentityMapMiddleware:
+    """
+    Shares the objects of the generic relations fetched while handling a request,
+    so actors, targets and action objects repeated across the streams of a page
+    are loaded once.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_map():
+            return self.get_response(request)
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actstream', '0004_feedentry'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(fields=['actor_content_type', 'actor_object_id', 'public', '-timestamp'], name='actstream_actor_stream_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(fields=['target_content_type', 'target_object_id', 'public', '-timestamp'], name='actstream_target_stream_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(fields=['action_object_content_type', 'action_object_object_id', 'public', '-timestamp'], name='actstream_object_stream_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(condition=models.Q(('public', True)), fields=['-timestamp'], name='actstream_public_ts_idx'),
+        ),
+    ]
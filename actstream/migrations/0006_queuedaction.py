@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actstream', '0005_action_stream_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedAction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.TextField()),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.15 on 2026-10-18 16:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actstream', '0006_queuedaction'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='action',
+            name='action_object_object_id_int',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='action',
+            name='actor_object_id_int',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='action',
+            name='target_object_id_int',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='follow',
+            name='object_id_int',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(fields=['actor_content_type', 'actor_object_id_int', 'public', '-timestamp'], name='actstream_actor_int_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(fields=['target_content_type', 'target_object_id_int', 'public', '-timestamp'], name='actstream_target_int_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='action',
+            index=models.Index(fields=['action_object_content_type', 'action_object_object_id_int', 'public', '-timestamp'], name='actstream_object_int_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['content_type', 'object_id_int'], name='actstream_follow_int_idx'),
+        ),
+    ]
@@ -10,7 +10,8 @@ from django.urls import reverse
 from django.utils.timezone import now
 
 from actstream import settings as actstream_settings
-from actstream.managers import FollowManager
+from actstream.ids import set_int_object_ids
+from actstream.managers import CountManager, FollowManager, FeedEntryManager
 
 
 class Follow(models.Model):
@@ -25,6 +26,7 @@ class Follow(models.Model):
         ContentType, on_delete=models.CASCADE, db_index=True
     )
     object_id = models.CharField(max_length=255, db_index=True)
+    object_id_int = models.BigIntegerField(blank=True, null=True, editable=False)
     follow_object = GenericForeignKey()
     actor_only = models.BooleanField(
         "Only follow actions where "
@@ -37,10 +39,17 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('user', 'content_type', 'object_id', 'flag')
+        indexes = [
+            models.Index(fields=['content_type', 'object_id_int'], name='actstream_follow_int_idx'),
+        ]
 
     def __str__(self):
         return '{} -> {} : {}'.format(self.user, self.follow_object, self.flag)
 
+    def save(self, *args, **kwargs):
+        set_int_object_ids(self)
+        super().save(*args, **kwargs)
+
 
 class Action(models.Model):
     """
@@ -76,6 +85,7 @@ class Action(models.Model):
         on_delete=models.CASCADE, db_index=True
     )
     actor_object_id = models.CharField(max_length=255, db_index=True)
+    actor_object_id_int = models.BigIntegerField(blank=True, null=True, editable=False)
     actor = GenericForeignKey('actor_content_type', 'actor_object_id')
 
     verb = models.CharField(max_length=255, db_index=True)
@@ -89,6 +99,7 @@ class Action(models.Model):
     target_object_id = models.CharField(
         max_length=255, blank=True, null=True, db_index=True
     )
+    target_object_id_int = models.BigIntegerField(blank=True, null=True, editable=False)
     target = GenericForeignKey(
         'target_content_type',
         'target_object_id'
@@ -102,6 +113,7 @@ class Action(models.Model):
     action_object_object_id = models.CharField(
         max_length=255, blank=True, null=True, db_index=True
     )
+    action_object_object_id_int = models.BigIntegerField(blank=True, null=True, editable=False)
     action_object = GenericForeignKey(
         'action_object_content_type',
         'action_object_object_id'
@@ -115,6 +127,38 @@ class Action(models.Model):
 
     class Meta:
         ordering = ('-timestamp',)
+        indexes = [
+            models.Index(
+                fields=['actor_content_type', 'actor_object_id', 'public', '-timestamp'],
+                name='actstream_actor_stream_idx'
+            ),
+            models.Index(
+                fields=['target_content_type', 'target_object_id', 'public', '-timestamp'],
+                name='actstream_target_stream_idx'
+            ),
+            models.Index(
+                fields=['action_object_content_type', 'action_object_object_id', 'public', '-timestamp'],
+                name='actstream_object_stream_idx'
+            ),
+            # used instead of the three above when USE_INT_OBJECT_IDS is True
+            models.Index(
+                fields=['actor_content_type', 'actor_object_id_int', 'public', '-timestamp'],
+                name='actstream_actor_int_idx'
+            ),
+            models.Index(
+                fields=['target_content_type', 'target_object_id_int', 'public', '-timestamp'],
+                name='actstream_target_int_idx'
+            ),
+            models.Index(
+                fields=['action_object_content_type', 'action_object_object_id_int', 'public', '-timestamp'],
+                name='actstream_object_int_idx'
+            ),
+            # partial index, skipped on backends without support for conditions (eg MySQL)
+            models.Index(
+                fields=['-timestamp'], condition=models.Q(public=True),
+                name='actstream_public_ts_idx'
+            ),
+        ]
 
     def __str__(self):
         ctx = {
@@ -132,26 +176,30 @@ class Action(models.Model):
             return _('%(actor)s %(verb)s %(action_object)s %(timesince)s ago') % ctx
         return _('%(actor)s %(verb)s %(timesince)s ago') % ctx
 
+    def save(self, *args, **kwargs):
+        set_int_object_ids(self)
+        super().save(*args, **kwargs)
+
     def actor_url(self):
         """
         Returns the URL to the ``actstream_actor`` view for the current actor.
         """
         return reverse('actstream_actor', None,
-                       (self.actor_content_type.pk, self.actor_object_id))
+                       (self.actor_content_type_id, self.actor_object_id))
 
     def target_url(self):
         """
         Returns the URL to the ``actstream_actor`` view for the current target.
         """
         return reverse('actstream_actor', None,
-                       (self.target_content_type.pk, self.target_object_id))
+                       (self.target_content_type_id, self.target_object_id))
 
     def action_object_url(self):
         """
         Returns the URL to the ``actstream_action_object`` view for the current action object
         """
         return reverse('actstream_actor', None, (
-            self.action_object_content_type.pk, self.action_object_object_id))
+            self.action_object_content_type_id, self.action_object_object_id))
 
     def timesince(self, now=None):
         """
@@ -165,6 +213,82 @@ class Action(models.Model):
             'actstream_detail', args=[self.pk])
 
 
+class FeedEntry(models.Model):
+    """
+    Materialized entry of an Action in the stream of a user following its actor,
+    target or action object. Written on action creation when ``FEED_MODE`` is ``'write'``
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
+    )
+    action = models.ForeignKey(
+        Action, related_name='feed_entries', on_delete=models.CASCADE
+    )
+    timestamp = models.DateTimeField(default=now)
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        unique_together = ('user', 'action')
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='actstream_feed_user_ts_idx'),
+        ]
+
+    def __str__(self):
+        return '{} <- {}'.format(self.user, self.action)
+
+
+class FollowerCount(models.Model):
+    """
+    Number of users following an object with a flag, maintained by ``follow`` and ``unfollow``
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=255)
+    flag = models.CharField(max_length=255, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    objects = CountManager()
+
+    key_fields = ('content_type_id', 'object_id', 'flag')
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'flag')
+
+    def __str__(self):
+        return '{}:{} : {} <- {}'.format(self.content_type_id, self.object_id, self.flag, self.count)
+
+
+class FollowingCount(models.Model):
+    """
+    Number of objects followed by a user with a flag, maintained by ``follow`` and ``unfollow``
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    flag = models.CharField(max_length=255, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    objects = CountManager()
+
+    key_fields = ('user_id', 'flag')
+
+    class Meta:
+        unique_together = ('user', 'flag')
+
+    def __str__(self):
+        return '{} : {} -> {}'.format(self.user, self.flag, self.count)
+
+
+class QueuedAction(models.Model):
+    """
+    Serialized action waiting to be written by the ``actstream_worker`` command
+    when ``actstream.queues.DatabaseQueue`` is the action queue
+    """
+    payload = models.TextField()
+    created = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return self.payload
+
+
 # convenient accessors
 actor_stream = Action.objects.actor
 action_object_stream = Action.objects.action_object
@@ -174,3 +298,5 @@ model_stream = Action.objects.model_actions
 any_stream = Action.objects.any
 followers = Follow.objects.followers
 following = Follow.objects.following
+follower_count = Follow.objects.follower_count
+following_count = Follow.objects.following_count
@@ -0,0 +1,104 @@
+"""
+Range partitioning of the Action table by timestamp on PostgreSQL, see ``ACTSTREAM_SETTINGS['PARTITION']``.
+
+The table must first be converted to a table partitioned by range of ``timestamp`` (see the
+documentation). Its partitions are then named ``<table>_p<YYYYMMDD>`` after the first day of
+their period, created ahead of time and detached once they are older than the kept periods
+by the ``actstream_partitions`` management command.
+"""
+import re
+from datetime import date, timedelta
+
+INTERVALS = ('day', 'week', 'month', 'year')
+
+
+def period_start(day, interval):
+    """
+    Returns the first day of the period of the given interval containing ``day``.
+    """
+    if interval == 'day':
+        return day
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    if interval == 'year':
+        return day.replace(month=1, day=1)
+    raise ValueError('Unknown partition interval %r, use one of %s' % (interval, ', '.join(INTERVALS)))
+
+
+def next_period(start, interval, count=1):
+    """
+    Returns the first day of the ``count``-th period after the one starting on ``start``.
+    """
+    if interval == 'day':
+        return start + timedelta(days=count)
+    if interval == 'week':
+        return start + timedelta(weeks=count)
+    if interval == 'month':
+        months = start.year * 12 + start.month - 1 + count
+        return date(months // 12, months % 12 + 1, 1)
+    if interval == 'year':
+        return date(start.year + count, 1, 1)
+    raise ValueError('Unknown partition interval %r, use one of %s' % (interval, ', '.join(INTERVALS)))
+
+
+def partition_name(table, start):
+    return '%s_p%s' % (table, start.strftime('%Y%m%d'))
+
+
+def parse_partition_name(table, name):
+    """
+    Returns the first day of the period of a partition named by ``partition_name``, or None.
+    """
+    match = re.fullmatch(r'%s_p(\d{4})(\d{2})(\d{2})' % re.escape(table), name)
+    if match is None:
+        return None
+    return date(*map(int, match.groups()))
+
+
+def is_partitioned(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)', [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def get_partitions(connection, table):
+    """
+    Returns the names of the partitions attached to the table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s AND pg_table_is_visible(p.oid)',
+            [table]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def plan(connection, table, partitions, today, interval, ahead, keep=None):
+    """
+    Returns the SQL statements creating the partitions of the current period and the ``ahead``
+    following ones which are not in ``partitions``, and detaching the partitions of the periods
+    older than the ``keep`` latest ones, if ``keep`` is given.
+    """
+    quote = connection.ops.quote_name
+    current = period_start(today, interval)
+    statements = []
+    for count in range(ahead + 1):
+        start = next_period(current, interval, count)
+        name = partition_name(table, start)
+        if name not in partitions:
+            statements.append("CREATE TABLE %s PARTITION OF %s FOR VALUES FROM ('%s') TO ('%s')" % (
+                quote(name), quote(table), start.isoformat(), next_period(start, interval).isoformat()
+            ))
+    if keep is not None:
+        oldest = next_period(current, interval, 1 - keep)
+        for name in sorted(partitions):
+            start = parse_partition_name(table, name)
+            if start is not None and start < oldest:
+                statements.append('ALTER TABLE %s DETACH PARTITION %s' % (quote(table), quote(name)))
+    return statements
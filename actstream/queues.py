@@ -0,0 +1,175 @@
+import json
+import os
+from functools import partial
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+
+def action_to_spec(action):
+    """
+    Returns a JSON serializable dictionary of an unsaved Action.
+    """
+    spec = {
+        'verb': action.verb,
+        'public': action.public,
+        'description': action.description,
+        'timestamp': action.timestamp,
+    }
+    for field in ('actor', 'target', 'action_object'):
+        content_type_id = getattr(action, '%s_content_type_id' % field)
+        if content_type_id is not None:
+            spec[field] = [content_type_id, getattr(action, '%s_object_id' % field)]
+    if getattr(action, 'data', None):
+        spec['data'] = action.data
+    return json.loads(json.dumps(spec, cls=DjangoJSONEncoder))
+
+
+def spec_to_action(spec):
+    """
+    Returns the unsaved Action of a dictionary made by ``action_to_spec``.
+    """
+    newaction = apps.get_model('actstream', 'action')(
+        verb=spec['verb'],
+        public=spec['public'],
+        description=spec['description'],
+        timestamp=parse_datetime(spec['timestamp']),
+    )
+    for field in ('actor', 'target', 'action_object'):
+        if field in spec:
+            content_type_id, object_id = spec[field]
+            setattr(newaction, '%s_content_type_id' % field, content_type_id)
+            setattr(newaction, '%s_object_id' % field, object_id)
+    if 'data' in spec:
+        newaction.data = spec['data']
+    return newaction
+
+
+class BaseQueue:
+    """
+    Interface of the queues used to defer action writes to the ``actstream_worker`` command.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    def put(self, spec):
+        """
+        Adds an action spec to the queue.
+        """
+        raise NotImplementedError
+
+    def get(self, count):
+        """
+        Returns a list of at most ``count`` (key, spec) pairs, oldest first.
+        Called inside a database transaction by the worker.
+        """
+        raise NotImplementedError
+
+    def ack(self, keys):
+        """
+        Removes the specs with the given keys from the queue once their actions are created.
+        Called inside the same database transaction as ``get``.
+        """
+        raise NotImplementedError
+
+
+class DatabaseQueue(BaseQueue):
+    """
+    Queue stored in the ``QueuedAction`` table. Several workers may drain it concurrently
+    on backends supporting ``SELECT ... FOR UPDATE SKIP LOCKED``.
+    """
+
+    @property
+    def model(self):
+        return apps.get_model('actstream', 'queuedaction')
+
+    def put(self, spec):
+        self.model.objects.create(payload=json.dumps(spec))
+
+    def get(self, count):
+        queryset = self.model.objects.order_by('pk')
+        if transaction.get_connection().features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        return [(item.pk, json.loads(item.payload)) for item in queryset[:count]]
+
+    def ack(self, keys):
+        self.model.objects.filter(pk__in=keys).delete()
+
+
+class FileQueue(BaseQueue):
+    """
+    Queue stored as JSON lines in a local file, given by the ``path`` option.
+    Supports many writing processes on the same host but a single worker.
+    """
+
+    @property
+    def path(self):
+        return self.options['path']
+
+    @property
+    def work_path(self):
+        return self.path + '.work'
+
+    def _lock(self, fileobj):
+        if fcntl is not None:
+            fcntl.flock(fileobj, fcntl.LOCK_EX)
+
+    def put(self, spec):
+        line = json.dumps(spec) + '\n'
+        while True:
+            with open(self.path, 'a') as fileobj:
+                self._lock(fileobj)
+                # the file may have been taken away by the worker while waiting for the lock
+                if self._is_current(fileobj):
+                    fileobj.write(line)
+                    return
+
+    def _is_current(self, fileobj):
+        try:
+            return os.fstat(fileobj.fileno()).st_ino == os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _read_work(self):
+        """
+        Returns the complete lines of the work file, read under the lock of the writers.
+        A trailing line without a newline, left by a writer which did not finish it, is skipped
+        and dropped when the next pending specs are taken.
+        """
+        if not os.path.exists(self.work_path):
+            return []
+        with open(self.work_path) as fileobj:
+            self._lock(fileobj)
+            return [line for line in fileobj if line.endswith('\n') and line.strip()]
+
+    def get(self, count):
+        lines = self._read_work()
+        if not lines and os.path.exists(self.path):
+            # take the pending specs away from the writers, the work file has no complete line left
+            with open(self.path, 'a') as fileobj:
+                self._lock(fileobj)
+                os.replace(self.path, self.work_path)
+            lines = self._read_work()
+        return [(index, json.loads(line)) for index, line in enumerate(lines[:count])]
+
+    def ack(self, keys):
+        # the file is only rewritten once the actions are committed
+        transaction.on_commit(partial(self._remove, len(keys)))
+
+    def _remove(self, count):
+        with open(self.work_path, 'r+') as fileobj:
+            self._lock(fileobj)
+            lines = [line for line in fileobj if line.strip()][count:]
+            fileobj.seek(0)
+            fileobj.writelines(lines)
+            fileobj.truncate()
+        if not lines:
+            os.remove(self.work_path)
@@ -5,6 +5,8 @@ from django.contrib.contenttypes.fields import GenericRelation
 from django.db.models.base import ModelBase
 from django.core.exceptions import ImproperlyConfigured
 
+from actstream.ids import object_id_field
+
 
 class RegistrationError(Exception):
     pass
@@ -32,7 +34,7 @@ def setup_generic_relations(model_class):
         attr_value = '{}_as_{}'.format(related_attr_value, field)
         kwargs = {
             'content_type_field': '%s_content_type' % field,
-            'object_id_field': '%s_object_id' % field,
+            'object_id_field': object_id_field('%s_object_id' % field, model_class),
             related_attr_name: attr_value
         }
         rel = GenericRelation('actstream.Action', **kwargs)
@@ -82,20 +84,29 @@ def validate(model_class, exception_class=ImproperlyConfigured):
 
 
 class ActionableModelRegistry(dict):
+    # registered model classes, rebuilt on register and unregister for the lookup of check
+    registered = frozenset()
 
     def register(self, *model_classes_or_labels):
         for class_or_label in model_classes_or_labels:
             model_class = validate(class_or_label)
             if model_class not in self:
                 self[model_class] = setup_generic_relations(model_class)
+        self.registered = frozenset(self)
 
     def unregister(self, *model_classes_or_labels):
         for class_or_label in model_classes_or_labels:
             model_class = validate(class_or_label)
             if model_class in self:
                 del self[model_class]
+        self.registered = frozenset(self)
 
     def check(self, model_class_or_object):
+        if isinstance(model_class_or_object, ModelBase):
+            if model_class_or_object in self.registered:
+                return
+        elif type(model_class_or_object) in self.registered:
+            return
         if getattr(model_class_or_object, '_deferred', None):
             model_class_or_object = model_class_or_object._meta.proxy_for_model
         if not isclass(model_class_or_object):
@@ -0,0 +1,100 @@
+"""
+Retention of the actions, configured with ``ACTSTREAM_SETTINGS['RETENTION']`` and applied by the
+``actstream_prune`` management command.
+
+The age after which an action is deleted is the one of its verb in ``VERBS``, else the one of the
+model of its actor in ``MODELS``, else ``DEFAULT``. Ages are numbers of days or timedeltas and
+``None`` keeps the actions forever. Actions are deleted in batches ordered by primary key and can be
+archived first to gzipped JSON lines files, which ``loaddata`` reads back.
+"""
+import gzip
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.core import serializers
+from django.db.models import Q
+from django.utils.timezone import now
+
+from actstream import contenttypes, settings as actstream_settings
+
+
+def get_age(value):
+    if value is None or isinstance(value, timedelta):
+        return value
+    return timedelta(days=value)
+
+
+def expired_query(current=None):
+    """
+    Returns a Q object of the actions older than their retention age, or None if no action expires.
+    """
+    settings = actstream_settings.RETENTION_SETTINGS
+    current = current or now()
+    verbs = {verb: get_age(age) for verb, age in settings['VERBS'].items()}
+    models = {
+        contenttypes.get_content_type_id(apps.get_model(label)): get_age(age)
+        for label, age in settings['MODELS'].items()
+    }
+
+    queries = [
+        Q(verb=verb, timestamp__lt=current - age) for verb, age in verbs.items() if age is not None
+    ]
+    others = ~Q(verb__in=list(verbs))
+    queries += [
+        others & Q(actor_content_type_id=content_type_id, timestamp__lt=current - age)
+        for content_type_id, age in models.items() if age is not None
+    ]
+    default = get_age(settings['DEFAULT'])
+    if default is not None:
+        queries.append(others & ~Q(actor_content_type_id__in=list(models)) & Q(timestamp__lt=current - default))
+
+    q = None
+    for query in queries:
+        q = query if q is None else q | query
+    return q
+
+
+def expired_actions(current=None):
+    """
+    Returns the queryset of the actions older than their retention age.
+    """
+    Action = apps.get_model('actstream', 'action')
+    q = expired_query(current)
+    if q is None:
+        return Action.objects.none()
+    return Action.objects.filter(q)
+
+
+def prune(batch_size=None, archive=None, sleep=0, current=None, callback=None):
+    """
+    Deletes the expired actions in batches of ``batch_size`` ordered by primary key and returns
+    the number of deleted actions. The actions are first written to the ``archive`` path if given.
+    ``callback`` is called after each batch with the total number of deleted actions and the
+    elapsed seconds, and ``sleep`` seconds are waited between batches.
+    """
+    Action = apps.get_model('actstream', 'action')
+    batch_size = batch_size or actstream_settings.RETENTION_SETTINGS['BATCH_SIZE']
+    # the cutoff is fixed for the whole run
+    expired = expired_actions(current or now()).order_by('pk')
+    archive_file = gzip.open(archive, 'wt', encoding='utf-8') if archive else None
+    start, total, last = time.monotonic(), 0, None
+    try:
+        while True:
+            batch = expired if last is None else expired.filter(pk__gt=last)
+            pks = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            actions = Action._base_manager.filter(pk__in=pks)
+            if archive_file:
+                serializers.serialize('jsonl', actions.order_by('pk'), stream=archive_file)
+            actions.delete()
+            total, last = total + len(pks), pks[-1]
+            if callback:
+                callback(total, time.monotonic() - start)
+            if sleep:
+                time.sleep(sleep)
+    finally:
+        if archive_file:
+            archive_file.close()
+    return total
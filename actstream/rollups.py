@@ -0,0 +1,138 @@
+"""
+Aggregation of the near-identical actions of a stream, eg "Alice and 14 others liked your photo".
+
+``rollup`` groups the actions of a stream by verb, target and period (``TRUNC_KINDS``) with a
+``GROUP BY`` query and returns the groups as ``Rollup`` objects, newest first, with the number of
+actions and of distinct actors of each group and a sample of its latest actions, read with a
+window function in a second query over the time range of the groups.
+"""
+import django
+from django.db.models import CharField, Count, F, Max, Value, Window
+from django.db.models.functions import Cast, Concat, RowNumber, Trunc
+from django.utils.translation import gettext as _, ngettext
+
+TRUNC_KINDS = ('minute', 'hour', 'day', 'week', 'month')
+
+GROUP_FIELDS = ('verb', 'target_content_type_id', 'target_object_id', 'bucket')
+
+
+class Rollup:
+    """
+    A group of the actions of a stream with the same verb and target in the same period.
+    """
+
+    def __init__(self, verb, target_content_type_id, target_object_id, bucket, count, actor_count,
+                 timestamp, actions):
+        self.verb = verb
+        self.target_content_type_id = target_content_type_id
+        self.target_object_id = target_object_id
+        self.bucket = bucket
+        self.count = count
+        self.actor_count = actor_count
+        self.timestamp = timestamp
+        self.actions = actions
+
+    def __repr__(self):
+        return '<Rollup: %s>' % self
+
+    def __str__(self):
+        names = ', '.join(str(actor) for actor in self.actors)
+        ctx = {'actors': names, 'verb': self.verb, 'target': self.target, 'others': self.others}
+        if self.others:
+            if self.target:
+                return ngettext('%(actors)s and %(others)d other %(verb)s %(target)s',
+                                '%(actors)s and %(others)d others %(verb)s %(target)s', self.others) % ctx
+            return ngettext('%(actors)s and %(others)d other %(verb)s',
+                            '%(actors)s and %(others)d others %(verb)s', self.others) % ctx
+        if self.target:
+            return _('%(actors)s %(verb)s %(target)s') % ctx
+        return _('%(actors)s %(verb)s') % ctx
+
+    @property
+    def target(self):
+        return self.actions[0].target if self.actions else None
+
+    @property
+    def actor_actions(self):
+        """
+        The latest action of each distinct actor of the sample, newest first.
+        """
+        actions, keys = [], set()
+        for action in self.actions:
+            key = (action.actor_content_type_id, action.actor_object_id)
+            if key not in keys:
+                keys.add(key)
+                actions.append(action)
+        return actions
+
+    @property
+    def actors(self):
+        """
+        The distinct actors of the sample of actions, newest first.
+        """
+        return [action.actor for action in self.actor_actions]
+
+    @property
+    def others(self):
+        """
+        The number of actors of the group which are not in the sample.
+        """
+        return max(self.actor_count - len(self.actors), 0)
+
+
+def rollup(queryset, period='hour', sample=3, limit=None):
+    """
+    Returns the ``Rollup`` groups of the actions of a stream queryset, newest first.
+    ``period`` is the kind of ``Trunc`` of the timestamps, ``sample`` the number of latest actions
+    kept per group and ``limit`` the number of groups returned, all of them if None.
+    """
+    if period not in TRUNC_KINDS:
+        raise ValueError('Unknown rollup period %r, use one of %s' % (period, ', '.join(TRUNC_KINDS)))
+    model = queryset.model
+    if queryset.query.is_sliced:
+        # a page of the stream, grouping a sliced query is not supported
+        queryset = model.objects.filter(pk__in=list(queryset.values_list('pk', flat=True)))
+    bucketed = queryset.order_by().annotate(bucket=Trunc('timestamp', period))
+
+    groups = bucketed.values(*GROUP_FIELDS).annotate(
+        count=Count('pk'),
+        actor_count=Count(Concat(
+            Cast('actor_content_type_id', CharField()), Value(':'), 'actor_object_id', output_field=CharField()
+        ), distinct=True),
+        latest=Max('timestamp'),
+        last=Max('pk'),
+    ).order_by('-latest', '-last')
+    if limit:
+        groups = groups[:limit]
+    groups = list(groups)
+    if not groups:
+        return []
+
+    # the window runs over the actions of the time range of the groups, instead of one condition per group
+    ranked = bucketed.filter(
+        timestamp__gte=min(group['bucket'] for group in groups),
+        timestamp__lte=max(group['latest'] for group in groups),
+    ).annotate(rank=Window(
+        RowNumber(), partition_by=[F(name) for name in GROUP_FIELDS], order_by=[F('timestamp').desc(), F('pk').desc()]
+    ))
+    if django.VERSION >= (4, 2):
+        ranked = ranked.filter(rank__lte=sample)
+    rows = ranked.values_list('pk', 'rank', *GROUP_FIELDS)
+    keys = {tuple(group[name] for name in GROUP_FIELDS) for group in groups}
+    samples = {}
+    for pk, rank, *key in rows:
+        key = tuple(key)
+        if rank <= sample and key in keys:
+            samples.setdefault(key, []).append(pk)
+
+    actions = model.objects.filter(pk__in=[pk for pks in samples.values() for pk in pks]).fetch_generic_relations()
+    actions = {action.pk: action for action in actions}
+    rollups = []
+    for group in groups:
+        pks = samples.get(tuple(group[name] for name in GROUP_FIELDS), [])
+        rollups.append(Rollup(
+            group['verb'], group['target_content_type_id'], group['target_object_id'], group['bucket'],
+            group['count'], group['actor_count'], group['latest'],
+            sorted((actions[pk] for pk in pks if pk in actions), key=lambda a: (a.timestamp, a.pk), reverse=True),
+        ))
+    return rollups
@@ -25,10 +25,127 @@ def get_action_manager():
         raise ImproperlyConfigured(f'Cannot import {mod} try fixing ACTSTREAM_SETTINGS[MANAGER] setting.')
 
 
+def get_action_queue():
+    """
+    Returns the queue used to defer action writes from ACTSTREAM_SETTINGS['QUEUE'],
+    or None if actions are written synchronously
+    """
+    backend = QUEUE_SETTINGS['BACKEND']
+    if not backend:
+        return None
+    try:
+        return import_obj(backend)(**QUEUE_SETTINGS['OPTIONS'])
+    except ImportError:
+        raise ImproperlyConfigured(f'Cannot import {backend} try fixing ACTSTREAM_SETTINGS[QUEUE][BACKEND] setting.')
+
+
+def get_feed_store():
+    """
+    Returns the sorted set store of the user feeds from ACTSTREAM_SETTINGS['FEED_STORE'],
+    used when ACTSTREAM_SETTINGS['FEED_MODE'] is 'store'
+    """
+    backend = FEED_STORE_SETTINGS['BACKEND']
+    try:
+        store_class = import_obj(backend)
+    except ImportError:
+        raise ImproperlyConfigured(f'Cannot import {backend} try fixing ACTSTREAM_SETTINGS[FEED_STORE][BACKEND] setting.')
+    return store_class(max_length=FEED_STORE_SETTINGS['MAX_LENGTH'], **FEED_STORE_SETTINGS['OPTIONS'])
+
+
 FETCH_RELATIONS = SETTINGS.get('FETCH_RELATIONS', True)
 
 USE_JSONFIELD = SETTINGS.get('USE_JSONFIELD', False)
 
+USE_INT_OBJECT_IDS = SETTINGS.get('USE_INT_OBJECT_IDS', False)
+
+GFK_PREFETCH_HINTS = {
+    label.lower(): hints for label, hints in SETTINGS.get('GFK_PREFETCH_HINTS', {}).items()
+}
+
+BULK_BATCH_SIZE = SETTINGS.get('BULK_BATCH_SIZE', 500)
+
+FEED_MODE = SETTINGS.get('FEED_MODE', 'read')
+
+if FEED_MODE not in ('read', 'write', 'hybrid', 'store'):
+    raise ImproperlyConfigured(
+        f'Unknown ACTSTREAM_SETTINGS[FEED_MODE] {FEED_MODE!r}, use "read", "write", "hybrid" or "store".'
+    )
+
+HYBRID_SETTINGS = {
+    'THRESHOLD': 10000,
+    'REFRESH': 3600,
+}
+HYBRID_SETTINGS.update(SETTINGS.get('HYBRID', {}))
+
+FEED_STORE_SETTINGS = {
+    'BACKEND': 'actstream.feedstores.MemoryFeedStore',
+    'OPTIONS': {},
+    'MAX_LENGTH': 1000,
+}
+FEED_STORE_SETTINGS.update(SETTINGS.get('FEED_STORE', {}))
+
+USER_STREAM_STRATEGY = SETTINGS.get('USER_STREAM_STRATEGY', 'subquery')
+
+if USER_STREAM_STRATEGY not in ('subquery', 'exists', 'followset'):
+    raise ImproperlyConfigured(
+        f'Unknown ACTSTREAM_SETTINGS[USER_STREAM_STRATEGY] {USER_STREAM_STRATEGY!r}, '
+        'use "subquery", "exists" or "followset".'
+    )
+
+ANY_STREAM_STRATEGY = SETTINGS.get('ANY_STREAM_STRATEGY', 'or')
+
+if ANY_STREAM_STRATEGY not in ('or', 'union'):
+    raise ImproperlyConfigured(
+        f'Unknown ACTSTREAM_SETTINGS[ANY_STREAM_STRATEGY] {ANY_STREAM_STRATEGY!r}, use "or" or "union".'
+    )
+
+ROLLUP_LIMIT = SETTINGS.get('ROLLUP_LIMIT', 100)
+
+QUEUE_SETTINGS = {
+    'BACKEND': None,
+    'OPTIONS': {},
+}
+QUEUE_SETTINGS.update(SETTINGS.get('QUEUE', {}))
+
+JSON_FEED_SETTINGS = {
+    'STREAMING': False,
+    'CHUNK_SIZE': 100,
+    'TOTAL_ITEMS': True,
+}
+JSON_FEED_SETTINGS.update(SETTINGS.get('JSON_FEED', {}))
+
+PARTITION_SETTINGS = {
+    'INTERVAL': 'month',
+    'AHEAD': 3,
+    'KEEP': None,
+}
+PARTITION_SETTINGS.update(SETTINGS.get('PARTITION', {}))
+
+if PARTITION_SETTINGS['INTERVAL'] not in ('day', 'week', 'month', 'year'):
+    raise ImproperlyConfigured(
+        f'Unknown ACTSTREAM_SETTINGS[PARTITION][INTERVAL] {PARTITION_SETTINGS["INTERVAL"]!r}, '
+        'use "day", "week", "month" or "year".'
+    )
+
+RETENTION_SETTINGS = {
+    'DEFAULT': None,
+    'VERBS': {},
+    'MODELS': {},
+    'BATCH_SIZE': 1000,
+}
+RETENTION_SETTINGS.update(SETTINGS.get('RETENTION', {}))
+RETENTION_SETTINGS['MODELS'] = {
+    label.lower(): age for label, age in RETENTION_SETTINGS['MODELS'].items()
+}
+
+CACHE_SETTINGS = {
+    'ENABLE': False,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'MAX_ITEMS': 200,
+}
+CACHE_SETTINGS.update(SETTINGS.get('CACHE', {}))
+
 USE_DRF = 'DRF' in SETTINGS
 
 DRF_SETTINGS = {
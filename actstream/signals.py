@@ -1,3 +1,6 @@
 from django.dispatch import Signal
 
 action = Signal()
+
+# Sent after a batch of actions is created by actstream.actions.bulk_send
+actions_created = Signal()
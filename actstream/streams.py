@@ -1,4 +1,8 @@
-from functools import wraps
+from functools import partial, wraps
+
+from actstream import settings as actstream_settings
+from actstream.cache import cached_stream
+from actstream.cursors import filter_period, paginate, paginate_union
 
 
 def stream(func):
@@ -15,16 +19,37 @@ def stream(func):
             def foobar(self, ...):
                 ...
 
+    Streams accept the ``_offset`` and ``_limit`` keyword arguments to slice the results
+    and the ``_before`` and ``_after`` cursors (see ``actstream.cursors``) to paginate them
+    by ``(timestamp, id)`` without a SQL OFFSET. Streams returning a queryset with
+    ``_union_branches`` are paginated with ``actstream.cursors.paginate_union``; the branches are kept
+    by the clones of the queryset and filtered along with it.
+    The ``_since`` and ``_until`` datetimes or timedeltas bound the timestamps of the actions
+    (see ``actstream.cursors.filter_period``), which prunes the partitions of the Action table.
+
+    When ``ACTSTREAM_SETTINGS['CACHE']`` is enabled the ids of the actions are cached
+    (see ``actstream.cache``).
     """
-    @wraps(func)
-    def wrapped(manager, *args, **kwargs):
+    def build(manager, *args, **kwargs):
         offset, limit = kwargs.pop('_offset', None), kwargs.pop('_limit', None)
+        before, after = kwargs.pop('_before', None), kwargs.pop('_after', None)
+        since, until = kwargs.pop('_since', None), kwargs.pop('_until', None)
         qs = func(manager, *args, **kwargs)
         if isinstance(qs, dict):
             qs = manager.public(**qs)
         elif isinstance(qs, (list, tuple)):
             qs = manager.public(*qs)
-        if offset or limit:
-            qs = qs[offset:limit]
+        qs = filter_period(qs, since, until)
+        branches = getattr(qs, '_union_branches', None)
+        if branches:
+            return paginate_union(qs, branches, offset, limit, before, after)
+        return paginate(qs, offset, limit, before, after)
+
+    @wraps(func)
+    def wrapped(manager, *args, **kwargs):
+        if actstream_settings.CACHE_SETTINGS['ENABLE']:
+            qs = cached_stream(manager, func.__name__, args, kwargs, partial(build, manager, *args, **kwargs))
+        else:
+            qs = build(manager, *args, **kwargs)
         return qs.fetch_generic_relations()
     return wrapped
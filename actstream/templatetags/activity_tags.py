@@ -1,13 +1,69 @@
-from django.contrib.contenttypes.models import ContentType
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.template import Variable, Library, Node, TemplateSyntaxError
-from django.template.loader import render_to_string
+from django.template.loader import select_template
 from django.urls import reverse
+from django.utils.autoreload import file_changed
 
+from actstream import contenttypes
 from actstream.models import Follow, Action
 
 
 register = Library()
 
+# context variable of the maps of the following_map tag, keyed by (user id, flag)
+FOLLOWING_MAPS = 'actstream_following'
+
+# templates of the display_action and display_rollup tags by (name, verb),
+# the generic template for verbs without one
+_action_templates = {}
+
+
+@receiver(file_changed)
+@receiver(setting_changed)
+def clear_action_templates(**kwargs):
+    if kwargs.get('setting', 'TEMPLATES') == 'TEMPLATES':
+        _action_templates.clear()
+
+
+def get_action_template(verb, name='action'):
+    """
+    Returns the template of the actions of the verb, ``actstream/<verb>/<name>.html``
+    or ``actstream/<name>.html``, selected once per verb.
+    """
+    template = _action_templates.get((name, verb))
+    if template is None:
+        template = _action_templates[(name, verb)] = select_template([
+            'actstream/%s/%s.html' % (verb.replace(' ', '_'), name),
+            'actstream/%s.html' % name,
+        ])
+    return template
+
+
+def render_action(context, action, name='action'):
+    """
+    Renders the template of the action with the ``action`` variable pushed on the context,
+    or of a rollup of actions with the ``rollup`` variable.
+    """
+    template = get_action_template(action.verb, name)
+    if not hasattr(template, 'template'):
+        # not a Django template, rendered with a copy of the context
+        return template.render(dict(context.flatten(), **{name: action}))
+    with context.push(**{name: action}):
+        return template.template.render(context)
+
+
+def is_following_in_context(context, user, actor, flag=''):
+    """
+    Returns true if the user is following the actor, read from the maps of the
+    ``following_map`` tag when the actor is in one of them.
+    """
+    following = context.get(FOLLOWING_MAPS, {}).get((getattr(user, 'pk', None), flag), {})
+    key = (contenttypes.get_content_type(actor).pk, str(actor.pk))
+    if key in following:
+        return following[key]
+    return Follow.objects.is_following(user, actor, flag=flag)
+
 
 class DisplayActivityFollowUrl(Node):
     def __init__(self, actor, actor_only=True, flag=''):
@@ -17,7 +73,7 @@ class DisplayActivityFollowUrl(Node):
 
     def render(self, context):
         actor_instance = self.actor.resolve(context)
-        content_type = ContentType.objects.get_for_model(actor_instance).pk
+        content_type = contenttypes.get_content_type(actor_instance).pk
 
         kwargs = {
             'content_type_id': content_type,
@@ -27,7 +83,7 @@ class DisplayActivityFollowUrl(Node):
         if self.flag:
             kwargs['flag'] = self.flag
 
-        if Follow.objects.is_following(context.get('user'), actor_instance, flag=self.flag):
+        if is_following_in_context(context, context.get('user'), actor_instance, flag=self.flag):
             return reverse('actstream_unfollow', kwargs=kwargs)
         if self.actor_only:
             return reverse('actstream_follow', kwargs=kwargs)
@@ -40,7 +96,7 @@ class DisplayActivityActorUrl(Node):
 
     def render(self, context):
         actor_instance = self.actor.resolve(context)
-        content_type = ContentType.objects.get_for_model(actor_instance).pk
+        content_type = contenttypes.get_content_type(actor_instance).pk
         return reverse('actstream_actor', kwargs={
             'content_type_id': content_type, 'object_id': actor_instance.pk})
 
@@ -92,12 +148,19 @@ class AsNode(Node):
 class DisplayAction(AsNode):
 
     def render_result(self, context):
-        action_instance = context['action'] = self.args[0].resolve(context)
-        templates = [
-            'actstream/%s/action.html' % action_instance.verb.replace(' ', '_'),
-            'actstream/action.html',
-        ]
-        return render_to_string(templates, context.flatten())
+        return render_action(context, self.args[0].resolve(context))
+
+
+class DisplayActions(AsNode):
+
+    def render_result(self, context):
+        return ''.join(render_action(context, action) for action in self.args[0].resolve(context))
+
+
+class DisplayRollup(AsNode):
+
+    def render_result(self, context):
+        return render_action(context, self.args[0].resolve(context), 'rollup')
 
 
 def display_action(parser, token):
@@ -111,6 +174,45 @@ def display_action(parser, token):
     return DisplayAction.handle_token(parser, token)
 
 
+def display_actions(parser, token):
+    """
+    Renders the template of each action of a stream, like ``display_action`` in a loop
+
+    ::
+
+        {% display_actions stream %}
+    """
+    return DisplayActions.handle_token(parser, token)
+
+
+def display_rollup(parser, token):
+    """
+    Renders the template of a group of actions returned by the ``rollup`` filter
+
+    ::
+
+        {% for rollup in stream|rollup:"day" %}
+            {% display_rollup rollup %}
+        {% endfor %}
+    """
+    return DisplayRollup.handle_token(parser, token)
+
+
+def rollup(stream, period='hour'):
+    """
+    Returns the groups of the actions of a stream with the same verb and target in the same period,
+    see ``actstream.rollups.rollup``
+
+    ::
+
+        {% activity_stream 'user' request.user _limit=100 %}
+        {% for rollup in stream|rollup:"hour" %}
+            {% display_rollup rollup %}
+        {% endfor %}
+    """
+    return stream.rollup(period)
+
+
 def is_following(user, actor):
     """
     Returns true if the given user is following the actor
@@ -132,7 +234,7 @@ class IsFollowing(AsNode):
         actor = self.args[1].resolve(context)
         flag = self.args[2].resolve(context)
 
-        return Follow.objects.is_following(user, actor, flag=flag)
+        return is_following_in_context(context, user, actor, flag=flag)
 
 
 def is_following_tag(parser, token):
@@ -237,6 +339,29 @@ def actor_url(parser, token):
         return DisplayActivityActorUrl(*bits[1:])
 
 
+def following_map(context, user, objects, flag=''):
+    """
+    Looks up whether the user is following each of the objects in a single query, so that the
+    ``follow_url``, ``follow_all_url`` and ``is_following`` tags rendered later for these objects
+    with the same user and flag do not query the database.
+
+    ::
+
+        {% following_map request.user users %}
+        {% for other_user in users %}
+            <a href="{% follow_url other_user %}">{{ other_user }}</a>
+        {% endfor %}
+
+        {% following_map request.user groups "watching" %}
+    """
+    # kept in the outermost layer of the context, which outlives the blocks and the included templates
+    maps = context.dicts[0].setdefault(FOLLOWING_MAPS, {})
+    maps.setdefault((getattr(user, 'pk', None), flag), {}).update(
+        Follow.objects.following_map(user, objects, flag=flag)
+    )
+    return ''
+
+
 def activity_stream(context, stream_type, *args, **kwargs):
     """
     Renders an activity stream as a list into the template's context.
@@ -261,9 +386,13 @@ def activity_stream(context, stream_type, *args, **kwargs):
 
 register.filter(activity_stream)
 register.filter(is_following)
+register.filter(rollup)
 register.tag(name='is_following', compile_function=is_following_tag)
 register.tag(display_action)
+register.tag(display_actions)
+register.tag(display_rollup)
 register.tag(follow_url)
 register.tag(follow_all_url)
 register.tag(actor_url)
 register.simple_tag(takes_context=True)(activity_stream)
+register.simple_tag(takes_context=True)(following_map)
@@ -1,6 +1,7 @@
 from json import loads
 from datetime import datetime
 from inspect import signature
+from unittest.mock import patch
 
 from django.apps import apps
 from django.test import TestCase
@@ -12,7 +13,7 @@ from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
 
-from actstream.models import Action, Follow
+from actstream.models import Action, FeedEntry, Follow, user_stream
 from actstream.registry import register, unregister
 from actstream.actions import follow
 from actstream.signals import action
@@ -61,6 +62,14 @@ class ActivityBaseTestCase(TestCase):
     def assertJSON(self, string):
         return loads(string)
 
+    def start_patch(self, patcher):
+        """
+        Starts the patcher until the end of the test and returns its value.
+        """
+        value = patcher.start()
+        self.addCleanup(patcher.stop)
+        return value
+
     def tearDown(self):
         for model in self.actstream_models:
             model = apps.get_model(*model.split('.'))
@@ -141,3 +150,27 @@ class DataTestCase(ActivityBaseTestCase):
         follow(self.user4, self.user1, timestamp=self.testdate, flag='liking')
         # User4 blacklist user3
         follow(self.user4, self.user3, timestamp=self.testdate, flag='blacklisting')
+
+
+class FeedModeTestCase(DataTestCase):
+    """
+    Runs the tests with ``ACTSTREAM_SETTINGS['FEED_MODE']`` set to ``feed_mode``.
+    """
+    feed_mode = 'read'
+
+    def setUp(self):
+        self.start_patch(patch('actstream.settings.FEED_MODE', self.feed_mode))
+        super(FeedModeTestCase, self).setUp()
+
+    def tearDown(self):
+        FeedEntry.objects.all().delete()
+        super(FeedModeTestCase, self).tearDown()
+
+    def assertSameAsFollowStream(self, user, **kwargs):
+        """
+        Asserts that the stream of the user has the actions read from the Follow table,
+        ordered by ``(-timestamp, -id)`` as the ties of streams without a limit are in no given order there.
+        """
+        with patch('actstream.settings.FEED_MODE', 'read'):
+            expected = sorted(user_stream(user, **kwargs), key=lambda action: (action.timestamp, action.pk), reverse=True)
+        self.assertEqual(list(user_stream(user, **kwargs)), expected)
@@ -1,5 +1,9 @@
 # -*- coding: utf-8  -*-
-from django.contrib.auth.models import Group
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser, Group
+from django.template.loader import select_template
+from django.test import override_settings
 
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import activate, get_language
@@ -208,6 +212,44 @@ class ActivityTestCase(DataTestCase):
         src = '{% display_action action as nope %}'
         self.assertEqual(render(src, action=self.join_action), '')
 
+    def test_tag_display_action_templates(self):
+        templates = [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'OPTIONS': {'loaders': [
+                ('django.template.loaders.locmem.Loader', {
+                    'actstream/joined/action.html': '{{ action.actor }} joined{% with nope=1 %}{% endwith %}',
+                }),
+                'django.template.loaders.app_directories.Loader',
+            ]},
+        }]
+        other = Action.objects.exclude(verb='joined').first()
+        with override_settings(TEMPLATES=templates), \
+                patch('actstream.templatetags.activity_tags.select_template', wraps=select_template) as mock:
+            src = '{% display_action action %}|{% display_action other %}|{{ action }}'
+            output = render(src, action=self.join_action, other=other)
+            self.assertTrue(output.startswith('%s joined|' % self.user1))
+            self.assertIn(other.verb, output)
+            # the action variable is only set while the template is rendered
+            self.assertTrue(output.endswith('|%s' % self.join_action))
+            render(src, action=self.join_action, other=other)
+            # selected once per verb, including the verb without a template
+            self.assertEqual(mock.call_count, 2)
+
+    def test_tag_display_actions(self):
+        actions = list(Action.objects.all())
+        self.assertEqual(
+            render('{% display_actions stream %}', stream=actions),
+            render('{% for action in stream %}{% display_action action %}{% endfor %}', stream=actions)
+        )
+        self.assertEqual(render('{% display_actions stream as nope %}', stream=actions), '')
+
+    def test_tag_display_rollup(self):
+        src = ('{% activity_stream "target" group as="mystream" %}'
+               '{% for rollup in mystream|rollup:"day" %}{% display_rollup rollup %}|{% endfor %}')
+        output = render(src, group=self.group)
+        self.assertEqual(output.count('|'), len(Action.objects.target(self.group).rollup('day')))
+        self.assertAllIn([str(self.user2), 'joined', str(self.group)], output)
+
     def test_tag_activity_stream(self):
         output = render('''{% activity_stream 'actor' user as='mystream' %}
         {% for action in mystream %}
@@ -258,6 +300,42 @@ class ActivityTestCase(DataTestCase):
         self.assertEqual(render(src, user=self.user4, group=self.another_group, verb='liking'), 'yup')
         self.assertEqual(render(src, user=self.user1, group=self.another_group, verb='liking'), '')
 
+    def test_following_map(self):
+        objects = [self.user1, self.user2, self.user3, self.group, self.another_group]
+        with self.assertNumQueries(1):
+            following = Follow.objects.following_map(self.user4, objects)
+        self.assertEqual([following[self.user_ct.pk, str(obj.pk)] for obj in objects[:3]], [True, False, True])
+        self.assertTrue(following[self.group_ct.pk, str(self.another_group.pk)])
+        self.assertFalse(following[self.group_ct.pk, str(self.group.pk)])
+        liking = Follow.objects.following_map(self.user4, objects, flag='liking')
+        self.assertFalse(liking[self.user_ct.pk, str(self.user3.pk)])
+        self.assertTrue(liking[self.user_ct.pk, str(self.user1.pk)])
+        self.assertFalse(any(Follow.objects.following_map(AnonymousUser(), objects).values()))
+
+    def test_tag_following_map(self):
+        src = '{% following_map user others %}{% for other in others %}' \
+              '{% follow_url other %} {% is_following user other "" as yup %}{{ yup }} {% endfor %}'
+        users = [self.user2, self.user3]
+        with self.assertNumQueries(1):
+            output = render(src, user=self.user1, others=users)
+        self.assertEqual(output, '%s True %s False ' % (
+            reverse('actstream_unfollow', args=(self.user_ct.pk, self.user2.pk)),
+            reverse('actstream_follow', args=(self.user_ct.pk, self.user3.pk)),
+        ))
+        # objects missing from the map and other flags are looked up
+        src = '{% following_map user others %}{% is_following user group "" as yup %}{{ yup }}' \
+              '{% is_following user other "liking" as yup %}{{ yup }}'
+        with self.assertNumQueries(3):
+            output = render(src, user=self.user1, others=users, group=self.group, other=self.user2)
+        self.assertEqual(output, 'FalseFalse')
+        # built inside blocks and read after them
+        src = '{% for other in others %}{% with others|slice:":1" as first %}{% following_map user others %}' \
+              '{% endwith %}{% endfor %}{% for other in others %}{% is_following user other "" as yup %}{{ yup }} ' \
+              '{% endfor %}'
+        with self.assertNumQueries(2):
+            output = render(src, user=self.user1, others=users)
+        self.assertEqual(output, 'True False ')
+
     def test_none_returns_an_empty_queryset(self):
         qs = Action.objects.none()
         self.assertFalse(qs.exists())
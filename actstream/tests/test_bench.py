@@ -0,0 +1,47 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from actstream.models import Action
+from actstream.tests.base import ActivityBaseTestCase
+
+
+class BenchmarkCommandTestCase(ActivityBaseTestCase):
+    actstream_models = ('auth.Group', 'sites.Site')
+
+    def test_bench(self):
+        out = StringIO()
+        call_command('bench', users=5, follows=2, actions=2, repeat=2, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['dataset']['users'], 5)
+        for name in ('user_stream', 'any_stream', 'model_stream', 'follow', 'action_send',
+                     'user_feed_json', 'user_feed_atom', 'object_feed_json', 'object_feed_atom'):
+            self.assertEqual(report['results'][name]['runs'], 2)
+            self.assertGreater(report['results'][name]['queries'], 0)
+        # the generated dataset is rolled back
+        self.assertFalse(Action.objects.exists())
+
+    def test_only(self):
+        out = StringIO()
+        call_command('bench', users=3, repeat=1, only=['action_send'], stdout=out)
+        self.assertEqual(list(json.loads(out.getvalue())['results']), ['action_send'])
+
+    def test_feed_format(self):
+        out = StringIO()
+        call_command('bench', users=3, repeat=2, only=['feed_format', 'feed_format_uncached'], stdout=out)
+        results = json.loads(out.getvalue())['results']
+        for name in ('feed_format', 'feed_format_uncached'):
+            self.assertIn('median_per_item_ms', results[name])
+
+    def test_hybrid(self):
+        out = StringIO()
+        with patch('actstream.settings.FEED_MODE', 'hybrid'):
+            call_command('bench', users=6, follows=1, actions=1, repeat=2, threshold=3,
+                         only=['action_send_regular', 'action_send_celebrity'], stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['hybrid_threshold'], 3)
+        # the actions of the pulled actor are not fanned out
+        self.assertEqual(report['results']['action_send_celebrity']['rows'], 0)
+        self.assertIn('rows', report['results']['action_send_regular'])
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from actstream.actions import bulk_send
+from actstream.models import Action, FeedEntry, actor_stream
+from actstream.signals import actions_created
+from actstream.tests.base import DataTestCase
+
+from testapp.models import Unregistered
+
+
+class BulkSendTestCase(DataTestCase):
+
+    def specs(self, count):
+        for i in range(count):
+            yield {'actor': self.user3, 'verb': 'imported', 'target': self.group,
+                   'timestamp': self.testdate, 'number': i}
+
+    def test_bulk_send(self):
+        batches = []
+
+        def receiver(sender, actions, **kwargs):
+            batches.append(len(actions))
+
+        actions_created.connect(receiver)
+        self.addCleanup(actions_created.disconnect, receiver)
+
+        self.assertEqual(bulk_send(self.specs(25), batch_size=10), 25)
+        self.assertEqual(batches, [10, 10, 5])
+        self.assertEqual(actor_stream(self.user3).filter(verb='imported').count(), 25)
+        imported = Action.objects.filter(verb='imported').first()
+        self.assertEqual(imported.target, self.group)
+        self.assertEqual(str(imported), 'Three imported CoolGroup %s ago' % self.timesince)
+
+    def test_queries(self):
+        # one insert per batch, content types and registry checks are resolved once per model
+        with patch('actstream.actions.check') as check:
+            self.assertNumQueries(3, bulk_send, self.specs(25), batch_size=10, send_signal=False)
+        self.assertEqual(check.call_count, 1)
+
+    def test_write_mode_queries(self):
+        # per batch: the insert, the followers of all its actions and the insert of the feed entries
+        with patch('actstream.settings.FEED_MODE', 'write'):
+            self.assertNumQueries(9, bulk_send, self.specs(25), batch_size=10, send_signal=False)
+        # user4 follows user3
+        self.assertEqual(FeedEntry.objects.filter(user=self.user4, action__verb='imported').count(), 25)
+        FeedEntry.objects.all().delete()
+
+    def test_unregistered(self):
+        unregistered = Unregistered.objects.create(name='nope')
+        specs = [{'actor': self.user1, 'verb': 'liked', 'target': unregistered}]
+        self.assertRaises(ImproperlyConfigured, bulk_send, specs)
+
+    def test_without_returned_pks(self):
+        # eg MySQL, the primary keys are read back after the insert
+        features = type(connection.features)
+        with patch.object(features, 'can_return_rows_from_bulk_insert', False), \
+                patch('actstream.settings.FEED_MODE', 'write'):
+            self.assertEqual(bulk_send(self.specs(25), batch_size=10), 25)
+        imported = list(Action.objects.filter(verb='imported'))
+        self.assertTrue(all(action.pk for action in imported))
+        # user4 follows user3
+        self.assertCountEqual(FeedEntry.objects.filter(action__verb='imported').values_list('action_id', flat=True),
+                              [action.pk for action in imported])
+        FeedEntry.objects.all().delete()
@@ -0,0 +1,107 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from actstream.actions import follow, unfollow
+from actstream.cache import action_scopes, feed_scope, get_cache, get_key
+from actstream.models import Action, actor_stream, model_stream, user_stream
+from actstream.signals import action
+from actstream.tests.base import DataTestCase
+
+
+class StreamCacheTestCase(DataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.start_patch(patch.dict('actstream.settings.CACHE_SETTINGS', ENABLE=True))
+        get_cache().clear()
+        self.addCleanup(get_cache().clear)
+
+    def uncached(self, func, *args, **kwargs):
+        with patch.dict('actstream.settings.CACHE_SETTINGS', ENABLE=False):
+            return list(func(*args, **kwargs))
+
+    def assertCached(self, func, *args, **kwargs):
+        # only looks up the cached ids and the generic relations
+        with CaptureQueriesContext(connection) as context:
+            result = list(func(*args, **kwargs))
+        for query in context.captured_queries:
+            if 'FROM "actstream_action"' in query['sql']:
+                self.assertIn('"actstream_action"."id" IN', query['sql'])
+        return result
+
+    def test_cached_stream(self):
+        expected = list(Action.objects.actor(self.user1))
+        self.assertEqual(list(actor_stream(self.user1)), expected)
+        self.assertEqual(self.assertCached(actor_stream, self.user1), expected)
+
+    def test_paging_arguments(self):
+        for kwargs in ({'_limit': 1}, {'_offset': 1, '_limit': 1}):
+            expected = self.uncached(actor_stream, self.user1, **kwargs)
+            self.assertEqual(list(actor_stream(self.user1, **kwargs)), expected)
+            self.assertEqual(self.assertCached(actor_stream, self.user1, **kwargs), expected)
+
+    def test_action_invalidation(self):
+        list(actor_stream(self.user1))
+        list(actor_stream(self.user3))
+        list(model_stream(self.user1))
+        newaction = action.send(self.user1, verb='ran')[0][1]
+        self.assertEqual(list(actor_stream(self.user1))[0], newaction)
+        self.assertEqual(list(model_stream(self.user1))[0], newaction)
+        self.assertCached(actor_stream, self.user3)
+
+    def test_follower_invalidation(self):
+        # user1 follows user2
+        stream = list(user_stream(self.user1))
+        list(user_stream(self.user3))
+        newaction = action.send(self.user2, verb='ran')[0][1]
+        self.assertEqual(list(user_stream(self.user1)), [newaction] + stream)
+        self.assertNotIn(newaction, self.assertCached(user_stream, self.user3))
+
+    def test_follow_invalidation(self):
+        self.assertEqual(list(user_stream(self.user3)), [])
+        follow(self.user3, self.user1, send_action=False)
+        self.assertCountEqual(user_stream(self.user3), self.uncached(actor_stream, self.user1))
+        unfollow(self.user3, self.user1)
+        self.assertEqual(list(user_stream(self.user3)), [])
+
+    def test_follow_scope(self):
+        def key(name, *args):
+            return get_key(Action.objects, name, args, {})
+
+        keys = [key('model_actions', self.User), key('testbar', 'joined'), key('actor', self.user1)]
+        custom = key('testfoo', self.user3)
+        follow(self.user3, self.user1, send_action=False)
+        # only the streams of the user
+        self.assertEqual([key('model_actions', self.User), key('testbar', 'joined'), key('actor', self.user1)], keys)
+        self.assertEqual(key('testfoo', self.user3), custom)
+        with patch.object(type(Action.objects), 'follow_streams', ('testfoo',)):
+            custom = key('testfoo', self.user3)
+            unfollow(self.user3, self.user1)
+            self.assertNotEqual(key('testfoo', self.user3), custom)
+
+    def test_action_scopes_query(self):
+        actions = list(Action.objects.all())
+        with self.assertNumQueries(1):
+            scopes = action_scopes(*actions)
+        # user1 follows user2, user4 follows another_group as a target
+        self.assertIn(feed_scope(self.user1.pk), scopes)
+        self.assertIn(feed_scope(self.user4.pk), scopes)
+
+    def test_deleted_action(self):
+        stream = list(actor_stream(self.user1))
+        stream[0].delete()
+        self.assertEqual(list(actor_stream(self.user1)), stream[1:])
+
+    def test_uncacheable_arguments(self):
+        # sets have no stable representation, the stream is read from the database
+        with patch('actstream.cache.get_cache') as cache:
+            self.assertEqual(list(Action.objects.actor(self.user1, verb__in={'joined'})),
+                             [self.join_action])
+        cache.assert_not_called()
+
+    def test_too_large(self):
+        with patch.dict('actstream.settings.CACHE_SETTINGS', MAX_ITEMS=1):
+            stream = list(actor_stream(self.user1))
+            self.assertEqual(list(actor_stream(self.user1)), stream)
@@ -0,0 +1,50 @@
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
+
+from actstream import contenttypes
+from actstream.tests.base import DataTestCase
+
+from testapp.models import Unregistered
+
+
+class ContentTypesTestCase(DataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # as in a new worker process
+        ContentType.objects.clear_cache()
+        contenttypes.clear()
+
+    def tearDown(self):
+        contenttypes.clear()
+        super().tearDown()
+
+    def test_warmed_together(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(contenttypes.get_content_type(self.user1), self.user_ct)
+        with self.assertNumQueries(0):
+            self.assertEqual(contenttypes.get_content_type(Group), self.group_ct)
+            self.assertEqual(contenttypes.get_content_type_id(self.comment), self.site_ct.pk)
+            self.assertIs(contenttypes.get_model(self.group_ct.pk), Group)
+            # filled Django's cache as well
+            self.assertEqual(ContentType.objects.get_for_model(Site), self.site_ct)
+
+    def test_get_model_first(self):
+        with self.assertNumQueries(1):
+            self.assertIs(contenttypes.get_model(self.site_ct.pk), Site)
+            self.assertEqual(contenttypes.get_content_type(self.User), self.user_ct)
+
+    def test_unregistered(self):
+        content_type = ContentType.objects.get_for_model(Unregistered)
+        self.assertEqual(contenttypes.get_content_type(Unregistered), content_type)
+        with self.assertNumQueries(0):
+            self.assertIs(contenttypes.get_model(content_type.pk), Unregistered)
+
+    def test_clear(self):
+        contenttypes.get_content_type(Group)
+        # connected to post_migrate
+        contenttypes.clear(sender=None)
+        self.assertFalse(contenttypes._content_types)
+        with self.assertNumQueries(0):
+            contenttypes.get_content_type(Group)
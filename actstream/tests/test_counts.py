@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from actstream.actions import delete_follow, follow, unfollow
+from actstream.models import Follow, FollowerCount, FollowingCount, follower_count, following_count
+from actstream.tests.base import DataTestCase
+
+
+class FollowCountTestCase(DataTestCase):
+
+    def assertCounts(self, deleted=()):
+        objects = [self.user1, self.user2, self.user3, self.user4, self.group, self.another_group]
+        objects = [obj for obj in objects if obj not in deleted]
+        for obj in objects:
+            for flag in ('', 'liking', 'watching'):
+                self.assertEqual(follower_count(obj, flag=flag),
+                                 Follow.objects.followers_qs(obj, flag=flag).count())
+        for user in [obj for obj in objects if isinstance(obj, self.User)]:
+            for flag in ('', 'liking', 'watching'):
+                self.assertEqual(following_count(user, flag=flag),
+                                 Follow.objects.filter(user=user, **({'flag': flag} if flag else {})).count())
+
+    def test_counts(self):
+        self.assertEqual(follower_count(self.another_group), 2)
+        self.assertEqual(follower_count(self.another_group, flag='liking'), 1)
+        self.assertEqual(following_count(self.user4), 4)
+        self.assertCounts()
+
+    def test_follow_unfollow(self):
+        follow(self.user3, self.another_group, flag='liking')
+        follow(self.user3, self.another_group, flag='liking')
+        self.assertEqual(follower_count(self.another_group, flag='liking'), 2)
+        unfollow(self.user4, self.another_group)
+        self.assertEqual(follower_count(self.another_group), 1)
+        self.assertEqual(following_count(self.user4, flag='watching'), 0)
+        self.assertFalse(FollowingCount.objects.filter(user=self.user4, flag='watching').exists())
+        self.assertCounts()
+
+    def test_delete_follow(self):
+        delete_follow(Follow.objects.get(user=self.user4, content_type=self.group_ct, flag='liking'))
+        delete_follow(Follow.objects.get(user=self.user4, content_type=self.group_ct, flag='watching'))
+        self.assertEqual(follower_count(self.another_group), 0)
+        self.assertEqual(following_count(self.user4), 2)
+        self.assertCounts()
+
+    def test_query(self):
+        self.assertNumQueries(1, follower_count, self.user2)
+
+    def test_deleted_objects(self):
+        self.another_group.delete()
+        self.assertEqual(following_count(self.user4), 2)
+        self.assertCounts(deleted=(self.another_group,))
+        self.user4.delete()
+        self.assertEqual(follower_count(self.user1), 0)
+
+    def test_reconcile_command(self):
+        FollowerCount.objects.filter(content_type=self.user_ct, object_id=self.user2.pk).update(count=10)
+        FollowingCount.objects.filter(user=self.user4).delete()
+        FollowingCount.objects.create(user=self.user3, flag='stale', count=3)
+        out = StringIO()
+        call_command('actstream_reconcile_counts', stdout=out)
+        self.assertIn('Fixed 1 followercount counters', out.getvalue())
+        self.assertIn('Fixed 4 followingcount counters', out.getvalue())
+        self.assertFalse(FollowingCount.objects.filter(flag='stale').exists())
+        self.assertCounts()
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from json import loads
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.urls import reverse
+
+from actstream.cursors import decode_cursor, encode_cursor
+from actstream.models import model_stream
+from actstream.settings import USE_DRF
+from actstream.signals import action
+from actstream.tests.base import DataTestCase
+
+
+class CursorTestCase(DataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            action.send(self.user3, verb='posted %d' % i, timestamp=self.testdate + timedelta(days=i))
+        self.stream = list(model_stream(self.User).order_by('-timestamp', '-pk'))
+
+    def pages(self, limit, **kwargs):
+        pages, cursor = [], None
+        while True:
+            page = list(model_stream(self.User, _before=cursor, _limit=limit, **kwargs))
+            if not page:
+                return pages
+            pages.append(page)
+            cursor = encode_cursor(page[-1])
+
+    def test_roundtrip(self):
+        first = self.stream[0]
+        self.assertEqual(decode_cursor(encode_cursor(first)), (first.timestamp, first.pk))
+        self.assertRaises(ValueError, decode_cursor, 'not a cursor')
+
+    def test_before(self):
+        pages = self.pages(3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 3, 3])
+        # actions sharing a timestamp are neither skipped nor repeated
+        self.assertEqual(sum(pages, []), self.stream)
+
+    def test_after(self):
+        cursor = encode_cursor(self.stream[6])
+        self.assertEqual(list(model_stream(self.User, _after=cursor, _limit=2)), self.stream[4:6])
+        self.assertEqual(list(model_stream(self.User, _after=cursor)), self.stream[:6])
+
+    def test_view(self):
+        self.client.login(username='admin', password='admin')
+        url = reverse('actstream_model', args=[self.user_ct.pk])
+        response = self.client.get(url, {'limit': 4})
+        self.assertEqual(list(response.context['action_list']), self.stream[:4])
+        response = self.client.get(url, {'limit': 4, 'before': response.context['next_cursor']})
+        self.assertEqual(list(response.context['action_list']), self.stream[4:8])
+        self.assertEqual(self.client.get(url, {'before': 'nope'}).status_code, 400)
+        # pages after a cursor continue towards the newer actions
+        response = self.client.get(url, {'limit': 2, 'after': encode_cursor(self.stream[6])})
+        self.assertEqual(list(response.context['action_list']), self.stream[4:6])
+        self.assertIsNone(response.context['next_cursor'])
+        response = self.client.get(url, {'limit': 2, 'after': response.context['prev_cursor']})
+        self.assertEqual(list(response.context['action_list']), self.stream[2:4])
+
+    def feed_ids(self, data):
+        return [int(item['id'].rstrip('/').rsplit('/', 1)[1]) for item in data['items']]
+
+    def test_json_feed(self):
+        data = self.capture('actstream_model_feed_json', self.user_ct.pk, query_string='limit=10')
+        self.assertEqual(len(data['items']), 10)
+        data = self.capture('actstream_model_feed_json', self.user_ct.pk, query_string='limit=10&before=' + data['next'])
+        self.assertEqual(len(data['items']), 5)
+        self.assertNotIn('next', data)
+        data = self.capture('actstream_model_feed_json', self.user_ct.pk,
+                            query_string='limit=3&after=' + encode_cursor(self.stream[6]))
+        self.assertEqual(self.feed_ids(data), [a.pk for a in self.stream[3:6]])
+        self.assertNotIn('next', data)
+        data = self.capture('actstream_model_feed_json', self.user_ct.pk, query_string='limit=3&after=' + data['prev'])
+        self.assertEqual(self.feed_ids(data), [a.pk for a in self.stream[:3]])
+        url = reverse('actstream_model_feed_json', args=(self.user_ct.pk,))
+        with patch.dict('actstream.settings.JSON_FEED_SETTINGS', STREAMING=True):
+            response = self.client.get(url, {'limit': 3, 'after': encode_cursor(self.stream[6])})
+        streamed = loads(b''.join(response.streaming_content))
+        self.assertEqual(self.feed_ids(streamed), [a.pk for a in self.stream[3:6]])
+        self.assertEqual(streamed['prev'], encode_cursor(self.stream[3]))
+        self.assertNotIn('next', streamed)
+
+    @skipUnless(USE_DRF, 'Django rest framework disabled')
+    def test_drf(self):
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.login(username='admin', password='admin')
+        url = reverse('action-model-stream', args=[self.user_ct.pk])
+        data = client.get(url, {'limit': 5}).data
+        self.assertEqual([item['id'] for item in data['results']], [a.pk for a in self.stream[:5]])
+        data = client.get(url, {'limit': 5, 'before': data['next']}).data
+        self.assertEqual([item['id'] for item in data['results']], [a.pk for a in self.stream[5:10]])
+        self.assertEqual(client.get(url, {'after': 'nope'}).status_code, 400)
+        data = client.get(url, {'limit': 2, 'after': encode_cursor(self.stream[6])}).data
+        self.assertEqual([item['id'] for item in data['results']], [a.pk for a in self.stream[4:6]])
+        self.assertIsNone(data['next'])
+        data = client.get(url, {'limit': 2, 'after': data['prev']}).data
+        self.assertEqual([item['id'] for item in data['results']], [a.pk for a in self.stream[2:4]])
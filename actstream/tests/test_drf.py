@@ -1,4 +1,5 @@
 from unittest import skipUnless
+from unittest.mock import patch
 from json import loads
 
 
@@ -6,7 +7,7 @@ from django.urls import reverse
 
 from actstream.tests.base import DataTestCase
 from actstream.settings import USE_DRF, DRF_SETTINGS
-from actstream.models import Action, Follow
+from actstream.models import Action, Follow, follower_count, following_count
 from actstream import signals
 
 
@@ -116,6 +117,22 @@ class DRFActionTestCase(BaseDRFTestCase):
         assert len(actions) == 2
         assert actions[0]['actor']['username'] == actions[1]['actor']['username'] == 'Two'
 
+    def test_rollup(self):
+        url = reverse('action-model-stream', args=[self.group_ct.id])
+        rollups = self.get(url + '?rollup=day', auth=True)
+        assert sum(rollup['count'] for rollup in rollups) == 7
+        joined = [rollup for rollup in rollups if rollup['verb'] == 'joined'][0]
+        assert joined['target']['name'] == 'CoolGroup'
+        assert joined['actions'][0]['verb'] == 'joined'
+        assert len(joined['actors']) == joined['actor_count']
+        page = self.get(url + '?rollup=day&limit=2', auth=True)
+        assert sum(rollup['count'] for rollup in page['results']) == 2
+        assert page['next']
+        with patch('actstream.settings.ROLLUP_LIMIT', 1):
+            assert len(self.get(url + '?rollup=day', auth=True)) == 1
+        response = self.auth_client.get(url + '?rollup=fortnight')
+        assert response.status_code == 400
+
     def test_action_send(self):
         body = {
             'verb': 'mentioned',
@@ -146,6 +163,20 @@ class DRFFollowTestCase(BaseDRFTestCase):
         assert follow.user == self.user1
         assert follow.user == self.user1
         assert follow.user == self.user1
+        assert follower_count(self.comment) == 1
+
+    def test_unfollow(self):
+        follow = Follow.objects.get(user=self.user1, object_id=self.user2.pk)
+        resp = self.auth_client.delete(reverse('follow-detail', args=[follow.pk]))
+        assert resp.status_code == 204
+        assert not Follow.objects.filter(pk=follow.pk).exists()
+        assert follower_count(self.user2) == 0
+        assert following_count(self.user1) == 0
+
+        # the follows of other users are not deleted
+        other = Follow.objects.filter(user=self.user4).first()
+        assert self.auth_client.delete(reverse('follow-detail', args=[other.pk])).status_code == 404
+        assert following_count(self.user4) == 4
 
     def test_is_following(self):
         url = reverse('follow-is-following', args=[self.site_ct.id, self.comment.id])
@@ -158,6 +189,15 @@ class DRFFollowTestCase(BaseDRFTestCase):
         data = loads(resp.data)
         assert data['is_following']
 
+    def test_following_map(self):
+        url = reverse('follow-following-map')
+        objects = ['%s:%s' % (self.user_ct.id, self.user2.id), '%s:%s' % (self.site_ct.id, self.comment.id)]
+        resp = self.auth_client.get(url, {'object': objects})
+        assert resp.data == {objects[0]: True, objects[1]: False}
+        resp = self.auth_client.get(url, {'object': objects, 'flag': 'liking'})
+        assert resp.data == {objects[0]: False, objects[1]: False}
+        assert self.auth_client.get(url, {'object': 'nope'}).status_code == 400
+
     def test_followers(self):
         followers = self.auth_client.get(reverse('follow-followers')).data
         assert len(followers) == 1
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from actstream.actions import follow, unfollow
+from actstream.cursors import encode_cursor
+from actstream.models import Action, FeedEntry, user_stream
+from actstream.signals import action
+from actstream.tests.base import FeedModeTestCase
+
+
+class FanoutTestCase(FeedModeTestCase):
+    feed_mode = 'write'
+
+    def test_stream(self):
+        self.assertSetEqual(user_stream(self.user1), [
+            'Two started following CoolGroup %s ago' % self.timesince,
+            'Two joined CoolGroup %s ago' % self.timesince,
+        ])
+        self.assertSetEqual(user_stream(self.user2),
+                            ['CoolGroup responded to admin: '
+                             'Sweet Group!... %s ago' % self.timesince])
+        for user in (self.user1, self.user2, self.user3, self.user4):
+            self.assertSameAsFollowStream(user)
+            self.assertSameAsFollowStream(user, with_user_activity=True)
+
+    def test_stream_reads_feed_entries(self):
+        FeedEntry.objects.filter(user=self.user1).delete()
+        self.assertEqual(len(user_stream(self.user1)), 0)
+
+    def test_stream_paginated_by_feed_entries(self):
+        for i in range(3):
+            action.send(self.user2, verb='posted %s' % i, timestamp=self.testdate)
+        page = user_stream(self.user1, _limit=2)
+        cursor = encode_cursor(page[1])
+        with CaptureQueriesContext(connection) as queries:
+            older = list(user_stream(self.user1, _limit=2, _before=cursor))
+        sql = queries[0]['sql']
+        where, order = sql.split(' WHERE ')[1].split(' ORDER BY ')
+        self.assertIn('%s < ' % self.feed_column('timestamp'), where)
+        self.assertIn('%s < ' % self.feed_column('action_id'), where)
+        self.assertTrue(order.startswith('%s DESC, %s DESC' % (
+            self.feed_column('timestamp'), self.feed_column('action_id'))))
+        self.assertSameAsFollowStream(self.user1, _limit=2)
+        self.assertSameAsFollowStream(self.user1, _limit=2, _before=cursor)
+        self.assertSameAsFollowStream(self.user1, _limit=2, _after=encode_cursor(older[0]))
+
+    def feed_column(self, name):
+        return '%s.%s' % (connection.ops.quote_name(FeedEntry._meta.db_table), connection.ops.quote_name(name))
+
+    def test_private_actions_not_fanned_out(self):
+        action.send(self.user2, verb='whispered', public=False)
+        self.assertFalse(FeedEntry.objects.filter(action__verb='whispered').exists())
+
+    def test_actor_only(self):
+        follow(self.user3, self.group, actor_only=False)
+        action.send(self.user2, verb='posted in', target=self.group)
+        self.assertIn('posted in', [a.verb for a in user_stream(self.user3)])
+        self.assertSameAsFollowStream(self.user3)
+
+    def test_fanout_queries(self):
+        # the followers of all the actions are read with a single query, then inserted at once
+        actions = list(Action.objects.all())
+        FeedEntry.objects.all().delete()
+        self.assertNumQueries(2, FeedEntry.objects.fanout, *actions)
+        for user in (self.user1, self.user2, self.user3, self.user4):
+            self.assertSameAsFollowStream(user)
+
+    def test_unfollow(self):
+        unfollow(self.user1, self.user2)
+        self.assertEqual(len(user_stream(self.user1)), 0)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user1).exists())
+
+    def test_rebuild_command(self):
+        expected = {user: list(user_stream(user)) for user in (self.user1, self.user2)}
+        FeedEntry.objects.all().delete()
+        out = StringIO()
+        call_command('actstream_rebuild_feeds', stdout=out)
+        self.assertIn('Rebuilt', out.getvalue())
+        for user, stream in expected.items():
+            self.assertEqual(list(user_stream(user)), stream)
@@ -1,6 +1,15 @@
+from json import loads
+from unittest.mock import patch
+
 from django.conf import settings
+from django.contrib.sites.models import Site
+from django.urls import reverse
 from django.utils.feedgenerator import rfc3339_date
+from django.utils.http import http_date
 
+from actstream.feeds import FormatContext, JSONActivityFeed, ObjectActivityMixin, format_context
+from actstream.models import Action
+from actstream.signals import action
 from actstream.tests import base
 
 
@@ -78,3 +87,112 @@ class FeedsTestCase(base.DataTestCase):
             self.user_ct.pk, self.user2.pk
         )
         self.assertEqual(len(json['items']), 3)
+
+    def stream(self, viewname, *args, query_string=''):
+        with patch.dict('actstream.settings.JSON_FEED_SETTINGS', STREAMING=True, CHUNK_SIZE=2):
+            response = self.client.get('{}?{}'.format(reverse(viewname, args=args), query_string))
+        self.assertTrue(response.streaming)
+        return loads(b''.join(response.streaming_content))
+
+    def test_streaming_json_feed(self):
+        self.client.login(username='admin', password='admin')
+        for viewname, args in (
+            ('actstream_feed_json', ()),
+            ('actstream_model_feed_json', (self.user_ct.pk,)),
+            ('actstream_object_feed_json', (self.user_ct.pk, self.user2.pk)),
+        ):
+            for query_string in ('', 'pretty', 'limit=2', 'limit=100'):
+                self.assertEqual(self.stream(viewname, *args, query_string=query_string),
+                                 self.capture(viewname, *args, query_string=query_string))
+
+    def test_streaming_json_feed_pages(self):
+        page = self.stream('actstream_model_feed_json', self.user_ct.pk, query_string='limit=3')
+        self.assertEqual(page['totalItems'], 3)
+        rest = self.stream('actstream_model_feed_json', self.user_ct.pk, query_string='before=%s' % page['next'])
+        self.assertNotIn('next', rest)
+        self.assertEqual(len(page['items']) + len(rest['items']), 10)
+
+    def test_streaming_json_feed_without_total(self):
+        with patch.dict('actstream.settings.JSON_FEED_SETTINGS', TOTAL_ITEMS=False):
+            self.assertNotIn('totalItems', self.stream('actstream_model_feed_json', self.user_ct.pk))
+
+    def test_streaming_json_feed_errors(self):
+        with patch.dict('actstream.settings.JSON_FEED_SETTINGS', STREAMING=True):
+            response = self.client.get(reverse('actstream_object_feed_json', args=(self.user_ct.pk, 0)))
+            self.assertEqual(response.status_code, 404)
+            response = self.client.get(reverse('actstream_model_feed_json', args=(self.user_ct.pk,)) + '?limit=0')
+            self.assertEqual(response.status_code, 400)
+
+    def test_conditional_get(self):
+        for viewname in ('actstream_model_feed_atom', 'actstream_model_feed_json', 'actstream_model_feed'):
+            url = reverse(viewname, args=(self.user_ct.pk,))
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+            last_modified = http_date(self.testdate.timestamp())
+            self.assertEqual(response['Last-Modified'], last_modified)
+
+            # answered from the newest action, without reading the stream
+            with self.assertNumQueries(2):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 304)
+            # other parameters of the same feed
+            self.assertEqual(self.client.get(url + '?pretty', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        url = reverse('actstream_model_feed_json', args=(self.user_ct.pk,))
+        etag = self.client.get(url)['ETag']
+        action.send(self.user2, verb='joined', target=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_object_resolved_once(self):
+        for viewname in ('actstream_object_feed_json', 'actstream_object_feed_atom'):
+            url = reverse(viewname, args=(self.user_ct.pk, self.user1.pk))
+            Site.objects.clear_cache()
+            with patch.object(ObjectActivityMixin, 'get_object', autospec=True,
+                              side_effect=ObjectActivityMixin.get_object) as get_object:
+                # content type, object, validators, stream, actors, targets and site
+                with self.assertNumQueries(7):
+                    response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(get_object.call_count, 1)
+
+    def test_format_context(self):
+        feed = JSONActivityFeed()
+        actions = list(Action.objects.all())
+        expected = [feed.format(action) for action in actions]
+        with patch('actstream.feeds.reverse', wraps=reverse) as mock_reverse:
+            with format_context() as context:
+                self.assertEqual([feed.format(action) for action in actions], expected)
+                # reused by nested blocks
+                with format_context() as nested:
+                    self.assertIs(nested, context)
+        # once for actstream_detail and once per content type for actstream_actor
+        self.assertEqual(mock_reverse.call_count, 1 + len({
+            ct for action in actions
+            for ct in (action.actor_content_type_id, action.target_content_type_id,
+                       action.action_object_content_type_id) if ct
+        }))
+
+    def test_format_context_reverse(self):
+        context = FormatContext()
+        for object_id in ('1', 'a b', 'caf\xe9', '~:@'):
+            self.assertEqual(context.reverse('actstream_actor', self.user_ct.pk, object_id),
+                             reverse('actstream_actor', args=(self.user_ct.pk, object_id)))
+        self.assertEqual(context.reverse('actstream_detail', 1), reverse('actstream_detail', args=(1,)))
+
+    def test_rollup_json_feed(self):
+        url = reverse('actstream_model_feed_json', args=(self.group_ct.pk,))
+        items = loads(self.client.get(url + '?rollup=day').content)['items']
+        self.assertEqual(sum(item['totalItems'] for item in items), len(loads(self.client.get(url).content)['items']))
+        self.assertTrue(all(item['actors'] and item['items'] for item in items))
+        joined = [item for item in items if item['verb'] == 'joined'][0]
+        self.assertEqual(joined['target']['displayName'], str(self.group))
+        self.assertEqual(self.client.get(url + '?rollup=fortnight').status_code, 400)
+        with patch.dict('actstream.settings.JSON_FEED_SETTINGS', STREAMING=True):
+            self.assertEqual(loads(self.client.get(url + '?rollup=day').content)['items'], items)
@@ -0,0 +1,137 @@
+import os
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from actstream import feedstores
+from actstream.actions import follow, unfollow
+from actstream.feedstores import MemoryFeedStore, RedisFeedStore
+from actstream.models import Action, user_stream
+from actstream.settings import get_feed_store
+from actstream.signals import action
+from actstream.tests.base import DataTestCase, FeedModeTestCase
+
+
+class FeedStoreTestMixin:
+
+    def get_store(self, max_length=1000):
+        raise NotImplementedError
+
+    def test_sorted_set(self):
+        store = self.get_store(max_length=3)
+        store.add(1, [(10, 100.0), (11, 300.0), (12, 200.0)])
+        store.add(1, [(11, 300.0)])
+        self.assertEqual(store.get(1), [11, 12, 10])
+        self.assertEqual(store.get(1, offset=1, limit=1), [12])
+        store.add(1, [(13, 50.0), (14, 400.0)])
+        # trimmed to the newest ids
+        self.assertEqual(store.get(1), [14, 11, 12])
+        store.remove(1, [11])
+        self.assertEqual(store.get(1), [14, 12])
+        store.clear(1)
+        self.assertEqual(store.get(1), [])
+        self.assertEqual(store.get(2), [])
+
+
+class MemoryFeedStoreTestCase(FeedStoreTestMixin, DataTestCase):
+
+    def get_store(self, max_length=1000):
+        return MemoryFeedStore(name=self.id(), max_length=max_length)
+
+    def tearDown(self):
+        feedstores._memory_feeds.pop(self.id(), None)
+        super().tearDown()
+
+    def test_shared_by_name(self):
+        self.get_store().add(1, [(10, 100.0)])
+        self.assertEqual(self.get_store().get(1), [10])
+        self.assertEqual(MemoryFeedStore(name='other').get(1), [])
+
+
+@skipUnless(feedstores.redis is not None and os.environ.get('REDIS_URL'), 'Redis server not configured')
+class RedisFeedStoreTestCase(FeedStoreTestMixin, DataTestCase):
+
+    def get_store(self, max_length=1000):
+        return RedisFeedStore(url=os.environ['REDIS_URL'], prefix='%s:' % self.id(), max_length=max_length)
+
+    def tearDown(self):
+        self.get_store().clear(1)
+        super().tearDown()
+
+
+class StoreFeedModeTestCase(FeedModeTestCase):
+    feed_mode = 'store'
+
+    def setUp(self):
+        self.start_patch(patch.dict('actstream.settings.FEED_STORE_SETTINGS', OPTIONS={'name': self.id()}))
+        super().setUp()
+
+    def tearDown(self):
+        feedstores._memory_feeds.pop(self.id(), None)
+        super().tearDown()
+
+    def test_stream(self):
+        self.assertTrue(get_feed_store().get(self.user1.pk))
+        for user in (self.user1, self.user2, self.user3, self.user4):
+            self.assertSameAsFollowStream(user)
+            self.assertSameAsFollowStream(user, with_user_activity=True)
+            self.assertSameAsFollowStream(user, _limit=1)
+
+    def test_stream_reads_store(self):
+        # the page is hydrated from the ids in one query
+        self.assertNumQueries(1, lambda: list(user_stream(self.user1).values_list('pk')))
+        get_feed_store().clear(self.user1.pk)
+        self.assertEqual(len(user_stream(self.user1)), 0)
+
+    def test_action_fanout(self):
+        follow(self.user3, self.group, actor_only=False)
+        action.send(self.user2, verb='posted in', target=self.group)
+        action.send(self.user2, verb='whispered', target=self.group, public=False)
+        self.assertEqual(user_stream(self.user3)[0].verb, 'posted in')
+        self.assertSameAsFollowStream(self.user3)
+
+    def test_fanout_queries(self):
+        # the followers of all the actions are read with a single query
+        store = get_feed_store()
+        for user in (self.user1, self.user2, self.user3, self.user4):
+            store.clear(user.pk)
+        self.assertNumQueries(1, store.fanout, *Action.objects.all())
+        for user in (self.user1, self.user2, self.user3, self.user4):
+            self.assertSameAsFollowStream(user)
+
+    def test_unfollow(self):
+        unfollow(self.user1, self.user2)
+        self.assertEqual(get_feed_store().get(self.user1.pk), [])
+        self.assertEqual(len(user_stream(self.user1)), 0)
+
+    def test_follow_changes_involved_actions_only(self):
+        store = get_feed_store()
+        # an action the follow stream does not know about, kept by incremental updates
+        store.add(self.user4.pk, [(0, 0.0)])
+        with patch.object(type(store), 'rebuild') as rebuild:
+            follow(self.user4, self.group, actor_only=False)
+            self.assertIn(0, store.get(self.user4.pk))
+            self.assertCountEqual([pk for pk in store.get(self.user4.pk) if pk],
+                                  [a.pk for a in user_stream(self.user4)])
+            unfollow(self.user4, self.group)
+        rebuild.assert_not_called()
+        self.assertIn(0, store.get(self.user4.pk))
+        self.assertSameAsFollowStream(self.user4)
+
+    def test_max_length(self):
+        with patch.dict('actstream.settings.FEED_STORE_SETTINGS', MAX_LENGTH=1):
+            for i in range(3):
+                action.send(self.user2, verb='posted %d' % i)
+            self.assertEqual([a.verb for a in user_stream(self.user1)], ['posted 2'])
+
+    def test_rebuild_command(self):
+        expected = {user: list(user_stream(user)) for user in (self.user1, self.user2)}
+        for user in expected:
+            get_feed_store().clear(user.pk)
+        out = StringIO()
+        call_command('actstream_rebuild_feeds', stdout=out)
+        self.assertIn('Rebuilt', out.getvalue())
+        for user, stream in expected.items():
+            self.assertCountEqual(user_stream(user), stream)
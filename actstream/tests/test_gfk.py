@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
@@ -95,3 +97,24 @@ class GFKManagerTestCase(TestCase):
             (a.id, a.actor, a.target) for a in generic()]
         self.assertEqual(action_actor_targets,
                          action_actor_targets_fetch_generic_target)
+
+    def test_deduplicated_fetch(self):
+        # users are actors and targets, fetched together with the groups in two queries
+        actions = Action.objects.all().fetch_generic_relations()
+        with self.assertNumQueries(3):
+            actions = list(actions)
+            self.assertIs(actions[0].actor, actions[1].actor)
+            self.assertEqual({a.target for a in actions}, {self.user2, self.user3, self.user4, self.group})
+
+    def test_hints(self):
+        User = get_user_model()
+        actions = Action.objects.filter(verb='followed').order_by('pk').fetch_generic_relations(
+            hints={User: {'only': ['username']}})
+        with self.assertNumQueries(2):
+            target = list(actions)[0].target
+            self.assertEqual(target.username, 'Two')
+        self.assertIn('password', target.get_deferred_fields())
+
+        with patch.dict('actstream.settings.GFK_PREFETCH_HINTS', {'auth.group': {'only': ['pk']}}):
+            joined = Action.objects.filter(verb='joined').fetch_generic_relations()
+            self.assertEqual(list(joined)[0].target.get_deferred_fields(), {'name'})
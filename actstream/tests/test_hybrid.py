@@ -0,0 +1,84 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from actstream.actions import follow, unfollow
+from actstream.cache import get_cache
+from actstream.hybrid import LOCK_KEY, PULLED_KEY, get_pulled_actors, refresh_pulled_actors
+from actstream.models import FeedEntry, user_stream
+from actstream.signals import action
+from actstream.tests.base import FeedModeTestCase
+
+
+class HybridFeedModeTestCase(FeedModeTestCase):
+    feed_mode = 'hybrid'
+
+    def setUp(self):
+        self.start_patch(patch.dict('actstream.settings.HYBRID_SETTINGS', THRESHOLD=2))
+        get_cache().delete(PULLED_KEY)
+        super().setUp()
+        # user2 is followed by user1 and user3
+        follow(self.user3, self.user2, send_action=False)
+        refresh_pulled_actors(force=True)
+
+    def tearDown(self):
+        get_cache().delete(PULLED_KEY)
+        super().tearDown()
+
+    def test_pulled_actors(self):
+        self.assertEqual(list(get_pulled_actors()), [(self.user_ct.pk, str(self.user2.pk))])
+
+    def test_pulled_actions_not_fanned_out(self):
+        posted = action.send(self.user2, verb='posted')[0][1]
+        joined = action.send(self.user1, verb='posted', target=self.group)[0][1]
+        self.assertFalse(FeedEntry.objects.filter(action=posted).exists())
+        self.assertTrue(FeedEntry.objects.filter(action=joined).exists())
+        for user in (self.user1, self.user2, self.user3, self.user4):
+            self.assertSameAsFollowStream(user)
+            self.assertSameAsFollowStream(user, with_user_activity=True)
+        self.assertIn(posted, user_stream(self.user1))
+        self.assertIn(posted, user_stream(self.user3))
+
+    def test_refresh(self):
+        posted = action.send(self.user2, verb='posted')[0][1]
+        unfollow(self.user3, self.user2)
+        # the previous set is kept until it is refreshed
+        self.assertTrue(get_pulled_actors())
+        self.assertIsNone(refresh_pulled_actors())
+        self.assertEqual(refresh_pulled_actors(force=True), (frozenset(), {(self.user_ct.pk, str(self.user2.pk))}))
+        self.assertFalse(get_pulled_actors())
+        # the actions of the actor no longer pulled are pushed to its followers
+        self.assertTrue(FeedEntry.objects.filter(user=self.user1, action=posted).exists())
+        self.assertSameAsFollowStream(self.user1)
+
+    def test_expired(self):
+        unfollow(self.user3, self.user2)
+        with patch.dict('actstream.settings.HYBRID_SETTINGS', REFRESH=-1):
+            self.assertTrue(get_pulled_actors())
+            out = StringIO()
+            call_command('actstream_refresh_pulled', stdout=out)
+            self.assertIn('0 pulled actors, 1 actors pushed', out.getvalue())
+            self.assertFalse(get_pulled_actors())
+
+    def test_locked(self):
+        unfollow(self.user3, self.user2)
+        get_cache().add(LOCK_KEY, True)
+        try:
+            self.assertIsNone(refresh_pulled_actors(force=True))
+        finally:
+            get_cache().delete(LOCK_KEY)
+        self.assertTrue(get_pulled_actors())
+
+    def test_requests_never_refresh(self):
+        unfollow(self.user3, self.user2)
+        with patch.dict('actstream.settings.HYBRID_SETTINGS', REFRESH=-1), \
+                patch('actstream.hybrid.push_actor') as push_actor, \
+                patch('actstream.hybrid.count_followers') as count_followers:
+            action.send(self.user2, verb='posted')
+            list(user_stream(self.user1))
+            self.client.login(username='admin', password='admin')
+            self.assertTrue(self.capture('actstream_feed_json')['items'])
+        push_actor.assert_not_called()
+        count_followers.assert_not_called()
+        self.assertTrue(get_pulled_actors())
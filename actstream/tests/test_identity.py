@@ -0,0 +1,59 @@
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from actstream.gfk import get_identity_map, identity_map
+from actstream.middleware import IdentityMapMiddleware
+from actstream.models import Action, Follow, actor_stream, any_stream, target_stream
+from actstream.tests.base import DataTestCase
+
+
+class IdentityMapTestCase(DataTestCase):
+
+    def test_shared_instances(self):
+        with identity_map():
+            # user1 is the actor of its own stream and the target of the "liked" action of user4
+            actions = list(actor_stream(self.user1))
+            # the actions and their actor user4, user1 is already loaded
+            with self.assertNumQueries(2):
+                liked = list(target_stream(self.user1))
+                self.assertIs(liked[0].target, actions[0].actor)
+
+    def test_no_queries_after_fetch(self):
+        with identity_map():
+            actions = list(any_stream(self.user1))
+            with self.assertNumQueries(0):
+                for action in actions:
+                    str(action)
+                    action.actor_url()
+                    if action.target:
+                        action.target_url()
+
+    def test_one_query_per_content_type(self):
+        with identity_map():
+            # users and groups as actors and targets, a site as target
+            with self.assertNumQueries(4):
+                list(Action.objects.all().fetch_generic_relations())
+
+    def test_deleted_object(self):
+        Action.objects.filter(verb='responded to').update(target_object_id='999')
+        with identity_map():
+            responded = Action.objects.filter(verb='responded to').fetch_generic_relations()
+            self.assertIsNone(list(responded)[0].target)
+
+    def test_iterator(self):
+        with identity_map():
+            with self.assertNumQueries(3):
+                follows = list(Follow.objects.following_qs(self.user4).iterator(chunk_size=2))
+            self.assertEqual(follows[0].follow_object, self.another_group)
+            self.assertIs(follows[0].follow_object, follows[1].follow_object)
+
+    def test_middleware(self):
+        maps = []
+
+        def view(request):
+            maps.append(get_identity_map())
+            return HttpResponse()
+
+        IdentityMapMiddleware(view)(RequestFactory().get('/'))
+        self.assertIsNotNone(maps[0])
+        self.assertIsNone(get_identity_map())
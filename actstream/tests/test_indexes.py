@@ -0,0 +1,38 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+
+from actstream.management.commands.actstream_explain import is_sequential_scan
+from actstream.models import Action
+from actstream.tests.base import DataTestCase
+
+
+class StreamIndexTestCase(DataTestCase):
+
+    def test_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Action._meta.db_table)
+        for name in ('actstream_actor_stream_idx', 'actstream_target_stream_idx', 'actstream_object_stream_idx'):
+            self.assertIn(name, constraints)
+        if connection.features.supports_partial_indexes:
+            self.assertIn('actstream_public_ts_idx', constraints)
+
+    def test_is_sequential_scan(self):
+        self.assertTrue(is_sequential_scan('Limit\n  ->  Seq Scan on actstream_action', 'postgresql'))
+        self.assertFalse(is_sequential_scan(
+            'Index Scan using actstream_actor_stream_idx on actstream_action', 'postgresql'))
+        self.assertTrue(is_sequential_scan('2 0 0 SCAN actstream_action', 'sqlite'))
+        self.assertFalse(is_sequential_scan(
+            '2 0 0 SEARCH actstream_action USING INDEX actstream_actor_stream_idx', 'sqlite'))
+        self.assertFalse(is_sequential_scan(
+            '2 0 0 SCAN actstream_action USING INDEX actstream_public_ts_idx', 'sqlite'))
+
+    def test_explain_command(self):
+        out = StringIO()
+        call_command('actstream_explain', verbosity=2, stdout=out)
+        output = out.getvalue()
+        for name in ('actor_stream', 'target_stream', 'any_stream', 'model_stream', 'user_stream'):
+            self.assertIn(name, output)
+        if connection.vendor == 'sqlite':
+            self.assertIn('actor_stream: ok', output)
@@ -0,0 +1,57 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from actstream.ids import to_int
+from actstream.models import Action, Follow, any_stream, followers, target_stream, user_stream
+from actstream.tests.base import DataTestCase
+
+
+class IntObjectIdsTestCase(DataTestCase):
+
+    def setUp(self):
+        self.start_patch(patch('actstream.settings.USE_INT_OBJECT_IDS', True))
+        super().setUp()
+
+    def char_ids(self, func, *args, **kwargs):
+        with patch('actstream.settings.USE_INT_OBJECT_IDS', False):
+            return list(func(*args, **kwargs))
+
+    def test_to_int(self):
+        self.assertEqual(to_int(5), 5)
+        self.assertEqual(to_int('42'), 42)
+        self.assertEqual(to_int('-42'), -42)
+        self.assertIsNone(to_int('4a'))
+        self.assertIsNone(to_int('1' * 20))
+        self.assertIsNone(to_int(None))
+
+    def test_written(self):
+        self.assertEqual(self.join_action.actor_object_id_int, self.user1.pk)
+        self.assertEqual(self.join_action.target_object_id_int, self.group.pk)
+        self.assertIsNone(self.join_action.action_object_object_id_int)
+        self.assertEqual(Follow.objects.get(user=self.user2, object_id=self.group.pk).object_id_int, self.group.pk)
+
+    def test_streams(self):
+        for stream, obj in ((user_stream, self.user1), (user_stream, self.user2),
+                            (any_stream, self.group), (target_stream, self.group)):
+            with CaptureQueriesContext(connection) as context:
+                actions = list(stream(obj))
+            self.assertTrue(actions)
+            self.assertEqual(actions, self.char_ids(stream, obj))
+            self.assertTrue(any('_object_id_int' in query['sql'] for query in context.captured_queries))
+
+        self.assertEqual(list(followers(self.group)), [self.user2])
+
+    def test_backfill(self):
+        Action.objects.update(actor_object_id_int=None, target_object_id_int=None)
+        Follow.objects.update(object_id_int=None)
+        out = StringIO()
+        call_command('actstream_backfill_int_ids', batch_size=2, stdout=out)
+        self.assertIn('Updated %d actstream.Action rows' % Action.objects.count(), out.getvalue())
+        self.join_action.refresh_from_db()
+        self.assertEqual(self.join_action.actor_object_id_int, self.user1.pk)
+        self.assertEqual(self.join_action.target_object_id_int, self.group.pk)
+        self.assertFalse(Follow.objects.filter(object_id_int__isnull=True).exists())
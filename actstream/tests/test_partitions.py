@@ -0,0 +1,53 @@
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from actstream.models import Action, actor_stream, any_stream
+from actstream.partitions import next_period, period_start, plan
+from actstream.signals import action
+from actstream.tests.base import DataTestCase
+
+
+class PartitionsTestCase(DataTestCase):
+
+    def test_periods(self):
+        day = date(2024, 12, 18)
+        self.assertEqual(period_start(day, 'day'), day)
+        self.assertEqual(period_start(day, 'week'), date(2024, 12, 16))
+        self.assertEqual(period_start(day, 'month'), date(2024, 12, 1))
+        self.assertEqual(period_start(day, 'year'), date(2024, 1, 1))
+        self.assertEqual(next_period(date(2024, 12, 1), 'month'), date(2025, 1, 1))
+        self.assertEqual(next_period(date(2024, 12, 1), 'month', -11), date(2024, 1, 1))
+        self.assertEqual(next_period(date(2024, 12, 16), 'week', 2), date(2024, 12, 30))
+        self.assertRaises(ValueError, period_start, day, 'hour')
+
+    def test_plan(self):
+        table = 'actstream_action'
+        existing = ['actstream_action_p20241101', 'actstream_action_p20241201', 'actstream_action_legacy']
+        statements = plan(connection, table, existing, date(2024, 12, 18), 'month', 2, keep=2)
+        # the partition of november is kept with the current one
+        self.assertEqual(len(statements), 2)
+        self.assertIn('"actstream_action_p20250101" PARTITION OF "actstream_action" '
+                      "FOR VALUES FROM ('2025-01-01') TO ('2025-02-01')", statements[0])
+        self.assertIn('"actstream_action_p20250201"', statements[1])
+        self.assertEqual(plan(connection, table, existing, date(2024, 12, 18), 'month', 0, keep=1)[-1],
+                         'ALTER TABLE "actstream_action" DETACH PARTITION "actstream_action_p20241101"')
+        self.assertEqual(plan(connection, table, existing, date(2024, 12, 18), 'month', 0), [])
+
+    def test_command(self):
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'), patch.object(connection, 'vendor', 'sqlite'):
+            call_command('actstream_partitions')
+        self.assertRaises(CommandError, call_command, 'actstream_partitions', keep=0)
+
+    def test_stream_period(self):
+        recent = action.send(self.user1, verb='posted', timestamp=datetime.now())[0][1]
+        self.assertEqual(list(actor_stream(self.user1, _since=timedelta(days=1))), [recent])
+        self.assertNotIn(recent, actor_stream(self.user1, _until=timedelta(days=1)))
+        self.assertCountEqual(
+            actor_stream(self.user1, _since=self.testdate, _until=self.testdate + timedelta(days=1)),
+            Action.objects.filter(pk__in=actor_stream(self.user1)).exclude(pk=recent.pk)
+        )
+        self.assertEqual(list(any_stream(self.user1, strategy='union', _since=timedelta(days=1), _limit=5)),
+                         [recent])
@@ -0,0 +1,103 @@
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from actstream.management.commands.actstream_worker import Command as WorkerCommand
+from actstream.models import Action, QueuedAction
+from actstream.settings import get_action_queue
+from actstream.signals import action
+from actstream.tests.base import DataTestCase
+
+
+class QueueTestMixin:
+    backend = None
+    options = {}
+
+    def setUp(self):
+        super().setUp()
+        self.start_patch(patch.dict('actstream.settings.QUEUE_SETTINGS', BACKEND=self.backend, OPTIONS=self.options))
+        self.count = Action.objects.count()
+
+    def send(self):
+        return action.send(self.user1, verb='queued', action_object=self.comment, target=self.group,
+                           timestamp=self.testdate, level=3)[0][1]
+
+    def assertWritten(self):
+        self.assertEqual(Action.objects.count(), self.count + 2)
+        written = Action.objects.filter(verb='queued').first()
+        self.assertEqual(written.actor, self.user1)
+        self.assertEqual(written.action_object, self.comment)
+        self.assertEqual(written.target, self.group)
+        self.assertEqual(written.timestamp, self.testdate)
+        self.assertEqual(str(written), 'admin queued admin: Sweet Group!... on CoolGroup %s ago' % self.timesince)
+
+
+class DatabaseQueueTestCase(QueueTestMixin, DataTestCase):
+    backend = 'actstream.queues.DatabaseQueue'
+
+    def test_database_queue(self):
+        unsaved = self.send()
+        self.send()
+        self.assertIsNone(unsaved.pk)
+        self.assertEqual(Action.objects.count(), self.count)
+        self.assertEqual(QueuedAction.objects.count(), 2)
+
+        out = StringIO()
+        call_command('actstream_worker', once=True, stdout=out)
+        self.assertIn('Wrote 2 actions', out.getvalue())
+        self.assertFalse(QueuedAction.objects.exists())
+        self.assertWritten()
+
+
+class FileQueueTestCase(QueueTestMixin, DataTestCase):
+    backend = 'actstream.queues.FileQueue'
+
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.options = {'path': os.path.join(self.tempdir.name, 'actions.jsonl')}
+        super().setUp()
+
+    def test_file_queue(self):
+        self.send()
+        self.send()
+        self.assertEqual(Action.objects.count(), self.count)
+
+        queue, worker = get_action_queue(), WorkerCommand()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(worker.process(queue, 1), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(worker.process(queue, 10), 1)
+        self.assertEqual(worker.process(queue, 10), 0)
+        self.assertWritten()
+
+    def test_incomplete_line(self):
+        self.send()
+        queue = get_action_queue()
+        self.assertEqual(len(queue.get(10)), 1)
+        # a line still being written to the work file
+        with open(queue.work_path, 'a') as fileobj:
+            fileobj.write('{"verb": ')
+        self.send()
+        self.assertEqual([key for key, spec in queue.get(10)], [0])
+        queue._remove(1)
+        with open(queue.work_path) as fileobj:
+            self.assertEqual(fileobj.read(), '{"verb": ')
+        # dropped when the pending specs are taken
+        self.assertEqual(len(queue.get(10)), 1)
+        self.assertFalse(os.path.exists(queue.path))
+
+    def test_put_after_rename(self):
+        queue = get_action_queue()
+        self.send()
+        with open(queue.path, 'a') as fileobj:
+            # the worker takes the file away from a writer waiting for the lock
+            queue.get(10)
+            self.assertFalse(queue._is_current(fileobj))
+        self.send()
+        self.assertEqual(len(queue.get(10)), 1)
+        with open(queue.path) as fileobj:
+            self.assertEqual(len(fileobj.readlines()), 1)
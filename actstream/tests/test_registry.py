@@ -0,0 +1,43 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group
+from django.core.exceptions import ImproperlyConfigured
+
+from actstream.registry import check, registry, validate
+from actstream.tests.base import DataTestCase
+
+from testapp.models import Unregistered
+
+
+class RegistryTestCase(DataTestCase):
+
+    def test_check(self):
+        # registered classes and their instances are found without validating them
+        with patch('actstream.registry.validate', side_effect=AssertionError):
+            for obj in (self.User, self.user1, self.User(), Group, self.group):
+                check(obj)
+
+    def test_check_unregistered(self):
+        for obj in (Unregistered, Unregistered()):
+            self.assertRaises(ImproperlyConfigured, check, obj)
+        self.assertRaises(RuntimeError, check, 'auth.Group')
+        self.assertRaises(RuntimeError, check, object())
+
+    def test_unregister(self):
+        registry.unregister(Group)
+        try:
+            self.assertNotIn(Group, registry.registered)
+            self.assertRaises(ImproperlyConfigured, check, self.group)
+        finally:
+            registry.register(Group)
+        self.assertIn(Group, registry.registered)
+
+    def test_check_fallback(self):
+        # classes missing from the lookup set are validated, registered ones never are
+        with patch('actstream.registry.validate', wraps=validate) as mock_validate:
+            check(self.user1)
+            check(self.User)
+            mock_validate.assert_not_called()
+            with patch.object(registry, 'registered', frozenset()):
+                check(self.user1)
+            mock_validate.assert_called_once_with(self.User, RuntimeError)
@@ -0,0 +1,71 @@
+import gzip
+import os
+from datetime import datetime, timedelta
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from actstream import retention
+from actstream.models import Action
+from actstream.signals import action
+from actstream.tests.base import DataTestCase
+
+
+class RetentionTestCase(DataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recent = action.send(self.user1, verb='joined', target=self.group, timestamp=datetime.now())[0][1]
+        self.old = list(Action.objects.exclude(pk=self.recent.pk))
+
+    def retention(self, **settings):
+        return patch.dict('actstream.settings.RETENTION_SETTINGS', **settings)
+
+    def test_no_policy(self):
+        self.assertFalse(retention.expired_actions().exists())
+        self.assertEqual(retention.prune(), 0)
+
+    def test_default(self):
+        with self.retention(DEFAULT=30):
+            self.assertCountEqual(retention.expired_actions(), self.old)
+        with self.retention(DEFAULT=timedelta(days=365 * 100)):
+            self.assertFalse(retention.expired_actions().exists())
+
+    def test_verbs_and_models(self):
+        group_actions = [a for a in self.old if a.actor_content_type_id == self.group_ct.pk]
+        self.assertTrue(group_actions)
+        with self.retention(VERBS={'joined': None}, MODELS={'auth.group': 30}, DEFAULT=None):
+            self.assertCountEqual(retention.expired_actions(), [a for a in group_actions if a.verb != 'joined'])
+        with self.retention(VERBS={'joined': 30}, MODELS={'auth.group': None}, DEFAULT=30):
+            self.assertCountEqual(
+                retention.expired_actions(),
+                [a for a in self.old if a.verb == 'joined' or a.actor_content_type_id != self.group_ct.pk]
+            )
+
+    def test_prune_batches(self):
+        progress = []
+        with self.retention(DEFAULT=30):
+            self.assertEqual(retention.prune(batch_size=2, callback=lambda total, elapsed: progress.append(total)),
+                             len(self.old))
+        self.assertEqual(progress, list(range(2, len(self.old), 2)) + [len(self.old)])
+        self.assertEqual(list(Action.objects.all()), [self.recent])
+
+    def test_command_archive(self):
+        out = StringIO()
+        with self.retention(DEFAULT=30), TemporaryDirectory() as directory:
+            call_command('actstream_prune', dry_run=True, stdout=out)
+            self.assertIn('%d actions would be pruned' % len(self.old), out.getvalue())
+            self.assertEqual(Action.objects.count(), len(self.old) + 1)
+
+            call_command('actstream_prune', archive=directory, verbosity=2, stdout=out)
+            self.assertIn('Pruned %d actions' % len(self.old), out.getvalue())
+            self.assertEqual(Action.objects.count(), 1)
+            path = os.path.join(directory, os.listdir(directory)[0])
+            with gzip.open(path, 'rt') as archive:
+                self.assertEqual(len(archive.readlines()), len(self.old))
+
+            # the archive can be loaded back
+            call_command('loaddata', path, verbosity=0)
+            self.assertCountEqual(Action.objects.exclude(pk=self.recent.pk), self.old)
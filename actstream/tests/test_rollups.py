@@ -0,0 +1,68 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from actstream.models import Action, target_stream, user_stream
+from actstream.rollups import rollup
+from actstream.signals import action
+from actstream.tests.base import DataTestCase
+
+
+class RollupTestCase(DataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.liked = self.testdate + timedelta(days=1)
+        for minutes, user in enumerate((self.user1, self.user2, self.user3, self.user4, self.user2)):
+            action.send(user, verb='liked', target=self.another_group,
+                        timestamp=self.liked + timedelta(minutes=minutes))
+        action.send(self.user1, verb='liked', target=self.another_group, timestamp=self.liked + timedelta(hours=2))
+
+    def test_rollup(self):
+        stream = target_stream(self.another_group)
+        rollups = stream.rollup('hour')
+        latest, liked = rollups[:2]
+        self.assertEqual(latest.count, 1)
+        self.assertEqual(latest.actors, [self.user1])
+        self.assertEqual((liked.verb, liked.target, liked.count, liked.actor_count), ('liked', self.another_group, 5, 4))
+        self.assertEqual(liked.bucket, self.liked)
+        self.assertEqual(liked.timestamp, self.liked + timedelta(minutes=4))
+        # the latest three actions
+        self.assertEqual(len(liked.actions), 3)
+        self.assertEqual(liked.actors, [self.user2, self.user4, self.user3])
+        self.assertEqual(liked.others, 1)
+        self.assertEqual(str(liked), 'Two, Four, Three and 1 other liked NiceGroup')
+        self.assertEqual(rollup(stream, 'hour', sample=5)[1].actors, [self.user2, self.user4, self.user3, self.user1])
+        self.assertEqual(str(latest), 'admin liked NiceGroup')
+        # the other actions of the group, in separate groups
+        self.assertEqual(sum(r.count for r in rollups), stream.count())
+
+        with self.assertNumQueries(5):
+            self.assertEqual(len(rollup(stream, 'day', sample=1, limit=1)[0].actions), 1)
+        self.assertEqual(rollup(stream, 'day', sample=1, limit=1)[0].count, 6)
+        self.assertEqual(Action.objects.none().rollup(), [])
+        self.assertRaises(ValueError, rollup, stream, 'fortnight')
+
+    def test_sliced_stream(self):
+        rollups = target_stream(self.another_group, _limit=3).rollup('day')
+        self.assertEqual([(r.verb, r.count) for r in rollups], [('liked', 3)])
+        self.assertTrue(user_stream(self.user4, _limit=2).rollup())
+
+    def test_many_groups(self):
+        start = self.liked + timedelta(days=1)
+        Action.objects.bulk_create([
+            Action(actor=self.user1, verb='ticked', target=self.another_group, timestamp=start + timedelta(minutes=minutes))
+            for minutes in range(1100)
+        ])
+        stream = target_stream(self.another_group)
+        with self.assertNumQueries(5):
+            rollups = rollup(stream, 'minute', sample=1)
+        self.assertGreater(len(rollups), 1100)
+        self.assertEqual(sum(r.count for r in rollups), stream.count())
+        self.assertTrue(all(len(r.actions) == 1 and r.actions[0].timestamp == r.timestamp for r in rollups))
+        self.assertEqual([r.count for r in rollup(stream, 'minute', limit=2)], [1, 1])
+
+        # the views return at most ROLLUP_LIMIT groups
+        args = ('actstream_object_feed_json', self.group_ct.pk, self.another_group.pk)
+        with patch('actstream.settings.ROLLUP_LIMIT', 10):
+            self.assertEqual(len(self.capture(*args, query_string='rollup=minute')['items']), 10)
+        self.assertEqual(len(self.capture(*args, query_string='rollup=minute&limit=5')['items']), 5)
@@ -0,0 +1,66 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+
+from actstream.actions import follow
+from actstream.managers import USER_STREAM_STRATEGIES
+from actstream.models import Action, user_stream
+from actstream.tests.base import DataTestCase
+
+
+class UserStreamStrategyTestCase(DataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # actions on a followed target, and on a followed action_object
+        follow(self.user3, self.group, actor_only=False)
+        follow(self.user3, self.user4, send_action=False)
+        Action.objects.create(actor=self.user1, verb='posted in', target=self.group)
+        Action.objects.create(actor=self.user1, verb='liked', action_object=self.group)
+
+    def streams(self, strategy, **kwargs):
+        return [
+            set(user_stream(user, strategy=strategy, **kwargs).values_list('pk', flat=True))
+            for user in (self.user1, self.user2, self.user3, self.user4)
+        ]
+
+    def assertSameStreams(self, **kwargs):
+        expected = self.streams('subquery', **kwargs)
+        self.assertTrue(any(expected))
+        for strategy in USER_STREAM_STRATEGIES:
+            self.assertEqual(self.streams(strategy, **kwargs), expected, strategy)
+
+    def test_same_streams(self):
+        self.assertSameStreams()
+        self.assertSameStreams(with_user_activity=True)
+        self.assertSameStreams(follow_flag='liking')
+        self.assertSameStreams(verb='joined')
+        self.assertSameStreams(with_user_activity=True, follow_flag='liking')
+
+    def test_default_strategy(self):
+        # the query of previous versions
+        self.assertEqual(str(user_stream(self.user3).query), str(user_stream(self.user3, strategy='subquery').query))
+
+    def test_int_object_ids(self):
+        with patch('actstream.settings.USE_INT_OBJECT_IDS', True):
+            self.assertSameStreams()
+            self.assertSameStreams(with_user_activity=True)
+
+    def test_queries(self):
+        # the followed content types are not listed beforehand
+        self.assertNumQueries(1, lambda: list(user_stream(self.user3, strategy='exists').values_list('pk')))
+        self.assertNumQueries(2, lambda: list(user_stream(self.user3, strategy='followset').values_list('pk')))
+        with patch('actstream.settings.USER_STREAM_STRATEGY', 'followset'):
+            self.assertNumQueries(2, lambda: list(user_stream(self.user3).values_list('pk')))
+        self.assertNumQueries(1, lambda: list(user_stream(self.user1, strategy='followset', follow_flag='nope')))
+
+    def test_unknown_strategy(self):
+        self.assertRaises(ValueError, user_stream, self.user1, strategy='nope')
+
+    def test_explain(self):
+        out = StringIO()
+        call_command('actstream_explain', strategies=['exists', 'followset'], stdout=out)
+        self.assertIn('user_stream[exists]', out.getvalue())
+        self.assertIn('user_stream[followset]', out.getvalue())
+        self.assertNotIn('user_stream[subquery]', out.getvalue())
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group
+from django.db.models import Q
+
+from actstream.cursors import encode_cursor
+from actstream.contenttypes import get_content_type
+from actstream.gfk import GFKQuerySet
+from actstream.managers import ActionManager
+from actstream.models import Action, any_stream, model_stream
+from actstream.streams import stream
+from actstream.tests.base import DataTestCase
+
+
+class TaggedActionManager(ActionManager):
+
+    @stream
+    def tagged(self, obj, strategy=None):
+        ctype = get_content_type(obj)
+        return self._roles([
+            Q(actor_content_type=ctype, actor_object_id=obj.pk),
+            Q(target_content_type=ctype, target_object_id=obj.pk),
+        ], strategy).filter(verb='tagged').exclude(target_object_id=obj.pk).order_by('-timestamp', '-pk')
+
+
+class UnionStrategyTestCase(DataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # ties on the timestamp and an action matching the object in two roles
+        for i in range(4):
+            Action.objects.create(actor=self.user1, verb='tagged', target=self.user2,
+                                  timestamp=self.testdate + timedelta(days=i % 2))
+        Action.objects.create(actor=self.user1, verb='followed', target=self.user1, timestamp=self.testdate)
+        Action.objects.create(actor=self.user3, verb='added', action_object=self.user1, target=self.group,
+                              timestamp=self.testdate + timedelta(days=1))
+
+    def pks(self, stream, obj, **kwargs):
+        return list(stream(obj, **kwargs).values_list('pk', flat=True))
+
+    def assertSameStreams(self, stream, obj, **kwargs):
+        expected = self.pks(stream, obj, strategy='or', **kwargs)
+        self.assertTrue(expected)
+        self.assertEqual(self.pks(stream, obj, strategy='union', **kwargs), expected)
+
+    def test_pages(self):
+        for limit in (1, 3, 5, 100):
+            self.assertSameStreams(any_stream, self.user1, _limit=limit)
+            self.assertSameStreams(model_stream, Group, _limit=limit)
+        self.assertSameStreams(any_stream, self.user1)
+
+    def test_cursors(self):
+        stream = list(any_stream(self.user1, strategy='or', _limit=100))
+        cursor = encode_cursor(stream[2])
+        self.assertSameStreams(any_stream, self.user1, _limit=3, _before=cursor)
+        self.assertSameStreams(any_stream, self.user1, _limit=3, _after=cursor)
+        self.assertSameStreams(any_stream, self.user1, _limit=3, _before=encode_cursor(stream[0]), _after=encode_cursor(stream[-1]))
+
+    def test_filtered_stream(self):
+        manager = TaggedActionManager()
+        manager.model = Action
+        Action.objects.create(actor=self.user2, verb='tagged', target=self.user1, timestamp=self.testdate)
+        queryset = manager._roles([Q(verb='tagged')], 'union').filter(actor_object_id=self.user1.pk)
+        self.assertEqual(len(queryset.order_by('pk')._union_branches), 1)
+        self.assertIsNone(queryset.none()._union_branches)
+        for limit in (1, 3, 100):
+            # the page is read from the filtered branches
+            self.assertIn('"id" IN', str(manager.tagged(self.user1, strategy='union', _limit=limit).query))
+            expected = self.pks(manager.tagged, self.user1, strategy='or', _limit=limit)
+            self.assertEqual(self.pks(manager.tagged, self.user1, strategy='union', _limit=limit), expected)
+        self.assertEqual(len(expected), 4)
+        self.assertCountEqual(set(Action.objects.filter(pk__in=expected).values_list('verb', 'target_object_id')),
+                              [('tagged', str(self.user2.pk))])
+
+    def test_no_duplicates(self):
+        pks = self.pks(any_stream, self.user1, strategy='union', _limit=100)
+        self.assertEqual(len(pks), len(set(pks)))
+        self.assertEqual(len(pks), Action.objects.filter(pk__in=pks).count())
+
+    def test_queryset(self):
+        stream = any_stream(self.user1, strategy='union', _limit=5)
+        self.assertIsInstance(stream, GFKQuerySet)
+        self.assertEqual(stream.count(), 5)
+        self.assertEqual(stream[1:2].get().pk, self.pks(any_stream, self.user1, _limit=5)[1])
+        actions = list(stream.filter(verb='tagged'))
+        self.assertNumQueries(0, lambda: [action.target for action in actions])
+
+    def test_setting(self):
+        expected = self.pks(any_stream, self.user1, _limit=3)
+        with patch('actstream.settings.ANY_STREAM_STRATEGY', 'union'):
+            stream = any_stream(self.user1, _limit=3)
+            # the page is selected by its ids instead of the roles
+            self.assertIn('"id" IN', str(stream.query))
+            self.assertEqual(list(stream.values_list('pk', flat=True)), expected)
+
+    def test_unknown_strategy(self):
+        self.assertRaises(ValueError, any_stream, self.user1, strategy='nope')
@@ -1,5 +1,6 @@
 from django.shortcuts import get_object_or_404, render
 from django.http import HttpResponseRedirect, HttpResponse
+from django.core.exceptions import BadRequest
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
@@ -7,6 +8,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.views.decorators.csrf import csrf_exempt
 
 from actstream import actions, models
+from actstream.cursors import get_cursor_kwargs, page_cursors
 
 USER_MODEL = get_user_model()
 username_field = getattr(get_user_model(), 'USERNAME_FIELD', 'username')
@@ -23,6 +25,25 @@ def respond(request, code):
     return type('Response%d' % code, (HttpResponse, ), {'status_code': code})()
 
 
+def stream_context(request, stream, *args):
+    """
+    Returns the template context for a page of actions, paginated by the
+    ``before``, ``after`` and ``limit`` query parameters.
+    """
+    try:
+        cursor_kwargs = get_cursor_kwargs(request.GET)
+    except ValueError as exc:
+        raise BadRequest(exc)
+    page = stream(*args, **cursor_kwargs)
+    cursors = page_cursors(page, cursor_kwargs.get('_limit'), cursor_kwargs.get('_before'), cursor_kwargs.get('_after'))
+    return {
+        'action_list': page,
+        'limit': cursor_kwargs.get('_limit'),
+        'next_cursor': cursors.get('next'),
+        'prev_cursor': cursors.get('prev'),
+    }
+
+
 @login_required
 @csrf_exempt
 def follow_unfollow(request, content_type_id, object_id, flag=None, do_follow=True, actor_only=True):
@@ -57,7 +78,7 @@ def stream(request):
         context={
             'ctype': ContentType.objects.get_for_model(USER_MODEL),
             'actor': request.user,
-            'action_list': models.user_stream(request.user)
+            **stream_context(request, models.user_stream, request.user)
         }
     )
 
@@ -111,7 +132,8 @@ def user(request, username):
         'actstream/actor.html',
         context={
             'ctype': ContentType.objects.get_for_model(USER_MODEL),
-            'actor': instance, 'action_list': models.user_stream(instance)
+            'actor': instance,
+            **stream_context(request, models.user_stream, instance)
         }
     )
 
@@ -140,9 +162,9 @@ def actor(request, content_type_id, object_id):
         request,
         'actstream/actor.html',
         {
-            'action_list': models.actor_stream(instance),
             'actor': instance,
-            'ctype': ctype
+            'ctype': ctype,
+            **stream_context(request, models.actor_stream, instance)
         }
     )
 
@@ -158,8 +180,8 @@ def model(request, content_type_id):
         request,
         'actstream/actor.html',
         {
-            'action_list': models.model_stream(model_class),
             'ctype': ctype,
-            'actor': model_class
+            'actor': model_class,
+            **stream_context(request, models.model_stream, model_class)
         }
     )
@@ -27,7 +27,7 @@ DATABASES = {
     }
 }
 
-if getenv('GITHUB_WORKFLOW', False):
+if getenv('GITHUB_WORKFLOW', False) or getenv('DATABASE_ENGINE', False):
     DATABASE_ENGINE = getenv('DATABASE_ENGINE', 'sqlite')
     if 'mysql' in DATABASE_ENGINE:
         DATABASES = {
@@ -111,6 +111,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'actstream.middleware.IdentityMapMiddleware',
 ]
 
 ROOT_URLCONF = 'urls'
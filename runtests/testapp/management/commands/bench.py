@@ -0,0 +1,298 @@
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import django
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from actstream import __version__, hybrid, settings as actstream_settings
+from actstream.actions import bulk_send, follow, unfollow
+from actstream.cache import get_cache
+from actstream.feeds import UserJSONActivityFeed, format_context
+from actstream.ids import set_int_object_ids
+from actstream.managers import USER_STREAM_STRATEGIES
+from actstream.models import Action, Follow, FeedEntry, any_stream, model_stream, user_stream
+from actstream.signals import action
+
+from testapp.models import MyUser, Player
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Times stream reads, action writes and feeds on a generated dataset and writes the results as JSON. '
+        'The dataset is created in a transaction which is rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Number of users.')
+        parser.add_argument('--follows', type=int, default=20, help='Number of follows per user.')
+        parser.add_argument('--actions', type=int, default=10, help='Number of actions per actor.')
+        parser.add_argument(
+            '--models', type=int, default=3, choices=range(1, 5),
+            help='Number of registered models acting: users, groups, sites and players.'
+        )
+        parser.add_argument(
+            '--celebrities', type=int, default=1,
+            help='Number of actors followed by every user, the pulled actors of the hybrid feed mode.'
+        )
+        parser.add_argument(
+            '--threshold', type=int,
+            help='Number of followers of the pulled actors in the hybrid feed mode, defaults to HYBRID[THRESHOLD].'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Number of timed runs of each benchmark.')
+        parser.add_argument('--limit', type=int, default=30, help='Number of actions read per stream.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated dataset.')
+        parser.add_argument(
+            '--only', action='append', default=[],
+            help='Name of a benchmark to run. May be repeated, defaults to all benchmarks.'
+        )
+        parser.add_argument('--output', help='File to write the JSON results to, defaults to stdout.')
+
+    def generate(self, options):
+        """
+        Creates the users, the objects of the other models, the follows and the actions.
+        """
+        rand = random.Random(options['seed'])
+        users = MyUser.objects.bulk_create(
+            MyUser(username='bench%d' % i) for i in range(options['users'])
+        )
+        count = max(1, options['users'] // 10)
+        factories = [
+            lambda: users,
+            lambda: Group.objects.bulk_create(Group(name='bench%d' % i) for i in range(count)),
+            lambda: Site.objects.bulk_create(
+                Site(domain='bench%d.example.com' % i, name='bench%d' % i) for i in range(count)),
+            lambda: Player.objects.bulk_create(Player(state=i) for i in range(count)),
+        ]
+        actors = []
+        for factory in factories[:options['models']]:
+            actors.extend(factory())
+
+        celebrities = actors[len(users):][:options['celebrities']] or actors[:options['celebrities']]
+        content_types = {}
+        follows = []
+        for user in users:
+            followed = rand.sample(actors, min(options['follows'], len(actors)))
+            followed += [obj for obj in celebrities if obj not in followed]
+            for obj in followed:
+                if obj is user:
+                    continue
+                model = obj.__class__
+                if model not in content_types:
+                    content_types[model] = ContentType.objects.get_for_model(model)
+                instance = Follow(user=user, content_type=content_types[model], object_id=obj.pk,
+                                  actor_only=rand.random() < 0.5)
+                set_int_object_ids(instance)
+                follows.append(instance)
+        Follow.objects.bulk_create(follows, batch_size=1000)
+
+        start = datetime(2020, 1, 1)
+        bulk_send(
+            ({
+                'actor': actor,
+                'verb': rand.choice(('posted', 'commented on', 'liked')),
+                'target': rand.choice(actors),
+                'timestamp': start + timedelta(minutes=rand.randrange(525600)),
+            } for actor in actors for i in range(options['actions'])),
+            send_signal=False
+        )
+        if actstream_settings.FEED_MODE == 'hybrid':
+            hybrid.refresh_pulled_actors(force=True)
+        if actstream_settings.FEED_MODE in ('write', 'hybrid'):
+            for user in users:
+                FeedEntry.objects.rebuild(user)
+        return rand, users, actors, celebrities
+
+    def measure(self, func, repeat, setup=None, rows=None, items=None):
+        """
+        Returns the timings in milliseconds and the number of queries of the runs of func,
+        the mean number of rows written if ``rows`` counts them and the median time per item
+        if each run handles ``items`` items.
+        """
+        timings, queries, written = [], [], []
+        for i in range(repeat):
+            args = setup(i) if setup else ()
+            before = rows() if rows else 0
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                func(*args)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(context.captured_queries))
+            if rows:
+                written.append(rows() - before)
+        timings.sort()
+        result = {
+            'runs': repeat,
+            'min_ms': round(timings[0], 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'queries': max(queries),
+        }
+        if rows:
+            result['rows'] = statistics.mean(written)
+        if items:
+            result['median_per_item_ms'] = round(statistics.median(timings) / items, 4)
+        return result
+
+    def get_benchmarks(self, rand, users, actors, celebrities, options):
+        """
+        Returns a dictionary of benchmark names to the arguments of ``measure``.
+        """
+        limit = options['limit']
+        client = Client()
+
+        def request(url):
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+            return response.content
+
+        def pick_user(i):
+            user = rand.choice(users)
+            client.force_login(user)
+            return (user,)
+
+        def pick_actor(i):
+            return (rand.choice(actors),)
+
+        def object_feed(name):
+            def run(obj):
+                ctype = ContentType.objects.get_for_model(obj)
+                request(reverse(name, args=(ctype.pk, obj.pk)))
+            return run
+
+        def follow_new(i):
+            user, obj = rand.choice(users), rand.choice(actors)
+            unfollow(user, obj)
+            return (user, obj)
+
+        def pick_regular(i):
+            return (rand.choice([obj for obj in actors if obj not in celebrities]),)
+
+        def pick_celebrity(i):
+            return (rand.choice(celebrities),)
+
+        def feed_rows():
+            return FeedEntry.objects.count()
+
+        def send(obj):
+            action.send(obj, verb='benchmarked', target=rand.choice(actors))
+
+        feed = UserJSONActivityFeed()
+        formatted = min(limit, Action.objects.count())
+
+        def pick_actions(i):
+            # the actions and their objects are fetched before the timed formatting
+            actions = Action.objects.order_by('-timestamp', '-pk').prefetch_related(
+                'actor', 'target', 'action_object')
+            return (list(actions[:formatted]),)
+
+        def format_actions(actions):
+            with format_context():
+                return [feed.format(action) for action in actions]
+
+        def user_stream_strategy(strategy):
+            return lambda user: list(user_stream(user, _limit=limit, strategy=strategy))
+
+        benchmarks = {
+            'user_stream': (lambda user: list(user_stream(user, _limit=limit)), pick_user),
+            'any_stream': (lambda obj: list(any_stream(obj, _limit=limit)), pick_actor),
+            'model_stream': (lambda obj: list(model_stream(obj.__class__, _limit=limit)), pick_actor),
+            'any_stream_union': (lambda obj: list(any_stream(obj, strategy='union', _limit=limit)), pick_actor),
+            'model_stream_union': (lambda obj: list(model_stream(obj.__class__, strategy='union', _limit=limit)),
+                                   pick_actor),
+            'follow': (lambda user, obj: follow(user, obj, send_action=False), follow_new),
+            'action_send': (send, pick_actor),
+            'user_feed_json': (lambda user: request(reverse('actstream_feed_json') + '?limit=%d' % limit),
+                               pick_user),
+            'user_feed_atom': (lambda user: request(reverse('actstream_feed_atom')), pick_user),
+            'object_feed_json': (object_feed('actstream_object_feed_json'), pick_actor),
+            'object_feed_atom': (object_feed('actstream_object_feed_atom'), pick_actor),
+            # formatting cost of the feed items with and without a shared format context
+            'feed_format': (format_actions, pick_actions, None, formatted),
+            'feed_format_uncached': (lambda actions: [feed.format(action) for action in actions],
+                                     pick_actions, None, formatted),
+        }
+        if actstream_settings.FEED_MODE == 'read':
+            for strategy in USER_STREAM_STRATEGIES:
+                benchmarks['user_stream_%s' % strategy] = (user_stream_strategy(strategy), pick_user)
+        if actstream_settings.FEED_MODE in ('write', 'hybrid') and celebrities:
+            # write amplification and read latency of actions by regular and celebrity actors
+            benchmarks['action_send_regular'] = (send, pick_regular, feed_rows)
+            benchmarks['action_send_celebrity'] = (send, pick_celebrity, feed_rows)
+        return benchmarks
+
+    def handle(self, *args, **options):
+        call_command('migrate', verbosity=0, interactive=False)
+        hybrid_settings = dict(actstream_settings.HYBRID_SETTINGS)
+        if options['threshold'] is not None:
+            actstream_settings.HYBRID_SETTINGS['THRESHOLD'] = options['threshold']
+
+        results = {}
+        try:
+            # the test client requests the feeds from "testserver"
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                start = time.perf_counter()
+                rand, users, actors, celebrities = self.generate(options)
+                generated = time.perf_counter() - start
+
+                benchmarks = self.get_benchmarks(rand, users, actors, celebrities, options)
+                unknown = set(options['only']) - set(benchmarks)
+                if unknown:
+                    raise CommandError('Unknown benchmarks: %s' % ', '.join(sorted(unknown)))
+                for name, args in benchmarks.items():
+                    if options['only'] and name not in options['only']:
+                        continue
+                    results[name] = self.measure(args[0], options['repeat'], *args[1:])
+                    if options['verbosity'] > 1:
+                        self.stderr.write('%s: %s' % (name, results[name]))
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # computed from the rolled back follows
+            get_cache().delete(hybrid.PULLED_KEY)
+            threshold = actstream_settings.HYBRID_SETTINGS['THRESHOLD']
+            actstream_settings.HYBRID_SETTINGS.update(hybrid_settings)
+
+        report = {
+            'meta': {
+                'actstream': __version__,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'feed_mode': actstream_settings.FEED_MODE,
+                'user_stream_strategy': actstream_settings.USER_STREAM_STRATEGY,
+                'any_stream_strategy': actstream_settings.ANY_STREAM_STRATEGY,
+                'date': datetime.now().isoformat(),
+                'generate_s': round(generated, 3),
+                'dataset': {
+                    key: options[key] for key in ('users', 'follows', 'actions', 'models', 'celebrities', 'seed')
+                },
+                'hybrid_threshold': threshold,
+                'repeat': options['repeat'],
+                'limit': options['limit'],
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fileobj:
+                fileobj.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -15,6 +15,8 @@ setup(name='django-activity-stream',
       url='http://github.com/justquick/django-activity-stream',
       install_requires=['Django>=3.2'],
       packages=['actstream',
+                'actstream.management',
+                'actstream.management.commands',
                 'actstream.migrations',
                 'actstream.drf',
                 'actstream.templatetags',
@@ -33,5 +35,6 @@ setup(name='django-activity-stream',
                    'Topic :: Utilities'],
       extras_require={
           'drf': ['django-rest-framework', 'rest-framework-generic-relations'],
+          'redis': ['redis'],
       },
       )